@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class ReplaysConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "replays"
+
+    def ready(self):
+        from replays import replay_pages
+        from replays import replay_ranks
+        from replays import scoreboard_snapshots
+        from replays import stage_tables
+
+        replay_pages.ConnectSignals(
+            self.get_model("Replay"), self.get_model("ReplayStage")
+        )
+        replay_ranks.ConnectSignals(self.get_model("Replay"))
+        scoreboard_snapshots.ConnectSignals(self.get_model("Replay"))
+        stage_tables.ConnectSignals(self.get_model("ReplayStage"))
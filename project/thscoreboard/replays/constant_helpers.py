@@ -3,9 +3,12 @@
 from __future__ import annotations
 
 import dataclasses
-from typing import Optional
+import time
+from typing import Iterable, Optional
+import uuid
 
 from django import apps
+from django.core.cache import cache
 
 from replays import replay_parsing
 import hashlib
@@ -48,28 +51,143 @@ def GetModelInstancesForReplay(
         UnknownGameError: If the "game" field of the replay does not correspond
             to a row in the database.
     """
-    try:
-        shot = (
-            _Shot()
-            .objects.select_related("game")
-            .get(game=replay_info.game, shot_id=replay_info.shot)
-        )
-    except _Shot().DoesNotExist:
-        # If the game also does not exist, we can raise an appropriate exception.
-        # If the game exists but the shot does not, either we have a bug or the
-        # replay is extremely bizarre.
+    return GetConstantModelIndex().ForReplay(replay_info)
+
+
+class ConstantModelIndex:
+    """Every Game, Shot and Route, indexed so they can be looked up without queries.
+
+    Use GetConstantModelIndex to get the shared instance, rather than
+    constructing one directly.
+    """
+
+    def __init__(self, version: Optional[str] = None):
+        self.version = version
+        self._games = {game.game_id: game for game in _Game().objects.all()}
+
+        self._shots = {}
+        self._shots_by_id = {}
+        self._shots_by_game = {game_id: [] for game_id in self._games}
+        for shot in _Shot().objects.order_by("id"):
+            shot.game = self._games[shot.game_id]
+            self._shots[(shot.game_id, shot.shot_id)] = shot
+            self._shots_by_id[shot.id] = shot
+            self._shots_by_game[shot.game_id].append(shot)
+
+        self._routes = {}
+        self._routes_by_id = {}
+        self._routes_by_game = {game_id: [] for game_id in self._games}
+        for route in _Route().objects.order_by("id"):
+            route.game = self._games[route.game_id]
+            self._routes[(route.game_id, route.route_id)] = route
+            self._routes_by_id[route.id] = route
+            self._routes_by_game[route.game_id].append(route)
+
+    def GetGame(self, game_id: str) -> models.Game:
+        try:
+            return self._games[game_id]
+        except KeyError:
+            raise _Game().DoesNotExist(f"No game {game_id}")
+
+    def GetGames(self) -> list[models.Game]:
+        return list(self._games.values())
+
+    def GetShotsForGame(self, game_id: str) -> list[models.Shot]:
+        return list(self._shots_by_game.get(game_id, []))
+
+    def GetRoutesForGame(self, game_id: str) -> list[models.Route]:
+        return list(self._routes_by_game.get(game_id, []))
+
+    def GetShotById(self, id: int) -> models.Shot:
+        return self._shots_by_id[id]
+
+    def GetRouteById(self, id: int) -> models.Route:
+        return self._routes_by_id[id]
+
+    def GetShot(self, game_id: str, shot_id: str) -> models.Shot:
+        try:
+            return self._shots[(game_id, shot_id)]
+        except KeyError:
+            raise _Shot().DoesNotExist(f"No shot {shot_id} for {game_id}")
+
+    def GetRoute(self, game_id: str, route_id: str) -> models.Route:
         try:
-            _ = _Game().objects.get(game_id=replay_info.game)
-        except _Game().DoesNotExist:
+            return self._routes[(game_id, route_id)]
+        except KeyError:
+            raise _Route().DoesNotExist(f"No route {route_id} for {game_id}")
+
+    def ForReplay(self, replay_info: replay_parsing.ReplayInfo) -> ReplayConstantModels:
+        """Get the constant model instances related to this replay.
+
+        Raises:
+            UnknownGameError: If the "game" field of the replay does not correspond
+                to a row in the database.
+        """
+        if replay_info.game not in self._games:
             raise UnknownGameError(replay_info.game)
-        raise
+        # If the game exists but the shot does not, either we have a bug or the
+        # replay is extremely bizarre.
+        shot = self.GetShot(replay_info.game, replay_info.shot)
+
+        if replay_info.route:
+            route = self.GetRoute(replay_info.game, replay_info.route)
+        else:
+            route = None
+
+        return ReplayConstantModels(game=shot.game, shot=shot, route=route)
 
-    if replay_info.route:
-        route = _Route().objects.get(game=shot.game, route_id=replay_info.route)
-    else:
-        route = None
 
-    return ReplayConstantModels(game=shot.game, shot=shot, route=route)
+_CONSTANT_TABLES_VERSION_KEY = "constant_tables_version"
+
+_VERSION_CHECK_INTERVAL = 5
+"""How often, in seconds, each process checks the cache for a new version."""
+
+_constant_model_index: Optional[ConstantModelIndex] = None
+_version_checked_at = 0.0
+
+
+def GetConstantModelIndex() -> ConstantModelIndex:
+    """Get the process-wide index of the constant tables.
+
+    The constant tables only change when setup_constant_tables runs, so they
+    are loaded once and kept in memory. The index is versioned through the
+    cache, so that every process sharing a cache reloads it after
+    InvalidateConstantModelIndex is called.
+
+    The version is only checked every few seconds, rather than on every call,
+    since with a shared cache that's a round trip. So other processes may keep
+    using the old index for a few seconds after it is invalidated; this
+    process stops using it straight away.
+
+    The model instances in the index are shared, so don't modify them.
+    """
+    global _constant_model_index, _version_checked_at
+
+    index = _constant_model_index
+    now = time.monotonic()
+    if index is not None and now - _version_checked_at < _VERSION_CHECK_INTERVAL:
+        return index
+
+    version = cache.get_or_set(
+        _CONSTANT_TABLES_VERSION_KEY, _NewConstantTablesVersion, timeout=None
+    )
+    if index is None or index.version != version:
+        index = ConstantModelIndex(version)
+        _constant_model_index = index
+    _version_checked_at = now
+    return index
+
+
+def InvalidateConstantModelIndex() -> None:
+    """Force every process to reload the constant tables."""
+    global _constant_model_index
+
+    _constant_model_index = None
+    cache.set(_CONSTANT_TABLES_VERSION_KEY, _NewConstantTablesVersion(), timeout=None)
+
+
+def _NewConstantTablesVersion() -> str:
+    return uuid.uuid4().hex
 
 
 def GetReplayFileWithSameHash(
@@ -87,11 +205,29 @@ def GetReplayFileWithSameHash(
         The matching replay file, or None.
     """
     hash = CalculateReplayFileHash(file)
-    q = models.ReplayFile.objects.filter(replay_hash=hash)
+    q = (
+        models.ReplayFile.objects.filter(replay_hash=hash)
+        .select_related("replay__shot")
+        .defer("replay_file")
+    )
     if not include_ghosts:
         q = q.filter(replay__user__is_active=True)
     return q.first()
 
 
+def GetExistingReplayFileHashes(hashes: Iterable[bytes]) -> set[bytes]:
+    """Return which of these replay file hashes are already in the database.
+
+    Unlike GetReplayFileWithSameHash, this includes ghosts, since they would
+    still collide with a new replay file with the same hash.
+    """
+    return {
+        bytes(h)
+        for h in models.ReplayFile.objects.filter(
+            replay_hash__in=list(hashes)
+        ).values_list("replay_hash", flat=True)
+    }
+
+
 def CalculateReplayFileHash(file):
     return hashlib.sha256(file).digest()
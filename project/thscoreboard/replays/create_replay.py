@@ -4,9 +4,10 @@ This module works with the database and with parsed replay files, but
 not with web entities like views or forms.
 """
 
+import dataclasses
 import datetime
 import logging
-from typing import Optional
+from typing import Optional, Sequence
 
 from django.db import transaction
 from django.db import utils
@@ -15,6 +16,10 @@ from replays import constant_helpers
 from replays import game_ids
 from replays import models
 from replays import replay_parsing
+from replays import replay_ranks
+from replays import replay_storage
+from replays import scoreboard_snapshots
+from replays import stage_tables
 
 
 def _CreateNewReplayFile(rf: models.ReplayFile):
@@ -118,35 +123,138 @@ def PublishNewReplay(
     if game_ids.HasLives(replay_info.game, replay_info.replay_type):
         replay_instance.miss_count = miss_count
 
+    if temp_replay_instance.replay is None:
+        # The file is already in the blob store, so it doesn't need copying.
+        replay_file = None
+        replay_hash = temp_replay_instance.replay_hash
+    else:
+        replay_file, replay_hash = replay_storage.Put(temp_replay_instance.replay)
     replay_file_instance = models.ReplayFile(
         replay=replay_instance,
-        replay_file=temp_replay_instance.replay,
-        replay_hash=constant_helpers.CalculateReplayFileHash(
-            temp_replay_instance.replay
-        ),
+        replay_file=replay_file,
+        replay_hash=replay_hash,
     )
 
     replay_instance.save()
     _CreateNewReplayFile(replay_file_instance)
     temp_replay_instance.delete()
 
+    replay_stages = []
     for s in replay_info.stages:
         #   th09 shot foreign key
         th09_shot_instance = None
         if replay_info.game == game_ids.GameIDs.TH09:
-            th09_shot_instance = models.Shot.objects.select_related("game").get(
-                game=game_ids.GameIDs.TH09, shot_id=s.th09_p2_shot
+            th09_shot_instance = constant_helpers.GetConstantModelIndex().GetShot(
+                game_ids.GameIDs.TH09, s.th09_p2_shot
             )
 
-        replay_stage = models.ReplayStage(
-            replay=replay_instance, stage=s.stage, th09_p2_shot=th09_shot_instance
-        )
-        replay_stage.SetFromReplayStageInfo(s)
-        replay_stage.save()
+        replay_stages.append(_NewReplayStage(replay_instance, s, th09_shot_instance))
+    models.ReplayStage.objects.bulk_create(replay_stages)
+    stage_tables.Store([(replay_instance, replay_stages)])
 
     return replay_instance
 
 
+def _NewReplayStage(
+    replay_instance: models.Replay,
+    s: replay_parsing.ReplayStage,
+    th09_shot_instance: Optional[models.Shot],
+) -> models.ReplayStage:
+    replay_stage = models.ReplayStage(
+        replay=replay_instance, stage=s.stage, th09_p2_shot=th09_shot_instance
+    )
+    replay_stage.SetFromReplayStageInfo(s)
+    return replay_stage
+
+
+@dataclasses.dataclass(frozen=True)
+class ImportedReplay:
+    """A parsed replay file from an external site, ready to be published."""
+
+    replay_file: bytes
+    replay_hash: bytes
+    replay_info: replay_parsing.ReplayInfo
+    comment: str
+    created_timestamp: datetime.datetime
+    imported_username: str
+
+
+@transaction.atomic
+def PublishImportedReplays(imports: Sequence[ImportedReplay]) -> list[models.Replay]:
+    """Publish many imported replays at once.
+
+    Unlike PublishNewReplay, this function inserts rows in bulk, so it doesn't
+    handle ghosts or hash collisions; callers must leave out replays whose
+    hashes are already in the database.
+
+    Args:
+        imports: The replays to publish.
+
+    Returns:
+        The new Replay model instances.
+    """
+    constants = constant_helpers.GetConstantModelIndex()
+    replay_instances = []
+    for i in imports:
+        replay_instance = models.Replay(
+            user=None,
+            difficulty=i.replay_info.difficulty,
+            score=i.replay_info.score,
+            category=models.Category.STANDARD,
+            comment=i.comment,
+            video_link="",
+            is_good=True,
+            is_clear=True,
+            created=i.created_timestamp,
+            imported_username=i.imported_username,
+        )
+        replay_instance.SetFromReplayInfo(i.replay_info)
+        replay_instance.SetForeignKeysFromConstantModels(
+            constants.ForReplay(i.replay_info)
+        )
+        if game_ids.HasBombs(i.replay_info.game, i.replay_info.replay_type):
+            replay_instance.no_bomb = False
+        replay_instances.append(replay_instance)
+
+    models.Replay.objects.bulk_create(replay_instances)
+
+    replay_files = []
+    replay_stages = []
+    stages_by_replay = []
+    for replay_instance, i in zip(replay_instances, imports):
+        replay_file, _ = replay_storage.Put(i.replay_file, i.replay_hash)
+        replay_files.append(
+            models.ReplayFile(
+                replay=replay_instance,
+                replay_file=replay_file,
+                replay_hash=i.replay_hash,
+            )
+        )
+        stages = []
+        for s in i.replay_info.stages:
+            th09_shot_instance = None
+            if i.replay_info.game == game_ids.GameIDs.TH09:
+                th09_shot_instance = constants.GetShot(
+                    game_ids.GameIDs.TH09, s.th09_p2_shot
+                )
+            stages.append(_NewReplayStage(replay_instance, s, th09_shot_instance))
+        replay_stages.extend(stages)
+        stages_by_replay.append((replay_instance, stages))
+
+    models.ReplayFile.objects.bulk_create(replay_files)
+    models.ReplayStage.objects.bulk_create(replay_stages)
+    stage_tables.Store(stages_by_replay, constants)
+
+    # bulk_create doesn't send signals, so do what the Replay signal
+    # handlers would have done.
+    replay_ranks.RefreshDivisions(
+        replay_ranks.Division.ForReplay(r) for r in replay_instances
+    )
+    scoreboard_snapshots.InvalidateGames(r.shot.game_id for r in replay_instances)
+
+    return replay_instances
+
+
 def PublishReplayWithoutFile(
     user,
     difficulty: int,
@@ -0,0 +1,228 @@
+"""The filters shown above each game's scoreboard.
+
+A game's filters (its difficulties, shots, routes and so on) only change when
+the constant tables do, but naming them means translating every value. So we
+build the filters for every game at once, the first time they are needed in
+each language, and keep them in memory until setup_constant_tables changes the
+constant tables. Looking up a game's filters then needs no queries.
+"""
+
+import dataclasses
+from typing import Any, Iterable, Optional
+
+from django.utils import translation
+
+from replays import constant_helpers
+from replays import game_ids
+from replays import models
+
+
+_SCOREBOARD_CATEGORIES = (models.Category.STANDARD, models.Category.TAS)
+
+_ROUTE_GAMES = (game_ids.GameIDs.TH01, game_ids.GameIDs.TH08, game_ids.GameIDs.TH128)
+
+
+@dataclasses.dataclass(frozen=True)
+class Filter:
+    name: str
+    values: list[str]
+    has_all: bool = True
+
+
+@dataclasses.dataclass(frozen=True)
+class GameFilters:
+    """The filters for a single game's scoreboard, in a single language."""
+
+    game: models.Game
+
+    filters: tuple[Filter, ...]
+    """The filters particular to this game, like difficulty and shot."""
+
+    category: Filter
+    """The replay categories shown on the scoreboard."""
+
+    show_route: bool
+    """Whether the scoreboard has a route column."""
+
+    def AllFilters(self) -> list[Filter]:
+        """Every filter on the scoreboard, in the order they're shown."""
+        return list(self.filters) + [self.category]
+
+    def ToJson(self) -> dict[str, Any]:
+        return {
+            "game": self.game.game_id,
+            "filters": [dataclasses.asdict(f) for f in self.AllFilters()],
+            "show_route": self.show_route,
+        }
+
+
+@dataclasses.dataclass(frozen=True)
+class _Catalogue:
+    version: Optional[str]
+    games: dict[str, GameFilters]
+
+
+_catalogues: dict[str, _Catalogue] = {}
+
+
+def GetGameFilters(game_id: str) -> GameFilters:
+    """Get a game's scoreboard filters in the active language.
+
+    Raises:
+        Game.DoesNotExist: If there's no such game.
+    """
+    constants = constant_helpers.GetConstantModelIndex()
+    language = translation.get_language()
+    catalogue = _catalogues.get(language)
+    if catalogue is None or catalogue.version != constants.version:
+        catalogue = _BuildCatalogue(constants)
+        _catalogues[language] = catalogue
+
+    try:
+        return catalogue.games[game_id]
+    except KeyError:
+        raise models.Game.DoesNotExist(f"No game {game_id}")
+
+
+def GetFilterOptions(
+    game: models.Game, constants: Optional[constant_helpers.ConstantModelIndex] = None
+) -> list[Filter]:
+    """Build the filters particular to a game, in the active language.
+
+    Prefer GetGameFilters, which only builds them once.
+    """
+    if constants is None:
+        constants = constant_helpers.GetConstantModelIndex()
+    builder = _BUILDERS.get(game.game_id, _GetFilterOptionsDefault)
+    return builder(game, constants)
+
+
+def _BuildCatalogue(constants: constant_helpers.ConstantModelIndex) -> _Catalogue:
+    category = Filter(
+        "Category", [str(c.label) for c in _SCOREBOARD_CATEGORIES], has_all=False
+    )
+    games = {}
+    for game in constants.GetGames():
+        games[game.game_id] = GameFilters(
+            game=game,
+            filters=tuple(GetFilterOptions(game, constants)),
+            category=category,
+            show_route=game.game_id in _ROUTE_GAMES,
+        )
+    return _Catalogue(version=constants.version, games=games)
+
+
+def _Names(names: Iterable[Any]) -> list[str]:
+    # Force lazy translations now, while the right language is active.
+    return [str(name) for name in names]
+
+
+def _Difficulties(game: models.Game, count: Optional[int] = None) -> list[str]:
+    if count is None:
+        count = game.num_difficulties
+    return _Names(game.GetDifficultyName(d) for d in range(count))
+
+
+def _Shots(game: models.Game, constants) -> list[str]:
+    return _Names(shot.GetName() for shot in constants.GetShotsForGame(game.game_id))
+
+
+def _Routes(game: models.Game, constants) -> list[str]:
+    return _Names(route.GetName() for route in constants.GetRoutesForGame(game.game_id))
+
+
+def _Characters(game: models.Game, constants) -> list[str]:
+    return _Names(
+        _DeduplicatePreservingOrder(
+            shot.GetCharacterName() for shot in constants.GetShotsForGame(game.game_id)
+        )
+    )
+
+
+def _Subshots(game: models.Game, constants) -> list[str]:
+    return _Names(
+        _DeduplicatePreservingOrder(
+            shot.GetSubshotName()
+            for shot in constants.GetShotsForGame(game.game_id)
+            # Some shots, like TH16's extra stage shots, have no subshot.
+            if shot.GetSubshotName() is not None
+        )
+    )
+
+
+def _GetFilterOptionsDefault(game: models.Game, constants) -> list[Filter]:
+    return [
+        Filter("Difficulty", _Difficulties(game)),
+        Filter("Shot", _Shots(game, constants)),
+    ]
+
+
+def _GetFilterOptionsTh01Th128(game: models.Game, constants) -> list[Filter]:
+    return [
+        Filter("Difficulty", _Difficulties(game)),
+        Filter("Route", _Routes(game, constants)),
+    ]
+
+
+def _GetFilterOptionsTh08(game: models.Game, constants) -> list[Filter]:
+    return [
+        Filter("Difficulty", _Difficulties(game)),
+        Filter("Shot", _Shots(game, constants)),
+        Filter("Route", _Routes(game, constants)),
+    ]
+
+
+def _GetFilterOptionsTh095(game: models.Game, constants) -> list[Filter]:
+    all_levels = _Names(
+        game.GetSceneGameLevelName(d + 1) for d in range(game.num_scene_game_levels)
+    )
+    all_scenes = _Names(
+        game.GetSceneGameSceneName(d + 1) for d in range(game.num_scene_game_scenes)
+    )
+    return [Filter("Level", all_levels), Filter("Scene", all_scenes)]
+
+
+def _GetFilterOptionsTh13(game: models.Game, constants) -> list[Filter]:
+    return [
+        # Exclude difficulty 5, Overdrive, which only appears in spell practice.
+        Filter("Difficulty", _Difficulties(game, 5)),
+        Filter("Shot", _Shots(game, constants)),
+    ]
+
+
+def _SubshotFilterBuilder(subshot_name: str):
+    def Build(game: models.Game, constants) -> list[Filter]:
+        return [
+            Filter("Difficulty", _Difficulties(game)),
+            Filter("Character", _Characters(game, constants)),
+            Filter(subshot_name, _Subshots(game, constants)),
+        ]
+
+    return Build
+
+
+def _GetFilterOptionsAlco(game: models.Game, constants) -> list[Filter]:
+    return []
+
+
+_BUILDERS = {
+    game_ids.GameIDs.TH01: _GetFilterOptionsTh01Th128,
+    game_ids.GameIDs.TH128: _GetFilterOptionsTh01Th128,
+    game_ids.GameIDs.TH08: _GetFilterOptionsTh08,
+    game_ids.GameIDs.TH095: _GetFilterOptionsTh095,
+    game_ids.GameIDs.TH13: _GetFilterOptionsTh13,
+    game_ids.GameIDs.TH16: _SubshotFilterBuilder("Season"),
+    game_ids.GameIDs.TH17: _SubshotFilterBuilder("Goast"),
+    game_ids.GameIDs.TH20: _SubshotFilterBuilder("Stone"),
+    game_ids.GameIDs.ALCO: _GetFilterOptionsAlco,
+}
+
+
+def _DeduplicatePreservingOrder(items: Iterable) -> list:
+    deduplicated = []
+    seen = set()
+    for item in items:
+        if item not in seen:
+            deduplicated.append(item)
+            seen.add(item)
+    return deduplicated
@@ -1,9 +1,9 @@
 """A class that provides methods used to properly format and display replay data"""
 
-import copy
 from immutabledict import immutabledict
-from typing import Iterable, Optional
+from typing import Any, Iterable, Optional
 from . import game_ids
+from replays import constant_helpers
 from replays import models
 
 #   These table fields configure the display of the stage split columns
@@ -661,91 +661,97 @@ def GetFormatStage(game_id: str, stage: Optional[int]) -> str:
     return str(stage)
 
 
-def FormatStages(game_id: str, replay_stages: Iterable[models.ReplayStage], shot: str):
-    """This function formats the stage values to be displayed in the front end"""
-    new_stages = copy.deepcopy(replay_stages)
-
-    for stage in new_stages:
-        stage.power = GetFormatPower(game_id, stage.power, shot)
-        stage.stage = GetFormatStage(game_id, stage.stage)
-        stage.lives = GetFormatLives(
-            game_id, stage.lives, stage.life_pieces, stage.extends
-        )
-        stage.bombs = GetFormatBombs(game_id, stage.bombs, stage.bomb_pieces)
-        if game_id == game_ids.GameIDs.TH09:
-            stage.th09_p2_shotFormat = stage.th09_p2_shot.GetName()
-
-        if stage.th128_motivation is None:
-            stage.th128_motivation = ""
-        else:
-            stage.th128_motivation = f"{stage.th128_motivation//100}%"
-
-        if stage.th128_perfect_freeze is None:
-            stage.th128_perfect_freeze = ""
-        else:
-            stage.th128_perfect_freeze = f"{stage.th128_perfect_freeze//100}%"
+STAGE_TABLE_VERSION = 1
+"""The version of FormatStageRow's output.
+
+Stage tables are stored with the version they were formatted with, so bump
+this whenever FormatStageRow changes, and stored tables will be rebuilt when
+they are next read.
+"""
+
+
+def _FormatSeasonPower(season_power: int) -> str:
+    if season_power >= 1140:
+        return "6"
+    elif season_power >= 840:
+        return f"5 ({season_power-840}/300)"
+    elif season_power >= 590:
+        return f"4 ({season_power-590}/250)"
+    elif season_power >= 390:
+        return f"3 ({season_power-390}/200)"
+    elif season_power >= 230:
+        return f"2 ({season_power-230}/160)"
+    elif season_power >= 100:
+        return f"1 ({season_power-100}/130)"
+    else:
+        return f"0 ({season_power}/100)"
 
-        if stage.th128_frozen_area is None:
-            stage.th128_frozen_area = ""
-        else:
-            stage.th128_frozen_area = f"{int(stage.th128_frozen_area)}%"
 
-        if stage.th13_trance is None:
-            stage.th13_trance = ""
-        else:
-            stage.th13_trance = (
-                f"{stage.th13_trance//200} ({stage.th13_trance%200}/200)"
-            )
-
-        if stage.th16_season_power is None:
-            stage.th16_season_power = ""
-        elif stage.th16_season_power >= 1140:
-            stage.th16_season_power = "6"
-        elif stage.th16_season_power >= 840:
-            stage.th16_season_power = f"5 ({stage.th16_season_power-840}/300)"
-        elif stage.th16_season_power >= 590:
-            stage.th16_season_power = f"4 ({stage.th16_season_power-590}/250)"
-        elif stage.th16_season_power >= 390:
-            stage.th16_season_power = f"3 ({stage.th16_season_power-390}/200)"
-        elif stage.th16_season_power >= 230:
-            stage.th16_season_power = f"2 ({stage.th16_season_power-230}/160)"
-        elif stage.th16_season_power >= 100:
-            stage.th16_season_power = f"1 ({stage.th16_season_power-100}/130)"
-        else:
-            stage.th16_season_power = f"0 ({stage.th16_season_power}/100)"
-
-        if stage.stage is None:
-            stage.stage = ""
-        if stage.score is None:
-            stage.score = ""
-        if stage.piv is None:
-            stage.piv = ""
-        if stage.graze is None:
-            stage.graze = ""
-        if stage.point_items is None:
-            stage.point_items = ""
-        if stage.power is None:
-            stage.power = ""
-        if stage.lives is None:
-            stage.lives = ""
-        if stage.bombs is None:
-            stage.bombs = ""
-        if stage.th06_rank is None:
-            stage.th06_rank = ""
-        if stage.th07_cherry is None:
-            stage.th07_cherry = ""
-        if stage.th07_cherrymax is None:
-            stage.th07_cherrymax = ""
-        if stage.th09_p1_cpu is None:
-            stage.th09_p1_cpu = ""
-        if stage.th09_p2_cpu is None:
-            stage.th09_p2_cpu = ""
-        if stage.th09_p2_score is None:
-            stage.th09_p2_score = ""
-        if stage.extends is None:
-            stage.extends = ""
-
-    return new_stages
+def FormatStageRow(
+    game_id: str,
+    stage: models.ReplayStage,
+    shot: str,
+    constants: Optional[constant_helpers.ConstantModelIndex] = None,
+) -> dict[str, Any]:
+    """Format a stage's values for display in the stage table.
+
+    Values that would be displayed as blank are left out. TH09's player 2
+    shot is given by its shot ID, as "th09_p2_shot", since its name depends
+    on the language; the detail page names it when it is displayed.
+
+    Args:
+        game_id: The replay's game.
+        stage: The stage to format.
+        shot: The replay's shot ID, since power is shown differently for
+            some shots.
+        constants: The constant model index, to look up TH09's player 2
+            shot. Fetched if not given.
+    """
+    row = {
+        "stage": GetFormatStage(game_id, stage.stage),
+        "score": stage.score,
+        "piv": stage.piv,
+        "graze": stage.graze,
+        "point_items": stage.point_items,
+        "power": GetFormatPower(game_id, stage.power, shot),
+        "lives": GetFormatLives(game_id, stage.lives, stage.life_pieces, stage.extends),
+        "bombs": GetFormatBombs(game_id, stage.bombs, stage.bomb_pieces),
+        "th06_rank": stage.th06_rank,
+        "th07_cherry": stage.th07_cherry,
+        "th07_cherrymax": stage.th07_cherrymax,
+        "th09_p1_cpu": stage.th09_p1_cpu,
+        "th09_p2_cpu": stage.th09_p2_cpu,
+        "th09_p2_score": stage.th09_p2_score,
+        "extends": stage.extends,
+    }
+    if game_id == game_ids.GameIDs.TH09 and stage.th09_p2_shot_id is not None:
+        if constants is None:
+            constants = constant_helpers.GetConstantModelIndex()
+        row["th09_p2_shot"] = constants.GetShotById(stage.th09_p2_shot_id).shot_id
+    if stage.th128_motivation is not None:
+        row["th128_motivation"] = f"{stage.th128_motivation//100}%"
+    if stage.th128_perfect_freeze is not None:
+        row["th128_perfect_freeze"] = f"{stage.th128_perfect_freeze//100}%"
+    if stage.th128_frozen_area is not None:
+        row["th128_frozen_area"] = f"{int(stage.th128_frozen_area)}%"
+    if stage.th13_trance is not None:
+        row["th13_trance"] = f"{stage.th13_trance//200} ({stage.th13_trance%200}/200)"
+    if stage.th16_season_power is not None:
+        row["th16_season_power"] = _FormatSeasonPower(stage.th16_season_power)
+
+    return {key: value for key, value in row.items() if value not in (None, "")}
+
+
+def FormatStages(
+    game_id: str,
+    replay_stages: Iterable[models.ReplayStage],
+    shot: str,
+    constants: Optional[constant_helpers.ConstantModelIndex] = None,
+) -> list[dict[str, Any]]:
+    """Format every stage of a replay for display in the stage table."""
+    if constants is None:
+        constants = constant_helpers.GetConstantModelIndex()
+    return [FormatStageRow(game_id, stage, shot, constants) for stage in replay_stages]
 
 
 _games_with_pvp = ["th03", "th09"]
@@ -1,11 +1,12 @@
 """Various human-readable game IDs, used in low-level libraries like game_ids.py."""
 
 import enum
-from typing import Optional
+from typing import Any, Callable, Optional
 
 from immutabledict import immutabledict
 
-from django.utils.translation import gettext as _, pgettext, pgettext_lazy
+from django.utils import translation
+from django.utils.translation import gettext as _, gettext_lazy, pgettext, pgettext_lazy
 
 
 class GameIDs:
@@ -189,488 +190,426 @@ def GetGameName(game_id: str, name_length: NameLength):
     return _("Unknown game (bug!)")
 
 
-def GetShotName(game_id: str, shot_id: str) -> str:
-    if game_id == GameIDs.TH01:
-        if shot_id == "Reimu":
-            return pgettext("th01", "Reimu")
-    if game_id == GameIDs.TH02:
-        if shot_id == "ReimuA":
-            return pgettext("th02", "Mobility")
-        elif shot_id == "ReimuB":
-            return pgettext("th02", "Defensive")
-        elif shot_id == "ReimuC":
-            return pgettext("th02", "Offensive")
-
-    if game_id == GameIDs.TH03:
-        if shot_id == "Reimu":
-            return pgettext("th03", "Reimu")
-        elif shot_id == "Mima":
-            return pgettext("th03", "Mima")
-        elif shot_id == "Marisa":
-            return pgettext("th03", "Marisa")
-        elif shot_id == "Ellen":
-            return pgettext("th03", "Ellen")
-        elif shot_id == "Kotohime":
-            return pgettext("th03", "Kotohime")
-        elif shot_id == "Kana":
-            return pgettext("th03", "Kana")
-        elif shot_id == "Rikako":
-            return pgettext("th03", "Rikako")
-        elif shot_id == "Chiyuri":
-            return pgettext("th03", "Chiyuri")
-        elif shot_id == "Yumemi":
-            return pgettext("th03", "Yumemi")
-
-    if game_id == GameIDs.TH04:
-        if shot_id == "ReimuA":
-            return pgettext("th04", "Reimu A")
-        elif shot_id == "ReimuB":
-            return pgettext("th04", "Reimu B")
-        elif shot_id == "MarisaA":
-            return pgettext("th04", "Marisa A")
-        elif shot_id == "MarisaB":
-            return pgettext("th04", "Marisa B")
-
-    if game_id == GameIDs.TH05:
-        if shot_id == "Reimu":
-            return pgettext("th05", "Reimu")
-        if shot_id == "Marisa":
-            return pgettext("th05", "Marisa")
-        if shot_id == "Mima":
-            return pgettext("th05", "Mima")
-        if shot_id == "Yuuka":
-            return pgettext("th05", "Yuuka")
+class _TranslationTable:
+    """Translated names, looked up by key, resolved once for each language.
 
-    if game_id == GameIDs.TH06:
-        if shot_id == "ReimuA":
-            return pgettext("th06", "Reimu A")
-        elif shot_id == "ReimuB":
-            return pgettext("th06", "Reimu B")
-        elif shot_id == "MarisaA":
-            return pgettext("th06", "Marisa A")
-        elif shot_id == "MarisaB":
-            return pgettext("th06", "Marisa B")
-
-    if game_id == GameIDs.TH07:
-        if shot_id == "ReimuA":
-            return pgettext("th07", "Reimu A")
-        if shot_id == "ReimuB":
-            return pgettext("th07", "Reimu B")
-        if shot_id == "MarisaA":
-            return pgettext("th07", "Marisa A")
-        if shot_id == "MarisaB":
-            return pgettext("th07", "Marisa B")
-        if shot_id == "SakuyaA":
-            return pgettext("th07", "Sakuya A")
-        if shot_id == "SakuyaB":
-            return pgettext("th07", "Sakuya B")
-        return shot_id
+    The names for every game are resolved the first time the table is used in
+    a language, so that afterwards, looking one up is a single dict lookup
+    rather than a call to gettext.
 
-    if game_id == GameIDs.TH08:
-        if shot_id == "Reimu & Yukari":
-            return pgettext("th08", "Reimu & Yukari")
-        if shot_id == "Marisa & Alice":
-            return pgettext("th08", "Marisa & Alice")
-        if shot_id == "Sakuya & Remilia":
-            return pgettext("th08", "Sakuya & Remilia")
-        if shot_id == "Youmu & Yuyuko":
-            return pgettext("th08", "Youmu & Yuyuko")
-        if shot_id == "Reimu":
-            return pgettext("th08", "Reimu")
-        if shot_id == "Yukari":
-            return pgettext("th08", "Yukari")
-        if shot_id == "Marisa":
-            return pgettext("th08", "Marisa")
-        if shot_id == "Alice":
-            return pgettext("th08", "Alice")
-        if shot_id == "Sakuya":
-            return pgettext("th08", "Sakuya")
-        if shot_id == "Remilia":
-            return pgettext("th08", "Remilia")
-        if shot_id == "Youmu":
-            return pgettext("th08", "Youmu")
-        if shot_id == "Yuyuko":
-            return pgettext("th08", "Yuyuko")
-        return shot_id
+    Args:
+        build: Returns every entry in the table, with lazily translated
+            strings (or None) as values.
+    """
 
-    if game_id == GameIDs.TH09:
-        if shot_id == "Reimu":
-            return pgettext(
-                "th09",
-                "Reimu",
-            )
-        if shot_id == "Marisa":
-            return pgettext(
-                "th09",
-                "Marisa",
-            )
-        if shot_id == "Sakuya":
-            return pgettext(
-                "th09",
-                "Sakuya",
-            )
-        if shot_id == "Youmu":
-            return pgettext(
-                "th09",
-                "Youmu",
-            )
-        if shot_id == "Reisen":
-            return pgettext(
-                "th09",
-                "Reisen",
-            )
-        if shot_id == "Cirno":
-            return pgettext(
-                "th09",
-                "Cirno",
-            )
-        if shot_id == "Lyrica":
-            return pgettext(
-                "th09",
-                "Lyrica",
-            )
-        if shot_id == "Mystia":
-            return pgettext(
-                "th09",
-                "Mystia",
-            )
-        if shot_id == "Tewi":
-            return pgettext(
-                "th09",
-                "Tewi",
-            )
-        if shot_id == "Yuuka":
-            return pgettext(
-                "th09",
-                "Yuuka",
-            )
-        if shot_id == "Aya":
-            return pgettext(
-                "th09",
-                "Aya",
-            )
-        if shot_id == "Medicine":
-            return pgettext(
-                "th09",
-                "Medicine",
-            )
-        if shot_id == "Komachi":
-            return pgettext(
-                "th09",
-                "Komachi",
-            )
-        if shot_id == "Eiki":
-            return pgettext(
-                "th09",
-                "Eiki",
-            )
-        if shot_id == "Merlin":
-            return pgettext(
-                "th09",
-                "Merlin",
-            )
-        if shot_id == "Lunasa":
-            return pgettext("th09", "Lunasa")
-        return shot_id
+    def __init__(self, build: Callable[[], dict[tuple, Any]]):
+        self._build = build
+        self._by_language: dict[Optional[str], dict[tuple, Optional[str]]] = {}
 
-    if game_id == GameIDs.TH095:
-        if shot_id == "Aya":
-            return pgettext("th095", "Aya")
-
-    if game_id == GameIDs.TH10:
-        if shot_id == "ReimuA":
-            return pgettext("th10", "Reimu A")
-        elif shot_id == "ReimuB":
-            return pgettext("th10", "Reimu B")
-        elif shot_id == "ReimuC":
-            return pgettext("th10", "Reimu C")
-        elif shot_id == "MarisaA":
-            return pgettext("th10", "Marisa A")
-        elif shot_id == "MarisaB":
-            return pgettext("th10", "Marisa B")
-        elif shot_id == "MarisaC":
-            return pgettext("th10", "Marisa C")
-
-    if game_id == GameIDs.TH11:
-        if shot_id == "ReimuA":
-            return pgettext("th11", "Reimu A")
-        elif shot_id == "ReimuB":
-            return pgettext("th11", "Reimu B")
-        elif shot_id == "ReimuC":
-            return pgettext("th11", "Reimu C")
-        elif shot_id == "MarisaA":
-            return pgettext("th11", "Marisa A")
-        elif shot_id == "MarisaB":
-            return pgettext("th11", "Marisa B")
-        elif shot_id == "MarisaC":
-            return pgettext("th11", "Marisa C")
-
-    if game_id == GameIDs.TH12:
-        if shot_id == "ReimuA":
-            return pgettext("th12", "Reimu A")
-        elif shot_id == "ReimuB":
-            return pgettext("th12", "Reimu B")
-        elif shot_id == "MarisaA":
-            return pgettext("th12", "Marisa A")
-        elif shot_id == "MarisaB":
-            return pgettext("th12", "Marisa B")
-        elif shot_id == "SanaeA":
-            return pgettext("th12", "Sanae A")
-        elif shot_id == "SanaeB":
-            return pgettext("th12", "Sanae B")
-
-    if game_id == GameIDs.TH128:
-        if shot_id == "Cirno":
-            return pgettext("th128", "Cirno")
-
-    if game_id == GameIDs.TH13:
-        if shot_id == "Reimu":
-            return pgettext("th13", "Reimu")
-        elif shot_id == "Marisa":
-            return pgettext("th13", "Marisa")
-        elif shot_id == "Sanae":
-            return pgettext("th13", "Sanae")
-        elif shot_id == "Youmu":
-            return pgettext("th13", "Youmu")
-
-    if game_id == GameIDs.TH14:
-        if shot_id == "ReimuA":
-            return pgettext("th14", "Reimu A")
-        elif shot_id == "ReimuB":
-            return pgettext("th14", "Reimu B")
-        elif shot_id == "MarisaA":
-            return pgettext("th14", "Marisa A")
-        elif shot_id == "MarisaB":
-            return pgettext("th14", "Marisa B")
-        elif shot_id == "SakuyaA":
-            return pgettext("th14", "Sakuya A")
-        elif shot_id == "SakuyaB":
-            return pgettext("th14", "Sakuya B")
-
-    if game_id == GameIDs.TH15:
-        if shot_id == "Reimu":
-            return pgettext("th15", "Reimu")
-        elif shot_id == "Marisa":
-            return pgettext("th15", "Marisa")
-        elif shot_id == "Sanae":
-            return pgettext("th15", "Sanae")
-        elif shot_id == "Reisen":
-            return pgettext("th15", "Reisen")
-
-    if game_id == GameIDs.TH16:
-        if shot_id == "Reimu":
-            return pgettext("th16", "Reimu")
-        elif shot_id == "ReimuSpring":
-            return pgettext("th16", "Reimu Spring")
-        elif shot_id == "ReimuSummer":
-            return pgettext("th16", "Reimu Summer")
-        elif shot_id == "ReimuAutumn":
-            return pgettext("th16", "Reimu Autumn")
-        elif shot_id == "ReimuWinter":
-            return pgettext("th16", "Reimu Winter")
-        elif shot_id == "Cirno":
-            return pgettext("th16", "Cirno")
-        elif shot_id == "CirnoSpring":
-            return pgettext("th16", "Cirno Spring")
-        elif shot_id == "CirnoSummer":
-            return pgettext("th16", "Cirno Summer")
-        elif shot_id == "CirnoAutumn":
-            return pgettext("th16", "Cirno Autumn")
-        elif shot_id == "CirnoWinter":
-            return pgettext("th16", "Cirno Winter")
-        elif shot_id == "Aya":
-            return pgettext("th16", "Aya")
-        elif shot_id == "AyaSpring":
-            return pgettext("th16", "Aya Spring")
-        elif shot_id == "AyaSummer":
-            return pgettext("th16", "Aya Summer")
-        elif shot_id == "AyaAutumn":
-            return pgettext("th16", "Aya Autumn")
-        elif shot_id == "AyaWinter":
-            return pgettext("th16", "Aya Winter")
-        elif shot_id == "Marisa":
-            return pgettext("th16", "Marisa")
-        elif shot_id == "MarisaSpring":
-            return pgettext("th16", "Marisa Spring")
-        elif shot_id == "MarisaSummer":
-            return pgettext("th16", "Marisa Summer")
-        elif shot_id == "MarisaAutumn":
-            return pgettext("th16", "Marisa Autumn")
-        elif shot_id == "MarisaWinter":
-            return pgettext("th16", "Marisa Winter")
-
-    if game_id == GameIDs.TH17:
-        if shot_id == "ReimuWolf":
-            return pgettext("th17", "Reimu Wolf")
-        elif shot_id == "ReimuOtter":
-            return pgettext("th17", "Reimu Otter")
-        elif shot_id == "ReimuEagle":
-            return pgettext("th17", "Reimu Eagle")
-        elif shot_id == "MarisaWolf":
-            return pgettext("th17", "Marisa Wolf")
-        elif shot_id == "MarisaOtter":
-            return pgettext("th17", "Marisa Otter")
-        elif shot_id == "MarisaEagle":
-            return pgettext("th17", "Marisa Eagle")
-        elif shot_id == "YoumuWolf":
-            return pgettext("th17", "Youmu Wolf")
-        elif shot_id == "YoumuOtter":
-            return pgettext("th17", "Youmu Otter")
-        elif shot_id == "YoumuEagle":
-            return pgettext("th17", "Youmu Eagle")
-
-    if game_id == GameIDs.TH18:
-        if shot_id == "Reimu":
-            return pgettext("th18", "Reimu")
-        elif shot_id == "Marisa":
-            return pgettext("th18", "Marisa")
-        elif shot_id == "Sakuya":
-            return pgettext("th18", "Sakuya")
-        elif shot_id == "Sanae":
-            return pgettext("th18", "Sanae")
+    def Get(self) -> dict[tuple, Optional[str]]:
+        language = translation.get_language()
+        table = self._by_language.get(language)
+        if table is None:
+            table = {
+                key: None if name is None else str(name)
+                for key, name in self._build().items()
+            }
+            self._by_language[language] = table
+        return table
 
-    if game_id == GameIDs.TH20:
-        match shot_id:
-            case "ReimuRed":
-                return pgettext("th20", "ReimuRed")
-            case "ReimuRed2":
-                return pgettext("th20", "ReimuRed2")
-            case "ReimuBlue":
-                return pgettext("th20", "ReimuBlue")
-            case "ReimuBlue2":
-                return pgettext("th20", "ReimuBlue2")
-            case "ReimuYellow":
-                return pgettext("th20", "ReimuYellow")
-            case "ReimuYellow2":
-                return pgettext("th20", "ReimuYellow2")
-            case "ReimuGreen":
-                return pgettext("th20", "ReimuGreen")
-            case "ReimuGreen2":
-                return pgettext("th20", "ReimuGreen2")
-            case "MarisaRed":
-                return pgettext("th20", "MarisaRed")
-            case "MarisaRed2":
-                return pgettext("th20", "MarisaRed2")
-            case "MarisaBlue":
-                return pgettext("th20", "MarisaBlue")
-            case "MarisaBlue2":
-                return pgettext("th20", "MarisaBlue2")
-            case "MarisaYellow":
-                return pgettext("th20", "MarisaYellow")
-            case "MarisaYellow2":
-                return pgettext("th20", "MarisaYellow2")
-            case "MarisaGreen":
-                return pgettext("th20", "MarisaGreen")
-            case "MarisaGreen2":
-                return pgettext("th20", "MarisaGreen2")
 
-    if game_id == GameIDs.ALCO:
-        if shot_id == "Isami":
-            return pgettext("alco", "Isami")
+_SHOT_NAMES = immutabledict(
+    {
+        GameIDs.TH01: {
+            "Reimu": pgettext_lazy("th01", "Reimu"),
+        },
+        GameIDs.TH02: {
+            "ReimuA": pgettext_lazy("th02", "Mobility"),
+            "ReimuB": pgettext_lazy("th02", "Defensive"),
+            "ReimuC": pgettext_lazy("th02", "Offensive"),
+        },
+        GameIDs.TH03: {
+            "Reimu": pgettext_lazy("th03", "Reimu"),
+            "Mima": pgettext_lazy("th03", "Mima"),
+            "Marisa": pgettext_lazy("th03", "Marisa"),
+            "Ellen": pgettext_lazy("th03", "Ellen"),
+            "Kotohime": pgettext_lazy("th03", "Kotohime"),
+            "Kana": pgettext_lazy("th03", "Kana"),
+            "Rikako": pgettext_lazy("th03", "Rikako"),
+            "Chiyuri": pgettext_lazy("th03", "Chiyuri"),
+            "Yumemi": pgettext_lazy("th03", "Yumemi"),
+        },
+        GameIDs.TH04: {
+            "ReimuA": pgettext_lazy("th04", "Reimu A"),
+            "ReimuB": pgettext_lazy("th04", "Reimu B"),
+            "MarisaA": pgettext_lazy("th04", "Marisa A"),
+            "MarisaB": pgettext_lazy("th04", "Marisa B"),
+        },
+        GameIDs.TH05: {
+            "Reimu": pgettext_lazy("th05", "Reimu"),
+            "Marisa": pgettext_lazy("th05", "Marisa"),
+            "Mima": pgettext_lazy("th05", "Mima"),
+            "Yuuka": pgettext_lazy("th05", "Yuuka"),
+        },
+        GameIDs.TH06: {
+            "ReimuA": pgettext_lazy("th06", "Reimu A"),
+            "ReimuB": pgettext_lazy("th06", "Reimu B"),
+            "MarisaA": pgettext_lazy("th06", "Marisa A"),
+            "MarisaB": pgettext_lazy("th06", "Marisa B"),
+        },
+        GameIDs.TH07: {
+            "ReimuA": pgettext_lazy("th07", "Reimu A"),
+            "ReimuB": pgettext_lazy("th07", "Reimu B"),
+            "MarisaA": pgettext_lazy("th07", "Marisa A"),
+            "MarisaB": pgettext_lazy("th07", "Marisa B"),
+            "SakuyaA": pgettext_lazy("th07", "Sakuya A"),
+            "SakuyaB": pgettext_lazy("th07", "Sakuya B"),
+        },
+        GameIDs.TH08: {
+            "Reimu & Yukari": pgettext_lazy("th08", "Reimu & Yukari"),
+            "Marisa & Alice": pgettext_lazy("th08", "Marisa & Alice"),
+            "Sakuya & Remilia": pgettext_lazy("th08", "Sakuya & Remilia"),
+            "Youmu & Yuyuko": pgettext_lazy("th08", "Youmu & Yuyuko"),
+            "Reimu": pgettext_lazy("th08", "Reimu"),
+            "Yukari": pgettext_lazy("th08", "Yukari"),
+            "Marisa": pgettext_lazy("th08", "Marisa"),
+            "Alice": pgettext_lazy("th08", "Alice"),
+            "Sakuya": pgettext_lazy("th08", "Sakuya"),
+            "Remilia": pgettext_lazy("th08", "Remilia"),
+            "Youmu": pgettext_lazy("th08", "Youmu"),
+            "Yuyuko": pgettext_lazy("th08", "Yuyuko"),
+        },
+        GameIDs.TH09: {
+            "Reimu": pgettext_lazy("th09", "Reimu"),
+            "Marisa": pgettext_lazy("th09", "Marisa"),
+            "Sakuya": pgettext_lazy("th09", "Sakuya"),
+            "Youmu": pgettext_lazy("th09", "Youmu"),
+            "Reisen": pgettext_lazy("th09", "Reisen"),
+            "Cirno": pgettext_lazy("th09", "Cirno"),
+            "Lyrica": pgettext_lazy("th09", "Lyrica"),
+            "Mystia": pgettext_lazy("th09", "Mystia"),
+            "Tewi": pgettext_lazy("th09", "Tewi"),
+            "Yuuka": pgettext_lazy("th09", "Yuuka"),
+            "Aya": pgettext_lazy("th09", "Aya"),
+            "Medicine": pgettext_lazy("th09", "Medicine"),
+            "Komachi": pgettext_lazy("th09", "Komachi"),
+            "Eiki": pgettext_lazy("th09", "Eiki"),
+            "Merlin": pgettext_lazy("th09", "Merlin"),
+            "Lunasa": pgettext_lazy("th09", "Lunasa"),
+        },
+        GameIDs.TH095: {
+            "Aya": pgettext_lazy("th095", "Aya"),
+        },
+        GameIDs.TH10: {
+            "ReimuA": pgettext_lazy("th10", "Reimu A"),
+            "ReimuB": pgettext_lazy("th10", "Reimu B"),
+            "ReimuC": pgettext_lazy("th10", "Reimu C"),
+            "MarisaA": pgettext_lazy("th10", "Marisa A"),
+            "MarisaB": pgettext_lazy("th10", "Marisa B"),
+            "MarisaC": pgettext_lazy("th10", "Marisa C"),
+        },
+        GameIDs.TH11: {
+            "ReimuA": pgettext_lazy("th11", "Reimu A"),
+            "ReimuB": pgettext_lazy("th11", "Reimu B"),
+            "ReimuC": pgettext_lazy("th11", "Reimu C"),
+            "MarisaA": pgettext_lazy("th11", "Marisa A"),
+            "MarisaB": pgettext_lazy("th11", "Marisa B"),
+            "MarisaC": pgettext_lazy("th11", "Marisa C"),
+        },
+        GameIDs.TH12: {
+            "ReimuA": pgettext_lazy("th12", "Reimu A"),
+            "ReimuB": pgettext_lazy("th12", "Reimu B"),
+            "MarisaA": pgettext_lazy("th12", "Marisa A"),
+            "MarisaB": pgettext_lazy("th12", "Marisa B"),
+            "SanaeA": pgettext_lazy("th12", "Sanae A"),
+            "SanaeB": pgettext_lazy("th12", "Sanae B"),
+        },
+        GameIDs.TH128: {
+            "Cirno": pgettext_lazy("th128", "Cirno"),
+        },
+        GameIDs.TH13: {
+            "Reimu": pgettext_lazy("th13", "Reimu"),
+            "Marisa": pgettext_lazy("th13", "Marisa"),
+            "Sanae": pgettext_lazy("th13", "Sanae"),
+            "Youmu": pgettext_lazy("th13", "Youmu"),
+        },
+        GameIDs.TH14: {
+            "ReimuA": pgettext_lazy("th14", "Reimu A"),
+            "ReimuB": pgettext_lazy("th14", "Reimu B"),
+            "MarisaA": pgettext_lazy("th14", "Marisa A"),
+            "MarisaB": pgettext_lazy("th14", "Marisa B"),
+            "SakuyaA": pgettext_lazy("th14", "Sakuya A"),
+            "SakuyaB": pgettext_lazy("th14", "Sakuya B"),
+        },
+        GameIDs.TH15: {
+            "Reimu": pgettext_lazy("th15", "Reimu"),
+            "Marisa": pgettext_lazy("th15", "Marisa"),
+            "Sanae": pgettext_lazy("th15", "Sanae"),
+            "Reisen": pgettext_lazy("th15", "Reisen"),
+        },
+        GameIDs.TH16: {
+            "Reimu": pgettext_lazy("th16", "Reimu"),
+            "ReimuSpring": pgettext_lazy("th16", "Reimu Spring"),
+            "ReimuSummer": pgettext_lazy("th16", "Reimu Summer"),
+            "ReimuAutumn": pgettext_lazy("th16", "Reimu Autumn"),
+            "ReimuWinter": pgettext_lazy("th16", "Reimu Winter"),
+            "Cirno": pgettext_lazy("th16", "Cirno"),
+            "CirnoSpring": pgettext_lazy("th16", "Cirno Spring"),
+            "CirnoSummer": pgettext_lazy("th16", "Cirno Summer"),
+            "CirnoAutumn": pgettext_lazy("th16", "Cirno Autumn"),
+            "CirnoWinter": pgettext_lazy("th16", "Cirno Winter"),
+            "Aya": pgettext_lazy("th16", "Aya"),
+            "AyaSpring": pgettext_lazy("th16", "Aya Spring"),
+            "AyaSummer": pgettext_lazy("th16", "Aya Summer"),
+            "AyaAutumn": pgettext_lazy("th16", "Aya Autumn"),
+            "AyaWinter": pgettext_lazy("th16", "Aya Winter"),
+            "Marisa": pgettext_lazy("th16", "Marisa"),
+            "MarisaSpring": pgettext_lazy("th16", "Marisa Spring"),
+            "MarisaSummer": pgettext_lazy("th16", "Marisa Summer"),
+            "MarisaAutumn": pgettext_lazy("th16", "Marisa Autumn"),
+            "MarisaWinter": pgettext_lazy("th16", "Marisa Winter"),
+        },
+        GameIDs.TH17: {
+            "ReimuWolf": pgettext_lazy("th17", "Reimu Wolf"),
+            "ReimuOtter": pgettext_lazy("th17", "Reimu Otter"),
+            "ReimuEagle": pgettext_lazy("th17", "Reimu Eagle"),
+            "MarisaWolf": pgettext_lazy("th17", "Marisa Wolf"),
+            "MarisaOtter": pgettext_lazy("th17", "Marisa Otter"),
+            "MarisaEagle": pgettext_lazy("th17", "Marisa Eagle"),
+            "YoumuWolf": pgettext_lazy("th17", "Youmu Wolf"),
+            "YoumuOtter": pgettext_lazy("th17", "Youmu Otter"),
+            "YoumuEagle": pgettext_lazy("th17", "Youmu Eagle"),
+        },
+        GameIDs.TH18: {
+            "Reimu": pgettext_lazy("th18", "Reimu"),
+            "Marisa": pgettext_lazy("th18", "Marisa"),
+            "Sakuya": pgettext_lazy("th18", "Sakuya"),
+            "Sanae": pgettext_lazy("th18", "Sanae"),
+        },
+        GameIDs.TH20: {
+            "ReimuRed": pgettext_lazy("th20", "ReimuRed"),
+            "ReimuRed2": pgettext_lazy("th20", "ReimuRed2"),
+            "ReimuBlue": pgettext_lazy("th20", "ReimuBlue"),
+            "ReimuBlue2": pgettext_lazy("th20", "ReimuBlue2"),
+            "ReimuYellow": pgettext_lazy("th20", "ReimuYellow"),
+            "ReimuYellow2": pgettext_lazy("th20", "ReimuYellow2"),
+            "ReimuGreen": pgettext_lazy("th20", "ReimuGreen"),
+            "ReimuGreen2": pgettext_lazy("th20", "ReimuGreen2"),
+            "MarisaRed": pgettext_lazy("th20", "MarisaRed"),
+            "MarisaRed2": pgettext_lazy("th20", "MarisaRed2"),
+            "MarisaBlue": pgettext_lazy("th20", "MarisaBlue"),
+            "MarisaBlue2": pgettext_lazy("th20", "MarisaBlue2"),
+            "MarisaYellow": pgettext_lazy("th20", "MarisaYellow"),
+            "MarisaYellow2": pgettext_lazy("th20", "MarisaYellow2"),
+            "MarisaGreen": pgettext_lazy("th20", "MarisaGreen"),
+            "MarisaGreen2": pgettext_lazy("th20", "MarisaGreen2"),
+        },
+        GameIDs.ALCO: {
+            "Isami": pgettext_lazy("alco", "Isami"),
+        },
+    }
+)
+
+# Unknown shots for these games are shown as their IDs rather than as bugs.
+_SHOT_ID_FALLBACK_GAMES = frozenset({GameIDs.TH07, GameIDs.TH08, GameIDs.TH09})
+
+_CHARACTER_PREFIXES = immutabledict(
+    {
+        GameIDs.TH16: (
+            ("Reimu", pgettext_lazy("th16", "Reimu")),
+            ("Cirno", pgettext_lazy("th16", "Cirno")),
+            ("Aya", pgettext_lazy("th16", "Aya")),
+            ("Marisa", pgettext_lazy("th16", "Marisa")),
+        ),
+        GameIDs.TH17: (
+            ("Reimu", pgettext_lazy("th17", "Reimu")),
+            ("Marisa", pgettext_lazy("th17", "Marisa")),
+            ("Youmu", pgettext_lazy("th17", "Youmu")),
+        ),
+        GameIDs.TH20: (
+            ("Reimu", pgettext_lazy("th20", "Reimu")),
+            ("Marisa", pgettext_lazy("th20", "Marisa")),
+        ),
+    }
+)
+
+_SUBSHOT_SUFFIXES = immutabledict(
+    {
+        GameIDs.TH16: (
+            ("Spring", pgettext_lazy("th16", "Spring")),
+            ("Summer", pgettext_lazy("th16", "Summer")),
+            ("Autumn", pgettext_lazy("th16", "Autumn")),
+            ("Winter", pgettext_lazy("th16", "Winter")),
+        ),
+        GameIDs.TH17: (
+            ("Wolf", pgettext_lazy("th17", "Wolf")),
+            ("Otter", pgettext_lazy("th17", "Otter")),
+            ("Eagle", pgettext_lazy("th17", "Eagle")),
+        ),
+    }
+)
+
+_TH20_STONES = immutabledict(
+    {
+        "Red": pgettext_lazy("th20", "Red"),
+        "Red2": pgettext_lazy("th20", "Red2"),
+        "Blue": pgettext_lazy("th20", "Blue"),
+        "Blue2": pgettext_lazy("th20", "Blue2"),
+        "Yellow": pgettext_lazy("th20", "Yellow"),
+        "Yellow2": pgettext_lazy("th20", "Yellow2"),
+        "Green": pgettext_lazy("th20", "Green"),
+        "Green2": pgettext_lazy("th20", "Green2"),
+    }
+)
+
+_ROUTE_NAMES = immutabledict(
+    {
+        GameIDs.TH01: {
+            "Jigoku": pgettext_lazy("th01", "Jigoku"),
+            "Makai": pgettext_lazy("th01", "Makai"),
+        },
+        GameIDs.TH08: {
+            "Final A": pgettext_lazy("th08", "Final A"),
+            "Final B": pgettext_lazy("th08", "Final B"),
+        },
+        GameIDs.TH128: {
+            "A-1": pgettext_lazy("th128", "A-1"),
+            "A-2": pgettext_lazy("th128", "A-2"),
+            "B-1": pgettext_lazy("th128", "B-1"),
+            "B-2": pgettext_lazy("th128", "B-2"),
+            "C-1": pgettext_lazy("th128", "C-1"),
+            "C-2": pgettext_lazy("th128", "C-2"),
+            "Extra": pgettext_lazy("th128", "Extra"),
+        },
+    }
+)
+
+_DIFFICULTY_NAMES = (
+    gettext_lazy("Easy"),
+    gettext_lazy("Normal"),
+    gettext_lazy("Hard"),
+    gettext_lazy("Lunatic"),
+    gettext_lazy("Extra"),
+)
+
+_EXTRA_DIFFICULTY_NAMES = immutabledict(
+    {
+        GameIDs.TH07: {5: gettext_lazy("Phantasm")},
+        GameIDs.TH13: {5: gettext_lazy("Overdrive")},
+    }
+)
+
+# Every game other than these has the usual difficulties.
+_GAMES_WITHOUT_DIFFICULTIES = frozenset({GameIDs.TH095, GameIDs.ALCO})
+
+
+def _BuildShotNames() -> dict[tuple, Any]:
+    return {
+        (game_id, shot_id): name
+        for game_id, names in _SHOT_NAMES.items()
+        for shot_id, name in names.items()
+    }
+
+
+def _BuildCharacterNames() -> dict[tuple, Any]:
+    return {
+        (game_id, shot_id): _FindCharacterName(game_id, shot_id)
+        for game_id in _CHARACTER_PREFIXES
+        for shot_id in _SHOT_NAMES[game_id]
+    }
+
+
+def _BuildSubshotNames() -> dict[tuple, Any]:
+    return {
+        (game_id, shot_id): _FindSubshotName(game_id, shot_id)
+        for game_id in (GameIDs.TH16, GameIDs.TH17, GameIDs.TH20)
+        for shot_id in _SHOT_NAMES[game_id]
+    }
 
+
+def _BuildRouteNames() -> dict[tuple, Any]:
+    return {
+        (game_id, route_id): name
+        for game_id, names in _ROUTE_NAMES.items()
+        for route_id, name in names.items()
+    }
+
+
+def _BuildDifficultyNames() -> dict[tuple, Any]:
+    names = {}
+    for game_id in _GAME_NAMES:
+        if game_id in _GAMES_WITHOUT_DIFFICULTIES:
+            continue
+        for difficulty, name in enumerate(_DIFFICULTY_NAMES):
+            names[(game_id, difficulty)] = name
+        for difficulty, name in _EXTRA_DIFFICULTY_NAMES.get(game_id, {}).items():
+            names[(game_id, difficulty)] = name
+    return names
+
+
+_shot_names = _TranslationTable(_BuildShotNames)
+_character_names = _TranslationTable(_BuildCharacterNames)
+_subshot_names = _TranslationTable(_BuildSubshotNames)
+_route_names = _TranslationTable(_BuildRouteNames)
+_difficulty_names = _TranslationTable(_BuildDifficultyNames)
+
+
+def GetShotName(game_id: str, shot_id: str) -> str:
+    name = _shot_names.Get().get((game_id, shot_id))
+    if name is not None:
+        return name
+    if game_id in _SHOT_ID_FALLBACK_GAMES:
+        return shot_id
     return "Bug shot"
 
 
 def GetCharacterName(game_id: str, shot_id: str) -> str:
-    if game_id == GameIDs.TH16:
-        if shot_id.startswith("Reimu"):
-            return pgettext("th16", "Reimu")
-        elif shot_id.startswith("Cirno"):
-            return pgettext("th16", "Cirno")
-        elif shot_id.startswith("Aya"):
-            return pgettext("th16", "Aya")
-        elif shot_id.startswith("Marisa"):
-            return pgettext("th16", "Marisa")
-    if game_id == GameIDs.TH17:
-        if shot_id.startswith("Reimu"):
-            return pgettext("th17", "Reimu")
-        elif shot_id.startswith("Marisa"):
-            return pgettext("th17", "Marisa")
-        elif shot_id.startswith("Youmu"):
-            return pgettext("th17", "Youmu")
-    if game_id == GameIDs.TH20:
-        if shot_id.startswith("Reimu"):
-            return pgettext("th20", "Reimu")
-        elif shot_id.startswith("Marisa"):
-            return pgettext("th20", "Marisa")
+    try:
+        return _character_names.Get()[(game_id, shot_id)]
+    except KeyError:
+        return str(_FindCharacterName(game_id, shot_id))
+
+
+def GetSubshotName(game_id: str, shot_id: str) -> Optional[str]:
+    try:
+        return _subshot_names.Get()[(game_id, shot_id)]
+    except KeyError:
+        name = _FindSubshotName(game_id, shot_id)
+        return None if name is None else str(name)
+
 
+def _FindCharacterName(game_id: str, shot_id: str) -> Any:
+    for prefix, name in _CHARACTER_PREFIXES.get(game_id, ()):
+        if shot_id.startswith(prefix):
+            return name
     return "Character name not implemented"
 
 
-def GetSubshotName(game_id: str, shot_id: str) -> Optional[str]:
-    if game_id == GameIDs.TH16:
-        if shot_id.endswith("Spring"):
-            return pgettext("th16", "Spring")
-        elif shot_id.endswith("Summer"):
-            return pgettext("th16", "Summer")
-        elif shot_id.endswith("Autumn"):
-            return pgettext("th16", "Autumn")
-        elif shot_id.endswith("Winter"):
-            return pgettext("th16", "Winter")
-        else:
+def _FindSubshotName(game_id: str, shot_id: str) -> Any:
+    if game_id in _SUBSHOT_SUFFIXES:
+        for suffix, name in _SUBSHOT_SUFFIXES[game_id]:
+            if shot_id.endswith(suffix):
+                return name
+        # TH16's extra stage shots have no season.
+        if game_id == GameIDs.TH16:
             return None
-    if game_id == GameIDs.TH17:
-        if shot_id.endswith("Wolf"):
-            return pgettext("th17", "Wolf")
-        elif shot_id.endswith("Otter"):
-            return pgettext("th17", "Otter")
-        elif shot_id.endswith("Eagle"):
-            return pgettext("th17", "Eagle")
     if game_id == GameIDs.TH20:
-        if shot_id.startswith("Reimu"):
-            main_stone = shot_id.removeprefix("Reimu")
-        elif shot_id.startswith("Marisa"):
-            main_stone = shot_id.removeprefix("Marisa")
+        for prefix, _name in _CHARACTER_PREFIXES[GameIDs.TH20]:
+            if shot_id.startswith(prefix):
+                main_stone = shot_id.removeprefix(prefix)
+                break
         else:
-            return pgettext("th20", "Buggy subshot")
-
-        match main_stone:
-            case "Red":
-                return pgettext("th20", "Red")
-            case "Red2":
-                return pgettext("th20", "Red2")
-            case "Blue":
-                return pgettext("th20", "Blue")
-            case "Blue2":
-                return pgettext("th20", "Blue2")
-            case "Yellow":
-                return pgettext("th20", "Yellow")
-            case "Yellow2":
-                return pgettext("th20", "Yellow2")
-            case "Green":
-                return pgettext("th20", "Green")
-            case "Green2":
-                return pgettext("th20", "Green2")
+            return pgettext_lazy("th20", "Buggy subshot")
+        if main_stone in _TH20_STONES:
+            return _TH20_STONES[main_stone]
 
     return "Subshot not implemented"
 
 
 def GetRouteName(game_id: str, route_id: str):
-    if game_id == GameIDs.TH01:
-        if route_id == "Jigoku":
-            return pgettext("th01", "Jigoku")
-        elif route_id == "Makai":
-            return pgettext("th01", "Makai")
-    if game_id == GameIDs.TH08:
-        if route_id == "Final A":
-            return pgettext("th08", "Final A")
-        elif route_id == "Final B":
-            return pgettext("th08", "Final B")
-    if game_id == GameIDs.TH128:
-        if route_id == "A-1":
-            return pgettext("th128", "A-1")
-        elif route_id == "A-2":
-            return pgettext("th128", "A-2")
-        elif route_id == "B-1":
-            return pgettext("th128", "B-1")
-        elif route_id == "B-2":
-            return pgettext("th128", "B-2")
-        elif route_id == "C-1":
-            return pgettext("th128", "C-1")
-        elif route_id == "C-2":
-            return pgettext("th128", "C-2")
-        elif route_id == "Extra":
-            return pgettext("th128", "Extra")
+    name = _route_names.Get().get((game_id, route_id))
+    if name is not None:
+        return name
     return "Bug route"
 
 
@@ -700,47 +639,11 @@ def GetDifficultyName(
     game_id: str,
     difficulty: int | None,
 ) -> str:
-    if game_id in {
-        GameIDs.TH01,
-        GameIDs.TH02,
-        GameIDs.TH03,
-        GameIDs.TH04,
-        GameIDs.TH05,
-        GameIDs.TH06,
-        GameIDs.TH07,
-        GameIDs.TH08,
-        GameIDs.TH09,
-        GameIDs.TH10,
-        GameIDs.TH11,
-        GameIDs.TH12,
-        GameIDs.TH128,
-        GameIDs.TH13,
-        GameIDs.TH14,
-        GameIDs.TH15,
-        GameIDs.TH16,
-        GameIDs.TH17,
-        GameIDs.TH18,
-        GameIDs.TH20,
-    }:
-        if difficulty == 0:
-            return _("Easy")
-        elif difficulty == 1:
-            return _("Normal")
-        elif difficulty == 2:
-            return _("Hard")
-        elif difficulty == 3:
-            return _("Lunatic")
-        elif difficulty == 4:
-            return _("Extra")
-    if game_id in {GameIDs.TH07}:
-        if difficulty == 5:
-            return _("Phantasm")
-    if game_id in {GameIDs.TH13}:
-        if difficulty == 5:
-            return _("Overdrive")
-    if game_id in {GameIDs.ALCO}:
+    name = _difficulty_names.Get().get((game_id, difficulty))
+    if name is not None:
+        return name
+    if game_id == GameIDs.ALCO:
         return _("No difficulty")
-
     return _("Bug difficulty")
 
 
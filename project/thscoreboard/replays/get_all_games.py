@@ -1,5 +1,4 @@
-from typing import Iterable
-
+from replays import constant_helpers
 from replays import game_ids
 from replays import models
 
@@ -45,18 +44,15 @@ OTHER_GAME_IDS = [
 
 
 def get_pc98_games() -> list[models.Game]:
-    all_games: Iterable[models.Game] = models.Game.objects.all()
-    return [game for game in all_games if game.game_id in PC98_GAME_IDS]
+    return [game for game in _all_games() if game.game_id in PC98_GAME_IDS]
 
 
 def get_windows_games() -> list[models.Game]:
-    all_games: Iterable[models.Game] = models.Game.objects.all()
-    return [game for game in all_games if game.game_id not in PC98_GAME_IDS]
+    return [game for game in _all_games() if game.game_id not in PC98_GAME_IDS]
 
 
 def get_scene_games() -> list[models.Game]:
-    all_games: Iterable[models.Game] = models.Game.objects.all()
-    return [game for game in all_games if game.game_id in SCENE_GAME_IDS]
+    return [game for game in _all_games() if game.game_id in SCENE_GAME_IDS]
 
 
 def get_all_games_by_category() -> dict[str, list[models.Game]]:
@@ -69,10 +65,10 @@ def get_all_games_by_category() -> dict[str, list[models.Game]]:
         A dict from "category IDs" (strings) to lists of Games. The dictionary
         is ordered in a reasonable order for the games to be listed.
     """
-    all_games_by_id = {g.game_id: g for g in models.Game.objects.all()}
+    constants = constant_helpers.GetConstantModelIndex()
 
     def GamesIn(id_list):
-        return [all_games_by_id[game_id] for game_id in id_list]
+        return [constants.GetGame(game_id) for game_id in id_list]
 
     return {
         "PC-98": GamesIn(PC98_GAME_IDS),
@@ -82,3 +78,9 @@ def get_all_games_by_category() -> dict[str, list[models.Game]]:
         "Scene": GamesIn(SCENE_GAME_IDS),
         "Other": GamesIn(OTHER_GAME_IDS),
     }
+
+
+def _all_games() -> list[models.Game]:
+    # The games come from the in-memory constant index, which is only reloaded
+    # when setup_constant_tables changes them, so this needs no queries.
+    return constant_helpers.GetConstantModelIndex().GetGames()
@@ -1,5 +1,8 @@
 """Contains utility functions to deal with HTTP."""
 
+import re
+from typing import Optional
+
 
 def GetDownloadFileHeaders(filename: str):
     """Returns file headers (as a dict) to suggest downloading a file.
@@ -18,3 +21,50 @@ def GetDownloadFileHeaders(filename: str):
         "Content-Type": "application/octet-stream",
         "Content-Disposition": f'attachment; filename="{filename}"',
     }
+
+
+class RangeNotSatisfiableError(Exception):
+    """The requested byte range lies entirely outside the file."""
+
+
+_BYTE_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def ParseRangeHeader(header: str, size: int) -> Optional[tuple[int, int]]:
+    """Parses a Range header for a file of a given size.
+
+    Only single byte ranges ("bytes=0-99", "bytes=100-" and "bytes=-100") are
+    supported. Anything else, including requests for several ranges at once,
+    is ignored, which RFC 9110 allows; the whole file is sent instead.
+
+    Args:
+        header: The value of the Range header.
+        size: The size of the file, in bytes.
+
+    Returns:
+        The start and (exclusive) end of the requested range, or None if the
+        whole file should be sent.
+
+    Raises:
+        RangeNotSatisfiableError: The range starts past the end of the file.
+    """
+    match = _BYTE_RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # A suffix range: the last N bytes.
+        suffix_length = int(last)
+        if suffix_length == 0:
+            raise RangeNotSatisfiableError()
+        return (max(0, size - suffix_length), size)
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiableError()
+    end = size if not last else min(int(last) + 1, size)
+    return (start, end)
@@ -11,3 +11,31 @@ class HttpUtilTestCase(unittest.TestCase):
         self.assertEqual(
             headers["Content-Disposition"], 'attachment; filename="test123"'
         )
+
+    def testParseRangeHeader(self):
+        self.assertEqual(http_util.ParseRangeHeader("bytes=0-99", 1000), (0, 100))
+        self.assertEqual(http_util.ParseRangeHeader("bytes=900-", 1000), (900, 1000))
+        self.assertEqual(http_util.ParseRangeHeader("bytes=-100", 1000), (900, 1000))
+
+    def testParseRangeHeaderClampsToFileSize(self):
+        self.assertEqual(
+            http_util.ParseRangeHeader("bytes=900-2000", 1000), (900, 1000)
+        )
+        self.assertEqual(http_util.ParseRangeHeader("bytes=-2000", 1000), (0, 1000))
+
+    def testParseRangeHeaderIgnoresUnsupportedRanges(self):
+        for header in [
+            "items=0-99",
+            "bytes=0-9,20-29",
+            "bytes=-",
+            "bytes=99-0",
+            "junk",
+        ]:
+            with self.subTest(header=header):
+                self.assertIsNone(http_util.ParseRangeHeader(header, 1000))
+
+    def testParseRangeHeaderPastEndOfFile(self):
+        with self.assertRaises(http_util.RangeNotSatisfiableError):
+            http_util.ParseRangeHeader("bytes=1000-", 1000)
+        with self.assertRaises(http_util.RangeNotSatisfiableError):
+            http_util.ParseRangeHeader("bytes=-0", 1000)
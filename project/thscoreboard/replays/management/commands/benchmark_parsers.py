@@ -0,0 +1,83 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from replays import parser_benchmark
+from replays.testing import test_replays
+
+
+class Command(BaseCommand):
+    help = """Time how long each replay parser takes, phase by phase.
+
+    By default, this parses the replays used by the tests. Save the results
+    with --output, then pass them to a later run with --baseline to see how a
+    parser change affected performance.
+    """
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            "replays",
+            nargs="*",
+            type=Path,
+            help="Replay files or directories of replay files to parse. Defaults "
+            + "to the test replays.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="How many times to parse each replay. The median time is reported.",
+        )
+        parser.add_argument(
+            "--output",
+            type=Path,
+            help="Save the results to this JSON file.",
+        )
+        parser.add_argument(
+            "--baseline",
+            type=Path,
+            help="Compare the results with this JSON file from an earlier run.",
+        )
+
+    def handle(self, *args, **options):
+        paths = []
+        for path in options["replays"] or [test_replays.TEST_REPLAY_LOCATION]:
+            if path.is_dir():
+                paths.extend(path.glob("*.rpy"))
+            else:
+                paths.append(path)
+
+        run = parser_benchmark.Benchmark(
+            paths, repeat=options["repeat"], log=self.stderr.write
+        )
+
+        self.stdout.write(
+            f"{'game':<6} {'replays':>7} {'parse ms':>9} {'header ms':>9} "
+            + " ".join(f"{p + ' ms':>10}" for p in parser_benchmark.PHASES)
+        )
+        for game, totals in run.GetGameTotals().items():
+            self.stdout.write(
+                f"{game:<6} {totals['replays']:>7} "
+                + f"{totals['parse_seconds'] * 1000:>9.2f} "
+                + f"{totals['header_seconds'] * 1000:>9.2f} "
+                + " ".join(
+                    f"{totals[p] * 1000:>10.2f}" for p in parser_benchmark.PHASES
+                )
+            )
+        peak = max((r.peak_memory for r in run.replays), default=0)
+        self.stdout.write(f"Peak memory for a single parse: {peak / 1024:.0f} KiB")
+
+        if options["baseline"]:
+            baseline = parser_benchmark.BenchmarkRun.FromJson(
+                json.loads(options["baseline"].read_text())
+            )
+            self.stdout.write(f"Compared with {options['baseline']}:")
+            for game, ratio in parser_benchmark.Compare(baseline, run).items():
+                self.stdout.write(f"{game:<6} {(ratio - 1) * 100:+.1f}%")
+
+        if options["output"]:
+            options["output"].write_text(json.dumps(run.ToJson(), indent=2))
+            self.stdout.write(f"Saved results to {options['output']}")
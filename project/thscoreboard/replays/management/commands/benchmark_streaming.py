@@ -0,0 +1,85 @@
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from replays import streaming_benchmark
+
+
+class Command(BaseCommand):
+    help = """Compare how quickly slow clients are served a feed under WSGI and ASGI.
+
+    Many clients fetch the same JSON feed at once, reading the response
+    slowly. Under WSGI, they are served by a fixed number of worker threads;
+    under ASGI, they all share the event loop.
+
+    Only the feeds built from replay rows are streamed: the front page's
+    (/replays/index/json) and each user's (/replays/user/<username>/json).
+    The game scoreboards (/replays/<game>/json) are served whole from a
+    cached snapshot, so they don't measure streaming.
+    """
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            "--path",
+            default="/replays/index/json",
+            help=(
+                "The feed to fetch, optionally with a query string. Use a "
+                + "streamed feed, like /replays/user/<username>/json; game "
+                + "scoreboards are served from a snapshot instead."
+            ),
+        )
+        parser.add_argument(
+            "--clients",
+            type=int,
+            default=50,
+            help="How many clients fetch the feed at once.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="How many WSGI worker threads serve the clients.",
+        )
+        parser.add_argument(
+            "--client-delay",
+            type=float,
+            default=0.05,
+            help="How many seconds each client waits after reading each chunk.",
+        )
+
+    def handle(self, *args, **options):
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost"
+        if host == "*" or host.startswith("."):
+            host = "localhost"
+
+        runs = [
+            streaming_benchmark.BenchmarkWsgi(
+                options["path"],
+                clients=options["clients"],
+                workers=options["workers"],
+                client_delay=options["client_delay"],
+                host=host,
+            ),
+            async_to_sync(streaming_benchmark.BenchmarkAsgi)(
+                options["path"],
+                clients=options["clients"],
+                client_delay=options["client_delay"],
+                host=host,
+            ),
+        ]
+
+        self.stdout.write(
+            f"{'server':<6} {'clients':>7} {'seconds':>8} {'clients/s':>9} "
+            + f"{'KiB/s':>9} statuses"
+        )
+        for run in runs:
+            statuses = ", ".join(
+                f"{status}: {count}" for status, count in sorted(run.statuses.items())
+            )
+            self.stdout.write(
+                f"{run.server:<6} {run.clients:>7} {run.seconds:>8.2f} "
+                + f"{run.ClientsPerSecond():>9.1f} "
+                + f"{run.BytesPerSecond() / 1024:>9.0f} {statuses}"
+            )
@@ -3,6 +3,7 @@ from django.core.management.base import BaseCommand, CommandParser
 from django.db.models import Q
 
 from replays import models
+from replays import replay_ranks
 
 
 class Command(BaseCommand):
@@ -18,5 +19,8 @@ class Command(BaseCommand):
 
 
 def delete_imported_replays() -> None:
-    deleted_count, _ = models.Replay.objects.filter(~Q(imported_username=None)).delete()
+    with replay_ranks.BatchRefresh():
+        deleted_count, _ = models.Replay.objects.filter(
+            ~Q(imported_username=None)
+        ).delete()
     logging.info("Deleted %d replays", deleted_count)
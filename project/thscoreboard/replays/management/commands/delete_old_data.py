@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from replays import models as replay_models
+from replays import replay_storage
 from users import models as user_models
 
 
@@ -19,8 +20,10 @@ def _DeleteExpiredTemporaryData():
     now = timezone.now()
 
     replay_models.TemporaryReplayFile.CleanUp(now)
+    replay_storage.DeleteOrphanedBlobs(now)
     user_models.UnverifiedUser.CleanUp(now)
     user_models.InvitedUser.CleanUp(now)
     user_models.Visits.CleanUp(now)
     user_models.User.CleanUp(now)
+    user_models.User.ClearStaleBanFlags(now)
     user_models.Ban.CleanUp(now)
@@ -1,14 +1,18 @@
-from typing import Optional
+from typing import Iterable, Iterator, Optional, Union
+from concurrent import futures
 from django.core.management.base import BaseCommand, CommandParser
 from datetime import datetime, timezone
+import dataclasses
 import json
+import os
 from pathlib import Path
+import time
 
 from replays import constant_helpers
 from replays import replay_parsing
 from replays import create_replay
 from replays import limits
-from replays import models
+from replays import replay_storage
 
 
 ROYALFLARE_JSON_DIRECTORY_PATH = Path(__file__).parent / "resources" / "royalflare"
@@ -37,11 +41,48 @@ class Command(BaseCommand):
             + "import.\nIf not set, all jsons will be used.",
         )
 
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help="Parse replays in a pool of worker processes and insert them in "
+            + "batches. This is much faster, but unlike the default mode, it "
+            + "skips replays that collide with ghosts instead of replacing them.",
+        )
+
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="In --bulk mode, the number of processes used to parse replays. "
+            + "If 0, replays are parsed in this process.",
+        )
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="In --bulk mode, the number of replays inserted per transaction.",
+        )
+
     def handle(self, *args, **options):
-        main(options["replay_dir"], options["json"])
+        if options["bulk"]:
+            bulk_main(
+                options["replay_dir"],
+                options["json"],
+                workers=options["workers"],
+                batch_size=options["batch_size"],
+                log=self.stdout.write,
+            )
+        else:
+            main(options["replay_dir"], options["json"])
 
 
 def main(replay_dir: str, json_file_arg: Optional[str]) -> None:
+    for info_from_json in _read_json_files(json_file_arg):
+        import_royalflare(info_from_json, Path(replay_dir))
+
+
+def _read_json_files(json_file_arg: Optional[str]) -> Iterator[dict]:
     if json_file_arg is not None:
         json_files = [json_file_arg]
     else:
@@ -49,20 +90,22 @@ def main(replay_dir: str, json_file_arg: Optional[str]) -> None:
 
     for json_file in json_files:
         with open(json_file, encoding="utf-8") as f:
-            all_replay_infos_from_json = json.load(f)
-            for info_from_json in all_replay_infos_from_json:
-                import_royalflare(info_from_json, Path(replay_dir))
+            yield from json.load(f)
 
 
-def import_royalflare(info_from_json: dict, replay_dir: Path) -> None:
-    comment = info_from_json["comment"]
-    replay_path = parse_replay_path_from_json(replay_dir, info_from_json["replay"])
+def _get_created_timestamp(info_from_json: dict) -> datetime:
     if "uploaded" in info_from_json:
-        created_timestamp = parse_timestamp_from_json(info_from_json["uploaded"])
+        return parse_timestamp_from_json(info_from_json["uploaded"])
     else:
         # The first 3 replays ever uploaded on rf do not have an 'uploaded' timestamp.
         # They can be found at the bottom of th08.json
-        created_timestamp = parse_timestamp_from_json(info_from_json["date"])
+        return parse_timestamp_from_json(info_from_json["date"])
+
+
+def import_royalflare(info_from_json: dict, replay_dir: Path) -> None:
+    comment = info_from_json["comment"]
+    replay_path = parse_replay_path_from_json(replay_dir, info_from_json["replay"])
+    created_timestamp = _get_created_timestamp(info_from_json)
     imported_username = info_from_json["player"]
 
     try:
@@ -73,8 +116,7 @@ def import_royalflare(info_from_json: dict, replay_dir: Path) -> None:
         if duplicate is not None:
             raise Exception("This replay already exists")
         replay_info = replay_parsing.Parse(replay_bytes)
-        temp_replay = models.TemporaryReplayFile(user=None, replay=replay_bytes)
-        temp_replay.save()
+        temp_replay = replay_storage.CreateTemporaryReplayFile(None, replay_bytes)
 
         create_replay.PublishNewReplay(
             user=None,
@@ -98,6 +140,162 @@ def import_royalflare(info_from_json: dict, replay_dir: Path) -> None:
             print(e)
 
 
+@dataclasses.dataclass(frozen=True)
+class _ImportTask:
+    replay_path: Path
+    comment: str
+    created_timestamp: datetime
+    imported_username: str
+
+
+@dataclasses.dataclass(frozen=True)
+class _ImportFailure:
+    error: str
+
+
+_ParseResult = Union[create_replay.ImportedReplay, _ImportFailure]
+
+
+@dataclasses.dataclass
+class BulkImportStats:
+    """Counts of what happened during a bulk import."""
+
+    imported: int = 0
+    duplicates: int = 0
+    failures: int = 0
+
+    @property
+    def processed(self) -> int:
+        return self.imported + self.duplicates + self.failures
+
+
+def bulk_main(
+    replay_dir: str,
+    json_file_arg: Optional[str],
+    workers: int,
+    batch_size: int,
+    log=print,
+) -> BulkImportStats:
+    """Import royalflare replays in bulk.
+
+    Replay files are read, hashed and parsed in a pool of worker processes,
+    while this process deduplicates each batch with a single query and
+    inserts it with bulk_create.
+
+    Args:
+        replay_dir: The directory containing the replays.
+        json_file_arg: The royalflare json to import, or None for all of them.
+        workers: The number of parsing processes, or 0 to parse in this process.
+        batch_size: The number of replays handled per batch and transaction.
+        log: Called with progress and failure messages.
+
+    Returns:
+        Counts of imported, duplicate and failed replays.
+    """
+    tasks = [
+        _ImportTask(
+            replay_path=parse_replay_path_from_json(
+                Path(replay_dir), info_from_json["replay"]
+            ),
+            comment=info_from_json["comment"],
+            created_timestamp=_get_created_timestamp(info_from_json),
+            imported_username=info_from_json["player"],
+        )
+        for info_from_json in _read_json_files(json_file_arg)
+    ]
+    batches = [tasks[i : i + batch_size] for i in range(0, len(tasks), batch_size)]
+    stats = BulkImportStats()
+    start = time.monotonic()
+
+    for parsed_batch in _parse_batches(batches, workers):
+        _publish_batch(parsed_batch, stats, log)
+        elapsed = time.monotonic() - start
+        log(
+            f"{stats.processed}/{len(tasks)} replays processed "
+            + f"({stats.imported} imported, {stats.duplicates} duplicates, "
+            + f"{stats.failures} failed; {stats.processed / elapsed:.1f} replays/s)"
+        )
+
+    return stats
+
+
+def _parse_batches(
+    batches: list[list[_ImportTask]], workers: int
+) -> Iterator[list[tuple[_ImportTask, _ParseResult]]]:
+    if workers == 0:
+        for batch in batches:
+            yield [(task, _parse_for_import(task)) for task in batch]
+        return
+
+    with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        # Keep one batch parsing while the previous one is being inserted, but
+        # no more than that, so parsed replays don't pile up in memory.
+        pending = None
+        for batch in batches:
+            submitted = [
+                (task, executor.submit(_parse_for_import, task)) for task in batch
+            ]
+            if pending is not None:
+                yield [(task, f.result()) for task, f in pending]
+            pending = submitted
+        if pending is not None:
+            yield [(task, f.result()) for task, f in pending]
+
+
+def _parse_for_import(task: _ImportTask) -> _ParseResult:
+    """Read and parse a replay. Runs in a worker process, so it can't use the db."""
+    try:
+        if task.replay_path.stat().st_size > limits.MAX_REPLAY_SIZE:
+            raise limits.FileTooBigError()
+        replay_bytes = task.replay_path.read_bytes()
+        return create_replay.ImportedReplay(
+            replay_file=replay_bytes,
+            replay_hash=constant_helpers.CalculateReplayFileHash(replay_bytes),
+            replay_info=replay_parsing.Parse(replay_bytes),
+            comment=task.comment,
+            created_timestamp=task.created_timestamp,
+            imported_username=task.imported_username,
+        )
+    except Exception as e:
+        return _ImportFailure(repr(e))
+
+
+def _publish_batch(
+    parsed_batch: Iterable[tuple[_ImportTask, _ParseResult]],
+    stats: BulkImportStats,
+    log,
+) -> None:
+    constants = constant_helpers.GetConstantModelIndex()
+    parsed = []
+    for task, p in parsed_batch:
+        if isinstance(p, _ImportFailure):
+            log(f"Failed to import {task.replay_path}: {p.error}")
+            stats.failures += 1
+            continue
+        try:
+            constants.ForReplay(p.replay_info)
+        except Exception as e:
+            log(f"Failed to import {task.replay_path}: {e!r}")
+            stats.failures += 1
+            continue
+        parsed.append(p)
+
+    existing_hashes = constant_helpers.GetExistingReplayFileHashes(
+        p.replay_hash for p in parsed
+    )
+    to_publish = []
+    for p in parsed:
+        if p.replay_hash in existing_hashes:
+            stats.duplicates += 1
+            continue
+        # Also catches duplicates within the batch.
+        existing_hashes.add(p.replay_hash)
+        to_publish.append(p)
+
+    create_replay.PublishImportedReplays(to_publish)
+    stats.imported += len(to_publish)
+
+
 def parse_replay_path_from_json(replay_directory: Path, replay_location: str) -> Path:
     path_including_top_level_dir = Path(replay_location.lstrip("/"))
     path = Path(*path_including_top_level_dir.parts[1:])
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from replays import replay_storage
+
+
+class Command(BaseCommand):
+    help = """Move replay files from the database to the blob store configured
+    by settings.REPLAY_BLOB_STORE. Replay files can still be read while they
+    are being moved, and an interrupted run can simply be started again.
+    """
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="The number of replay files moved per batch.",
+        )
+        parser.add_argument(
+            "--delete-orphans",
+            action="store_true",
+            help="Afterwards, delete blobs that no replay file refers to.",
+        )
+
+    def handle(self, *args, **options):
+        moved = 0
+        try:
+            for count in replay_storage.MoveToBlobStore(options["batch_size"]):
+                moved += count
+                self.stdout.write(f"Moved {moved} replay files")
+        except replay_storage.Error as e:
+            raise CommandError(str(e))
+
+        if options["delete_orphans"]:
+            deleted = replay_storage.DeleteOrphanedBlobs()
+            self.stdout.write(f"Deleted {deleted} orphaned blobs")
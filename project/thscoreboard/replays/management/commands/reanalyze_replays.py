@@ -0,0 +1,85 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from replays import reanalyze_replay
+
+
+class Command(BaseCommand):
+    help = """Reanalyze every replay file, updating replays whose derived fields
+    no longer match what the parser says. Useful after a parser fix.
+    """
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report which replays would change, and how.",
+        )
+        parser.add_argument(
+            "--start-id",
+            type=int,
+            default=0,
+            help="Only reanalyze replays with IDs greater than this. Use the last "
+            + "ID reported by an interrupted run to resume it.",
+        )
+        parser.add_argument(
+            "--end-id",
+            type=int,
+            default=None,
+            help="Only reanalyze replays with IDs up to and including this.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="The number of replays handled per transaction.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="The number of processes used to parse replays. If 0, replays "
+            + "are parsed in this process.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        start = time.monotonic()
+        checked = changed = failed = 0
+
+        for results in reanalyze_replay.ReanalyzeAll(
+            update=not dry_run,
+            describe=dry_run,
+            start_id=options["start_id"],
+            end_id=options["end_id"],
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+        ):
+            for result in results:
+                if result.error is not None:
+                    failed += 1
+                    self.stderr.write(
+                        f"Failed to reanalyze replay {result.replay_id}: "
+                        + repr(result.error)
+                    )
+                elif result.needs_update:
+                    changed += 1
+                    if dry_run:
+                        self.stdout.write(
+                            f"Replay {result.replay_id} would change:\n{result.diff}\n"
+                        )
+            checked += len(results)
+            if not results:
+                continue
+
+            elapsed = time.monotonic() - start
+            self.stdout.write(
+                f"Reanalyzed up to replay {results[-1].replay_id}: "
+                + f"{checked} checked, {changed} "
+                + ("to change" if dry_run else "changed")
+                + f", {failed} failed ({checked / elapsed:.1f} replays/s)"
+            )
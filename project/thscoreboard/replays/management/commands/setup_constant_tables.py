@@ -3,6 +3,7 @@ from typing import List
 
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from replays import constant_helpers
 from replays import models
 
 
@@ -21,6 +22,7 @@ def SetUpConstantTables():
     separate function, so that tests can call it easily.
     """
     create_or_update_games(all_game_constants)
+    constant_helpers.InvalidateConstantModelIndex()
 
 
 class InvalidConstantsMutationException(Exception):
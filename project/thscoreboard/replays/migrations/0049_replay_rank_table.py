@@ -0,0 +1,248 @@
+# Generated by Django 5.2.14 on 2026-10-18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# The query that defined the replays_rank view as of migration 0048.
+_RANK_QUERY = """
+SELECT
+  row_number() over () as id,
+  replay,
+  score,
+  shot_id,
+  difficulty,
+  route_id,
+  category,
+  scene_game_level,
+  scene_game_scene,
+  place
+FROM
+  (
+    SELECT
+      replay,
+      score,
+      shot_id,
+      difficulty,
+      route_id,
+      category,
+      scene_game_level,
+      scene_game_scene,
+      created,
+      rank() OVER (
+        PARTITION BY shot_id,
+        difficulty,
+        route_id,
+        category,
+        scene_game_level,
+        scene_game_scene
+        ORDER BY
+          score DESC,
+          created,
+          replay
+      ) as place
+    FROM
+      (
+        SELECT
+          replay,
+          score,
+          shot_id,
+          difficulty,
+          route_id,
+          category,
+          scene_game_level,
+          scene_game_scene,
+          created,
+          user_id,
+          imported_username
+        FROM
+          (
+            -- Per-user bests
+            (
+            SELECT
+              id as replay,
+              score,
+              shot_id,
+              difficulty,
+              route_id,
+              category,
+              scene_game_level,
+              scene_game_scene,
+              created,
+              user_id,
+              NULL as imported_username,
+              rank() OVER (
+                PARTITION BY shot_id,
+                difficulty,
+                route_id,
+                category,
+                scene_game_level,
+                scene_game_scene,
+                user_id
+                ORDER BY
+                  score DESC,
+                  created,
+                  id
+              ) as per_user_place
+            FROM
+              replays_replay
+            WHERE
+              replay_type IN (1, 5) -- FULL_GAME, SCENE_GAME
+              AND category = 1 -- STANDARD
+              AND user_id IS NOT NULL
+            )
+            UNION ALL
+            -- Per-username bests for imported, unowned Royalflare replays
+            (
+            SELECT
+              id as replay,
+              score,
+              shot_id,
+              difficulty,
+              route_id,
+              category,
+              scene_game_level,
+              scene_game_scene,
+              created,
+              NULL as user_id,
+              imported_username,
+              rank() OVER (
+                PARTITION BY shot_id,
+                difficulty,
+                route_id,
+                category,
+                scene_game_level,
+                scene_game_scene,
+                imported_username
+                ORDER BY
+                  score DESC,
+                  created,
+                  id
+              ) as per_user_place
+            FROM
+              replays_replay
+            WHERE
+              replay_type IN (1, 5) -- FULL_GAME, SCENE_GAME
+              AND category = 1 -- STANDARD
+              AND user_id IS NULL
+              AND imported_username IS NOT NULL
+            )
+            )
+            AS replays_ranked_per_user
+        WHERE
+          per_user_place = 1
+      ) AS top_replays_per_user
+  ) AS top_replays
+WHERE
+  place <= 3
+ORDER BY
+  shot_id,
+  difficulty,
+  route_id,
+  category,
+  scene_game_level,
+  scene_game_scene,
+  place DESC
+"""
+
+_CREATE_VIEW_SQL = f"CREATE VIEW replays_rank AS {_RANK_QUERY};"
+
+
+class Migration(migrations.Migration):
+    """Replace the replays_rank view with a table.
+
+    The table is filled from the old view's query here; after that, it is kept
+    up to date by replays.replay_ranks.
+    """
+
+    dependencies = [
+        ("replays", "0048_update_replay_rank_view_for_scene_game"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="DROP VIEW IF EXISTS replays_rank;",
+            reverse_sql=_CREATE_VIEW_SQL,
+        ),
+        migrations.DeleteModel(
+            name="ReplayRank",
+        ),
+        migrations.CreateModel(
+            name="ReplayRank",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("difficulty", models.IntegerField(blank=True, null=True)),
+                (
+                    "category",
+                    models.IntegerField(
+                        choices=[(1, "Standard"), (2, "Tool-Assisted"), (3, "Unusual")]
+                    ),
+                ),
+                ("scene_game_level", models.IntegerField(blank=True, null=True)),
+                ("scene_game_scene", models.IntegerField(blank=True, null=True)),
+                ("place", models.IntegerField(verbose_name="Place")),
+                (
+                    "replay",
+                    models.OneToOneField(
+                        db_column="replay",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rank_view",
+                        to="replays.replay",
+                    ),
+                ),
+                (
+                    "route",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        to="replays.route",
+                    ),
+                ),
+                (
+                    "shot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        to="replays.shot",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "replays_rank",
+                "indexes": [
+                    models.Index(
+                        fields=[
+                            "shot",
+                            "difficulty",
+                            "route",
+                            "category",
+                            "scene_game_level",
+                            "scene_game_scene",
+                        ],
+                        name="rank_division",
+                    )
+                ],
+            },
+        ),
+        migrations.RunSQL(
+            sql=f"""
+INSERT INTO replays_rank (
+  replay, shot_id, difficulty, route_id, category,
+  scene_game_level, scene_game_scene, place
+)
+SELECT
+  replay, shot_id, difficulty, route_id, category,
+  scene_game_level, scene_game_scene, place
+FROM ({_RANK_QUERY}) AS old_view;
+""",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
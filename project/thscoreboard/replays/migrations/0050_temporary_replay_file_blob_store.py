@@ -0,0 +1,22 @@
+# Generated by Django 5.2.14 on 2026-10-18 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("replays", "0049_replay_rank_table"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="temporaryreplayfile",
+            name="replay_hash",
+            field=models.BinaryField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AlterField(
+            model_name="temporaryreplayfile",
+            name="replay",
+            field=models.BinaryField(max_length=1000000, null=True),
+        ),
+    ]
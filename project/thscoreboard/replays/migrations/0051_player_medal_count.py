@@ -0,0 +1,89 @@
+# Generated by Django 5.2.14 on 2026-10-18 12:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+_FILL_SQL = """
+INSERT INTO replays_playermedalcount (
+  game_id, user_id, imported_username,
+  first_place_count, second_place_count, third_place_count
+)
+SELECT
+  replays_shot.game_id,
+  replays_replay.user_id,
+  CASE WHEN replays_replay.user_id IS NULL THEN replays_replay.imported_username END,
+  count(*) FILTER (WHERE replays_rank.place = 1),
+  count(*) FILTER (WHERE replays_rank.place = 2),
+  count(*) FILTER (WHERE replays_rank.place = 3)
+FROM replays_rank
+JOIN replays_replay ON replays_replay.id = replays_rank.replay
+JOIN replays_shot ON replays_shot.id = replays_rank.shot_id
+WHERE replays_replay.is_listed
+GROUP BY 1, 2, 3;
+"""
+
+
+class Migration(migrations.Migration):
+    """Add the PlayerMedalCount table.
+
+    The table is filled from replays_rank here; after that, it is kept up to
+    date by replays.replay_ranks.
+    """
+
+    dependencies = [
+        ("replays", "0050_temporary_replay_file_blob_store"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlayerMedalCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("imported_username", models.TextField(blank=True, null=True)),
+                ("first_place_count", models.IntegerField()),
+                ("second_place_count", models.IntegerField()),
+                ("third_place_count", models.IntegerField()),
+                (
+                    "game",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="replays.game"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("user__isnull", False)),
+                        fields=("game", "user"),
+                        name="medal_count_unique_user",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("user__isnull", True)),
+                        fields=("game", "imported_username"),
+                        name="medal_count_unique_imported_username",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunSQL(sql=_FILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
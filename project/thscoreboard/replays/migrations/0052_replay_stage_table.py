@@ -0,0 +1,36 @@
+# Generated by Django 5.2.14 on 2026-10-18 13:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Add the ReplayStageTable table.
+
+    It starts out empty; replays.stage_tables builds each replay's table the
+    first time its page is viewed.
+    """
+
+    dependencies = [
+        ("replays", "0051_player_medal_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReplayStageTable",
+            fields=[
+                (
+                    "replay",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stage_table",
+                        serialize=False,
+                        to="replays.replay",
+                    ),
+                ),
+                ("version", models.IntegerField()),
+                ("rows", models.JSONField()),
+            ],
+        ),
+    ]
@@ -459,6 +459,13 @@ class Replay(models.Model):
         """Returns whether this replay should be publicly visible."""
         return self.imported_username is not None or self.user.is_active
 
+    def HasReplayFile(self) -> bool:
+        """Returns whether this submission has a replay file.
+
+        Unlike checking the replayfile attribute, this does not load the file.
+        """
+        return ReplayFile.objects.filter(replay=self).exists()
+
     def GetNiceFilename(self, id: Optional[int]):
         """Returns a nice filename for this replay.
 
@@ -531,33 +538,34 @@ class ReplayRank(models.Model):
     """Represents a replay's rank on the scoreboard.
 
     Most replays are not listed here. Only top-3 replays in a field will have
-    rows in this view.
+    rows in this table. Only a player's best replay in a field is ranked.
 
-    IMPORTANT NOTE: This model represents a view, not a table. It is defined
-    by the following query:
-
-    CREATE OR REPLACE VIEW replays_rank
-    AS
-    SELECT row_number() over () as id, replay, score, shot_id, difficulty, route_id, category, place
-    FROM (
-    SELECT id as replay, score, shot_id, difficulty, route_id, category, rank() OVER (PARTITION BY shot_id, difficulty, route_id, category ORDER BY score DESC, created, id) as place
-    FROM replays_replay
-    WHERE replay_type = 1 OR replay_type = 5  -- FULL_GAME or SCENE_GAME
-    AND (category = 1 OR category = 2)  -- STANDARD or TAS
-    ) AS ranked
-    WHERE place <= 3
-    ORDER BY shot_id, difficulty, route_id, category, place desc
-    ;
+    This table is derived entirely from the Replay table. Do not write to it
+    directly; it is kept up to date by the replay_ranks module, which refreshes
+    a replay's division whenever that replay is saved or deleted.
     """
 
     class Meta:
         db_table = "replays_rank"
-        managed = False
+        indexes = [
+            # Supports refreshing a single division.
+            models.Index(
+                name="rank_division",
+                fields=[
+                    "shot",
+                    "difficulty",
+                    "route",
+                    "category",
+                    "scene_game_level",
+                    "scene_game_scene",
+                ],
+            )
+        ]
 
     replay = models.OneToOneField(
         "Replay",
         db_column="replay",
-        on_delete=models.DO_NOTHING,
+        on_delete=models.CASCADE,
         related_name="rank_view",
     )
     """The replay being ranked."""
@@ -591,6 +599,46 @@ class ReplayRank(models.Model):
     """
 
 
+class PlayerMedalCount(models.Model):
+    """Counts how many top-3 placements a player has in a single game.
+
+    A player is either a user or, for imported replays nobody has claimed, the
+    username they were imported under. Only listed replays count.
+
+    Like ReplayRank, this table is derived from the Replay table, and must not
+    be written to directly; the replay_ranks module refreshes a game's counts
+    whenever it refreshes one of the game's divisions.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name="medal_count_unique_user",
+                fields=["game", "user"],
+                condition=Q(user__isnull=False),
+            ),
+            models.UniqueConstraint(
+                name="medal_count_unique_imported_username",
+                fields=["game", "imported_username"],
+                condition=Q(user__isnull=True),
+            ),
+        ]
+
+    game = models.ForeignKey("Game", on_delete=models.CASCADE)
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True
+    )
+    """The player, if they have an account."""
+
+    imported_username = models.TextField(null=True, blank=True)
+    """The player's name on an external site, if they don't have an account."""
+
+    first_place_count = models.IntegerField()
+    second_place_count = models.IntegerField()
+    third_place_count = models.IntegerField()
+
+
 class ReplayStage(models.Model):
     """Represents the end-of-stage data for a stage split for a given replay
     The data may not directly correspond to how it is stored in-game, since some games store it differently
@@ -743,6 +791,31 @@ class ReplayStage(models.Model):
         self.th16_season_power = s.th16_season_power
 
 
+class ReplayStageTable(models.Model):
+    """A replay's stage splits, formatted for display.
+
+    This is derived from the replay's ReplayStage rows whenever they are
+    written, so that the replay page reads one row instead of formatting every
+    stage. See replays.stage_tables.
+    """
+
+    replay = models.OneToOneField(
+        "Replay",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stage_table",
+    )
+
+    version = models.IntegerField()
+    """The version of the formatting code that built this table.
+
+    Tables built by an older version are rebuilt when they are next read.
+    """
+
+    rows = models.JSONField()
+    """One object per stage, in order, mapping column names to display values."""
+
+
 _REPLAY_FILE_UNIQUE_HASH_CONSTRAINT = "unique_hash"
 
 
@@ -770,7 +843,10 @@ class ReplayFile(models.Model):
     replay_file = models.BinaryField(
         max_length=limits.MAX_REPLAY_SIZE, blank=True, null=True
     )
-    """The replay file itself."""
+    """The replay file itself, unless it is kept in the blob store.
+
+    Use replay_storage.Read to read the file from wherever it is.
+    """
 
     replay_hash = models.BinaryField(max_length=32)
     """A SHA-256 hash of the replay file, to check for duplicates"""
@@ -799,5 +875,8 @@ class TemporaryReplayFile(models.Model):
     created = models.DateTimeField(default=timezone.now)
     """When the replay file was uploaded."""
 
-    replay = models.BinaryField(max_length=limits.MAX_REPLAY_SIZE)
-    """The replay file itself."""
+    replay = models.BinaryField(max_length=limits.MAX_REPLAY_SIZE, null=True)
+    """The replay file itself, unless it is kept in the blob store."""
+
+    replay_hash = models.BinaryField(max_length=32, null=True, blank=True)
+    """A SHA-256 hash of the replay file, if it is kept in the blob store."""
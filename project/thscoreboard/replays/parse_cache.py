@@ -0,0 +1,117 @@
+"""A cache of parsed replay files, keyed by the file's hash.
+
+Uploading a replay parses the same file several times: when it's uploaded,
+then again whenever the publish form is shown or submitted. Reanalyzing a
+replay from the admin pages similarly checks it, then updates it.
+
+Each process keeps its most recently parsed replays in a small LRU cache. If
+settings.REPLAY_PARSE_SHARED_CACHE names one of the CACHES, results are also
+shared through it, so that a request served by another process can skip the
+parse as well.
+
+Cache keys include replay_parsing.PARSER_VERSION, so bumping it throws away
+every cached result.
+"""
+
+import collections
+import dataclasses
+import pickle
+import threading
+from typing import Optional
+
+from django.conf import settings
+from django.core import cache
+
+from replays import constant_helpers
+from replays import replay_parsing
+
+
+# How long results live in the shared cache. Uploaded replays that aren't
+# published within a day aren't worth keeping around.
+_SHARED_TIMEOUT = 60 * 60 * 24
+
+_lock = threading.Lock()
+_local: collections.OrderedDict[str, bytes] = collections.OrderedDict()
+
+
+def Parse(replay) -> replay_parsing.ReplayInfo:
+    """Parse a replay file, reusing the result of an earlier parse if we can.
+
+    Raises the same errors as replay_parsing.Parse. Failed parses are not
+    cached.
+    """
+    replay = bytes(replay)
+    return _GetOrParse(_Key(replay, header_only=False), replay, replay_parsing.Parse)
+
+
+def ParseHeader(replay) -> replay_parsing.ReplayInfo:
+    """Like replay_parsing.ParseHeader, but reusing earlier parses if we can.
+
+    If the whole file has already been parsed, its header is taken from that.
+    """
+    replay = bytes(replay)
+    full = _Get(_Key(replay, header_only=False))
+    if full is not None:
+        return dataclasses.replace(full, stages=[])
+    return _GetOrParse(
+        _Key(replay, header_only=True), replay, replay_parsing.ParseHeader
+    )
+
+
+def ClearLocal() -> None:
+    """Throw away this process's cached results. Useful for tests."""
+    with _lock:
+        _local.clear()
+
+
+def _Key(replay: bytes, header_only: bool) -> str:
+    kind = "header" if header_only else "full"
+    replay_hash = constant_helpers.CalculateReplayFileHash(replay).hex()
+    return f"replay_parse:{replay_parsing.PARSER_VERSION}:{kind}:{replay_hash}"
+
+
+def _GetOrParse(key: str, replay: bytes, parse) -> replay_parsing.ReplayInfo:
+    replay_info = _Get(key)
+    if replay_info is None:
+        replay_info = parse(replay)
+        _Set(key, pickle.dumps(replay_info))
+    return replay_info
+
+
+def _Get(key: str) -> Optional[replay_parsing.ReplayInfo]:
+    with _lock:
+        serialized = _local.get(key)
+        if serialized is not None:
+            _local.move_to_end(key)
+    if serialized is None:
+        shared = _SharedCache()
+        if shared is not None:
+            serialized = shared.get(key)
+            if serialized is not None:
+                _SetLocal(key, serialized)
+    if serialized is None:
+        return None
+    # Unpickling hands every caller its own copy, so callers are free to
+    # modify what they get back.
+    return pickle.loads(serialized)
+
+
+def _Set(key: str, serialized: bytes) -> None:
+    _SetLocal(key, serialized)
+    shared = _SharedCache()
+    if shared is not None:
+        shared.set(key, serialized, timeout=_SHARED_TIMEOUT)
+
+
+def _SetLocal(key: str, serialized: bytes) -> None:
+    with _lock:
+        _local[key] = serialized
+        _local.move_to_end(key)
+        while len(_local) > settings.REPLAY_PARSE_CACHE_SIZE:
+            _local.popitem(last=False)
+
+
+def _SharedCache():
+    if settings.REPLAY_PARSE_SHARED_CACHE is None:
+        return None
+    return cache.caches[settings.REPLAY_PARSE_SHARED_CACHE]
@@ -0,0 +1,237 @@
+"""Measures how long the replay parsers take, and where the time goes.
+
+Each replay's parse is split into phases:
+
+- decrypt: td.decrypt and td.decrypt06.
+- unlzss: td.unlzss.
+- kaitai: building Kaitai objects with from_bytes.
+- build: everything else, which is mostly turning Kaitai objects into a
+  ReplayInfo (including reading any lazily-parsed stage data).
+
+Results can be saved as JSON and compared with an earlier run, to catch
+performance regressions in parser changes.
+"""
+
+import collections
+import dataclasses
+import platform
+import statistics
+import time
+import tracemalloc
+import types
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+from unittest import mock
+
+import kaitaistruct
+
+from replays import replay_parsing
+
+
+PHASES = ("decrypt", "unlzss", "kaitai", "build")
+
+
+@dataclasses.dataclass
+class ReplayBenchmark:
+    """Measurements of parsing a single replay file. Times are in seconds."""
+
+    filename: str
+    game: str
+    size: int
+    """The size of the replay file, in bytes."""
+
+    parse_seconds: float
+    """The median time taken by replay_parsing.Parse."""
+
+    header_seconds: float
+    """The median time taken by replay_parsing.ParseHeader."""
+
+    phase_seconds: dict[str, float]
+    """The median time spent in each phase of Parse."""
+
+    peak_memory: int
+    """The most memory allocated at once during Parse, in bytes."""
+
+    retained_memory: int
+    """The memory allocated by Parse that is still held by its result."""
+
+    retained_blocks: int
+    """The number of memory blocks allocated by Parse held by its result."""
+
+
+@dataclasses.dataclass
+class BenchmarkRun:
+    replays: list[ReplayBenchmark]
+    parser_version: int = replay_parsing.PARSER_VERSION
+    python_version: str = platform.python_version()
+
+    def GetGameTotals(self) -> dict[str, dict[str, float]]:
+        """Sum each game's parse and phase timings over its replays."""
+        totals = collections.defaultdict(collections.Counter)
+        for r in self.replays:
+            game_totals = totals[r.game]
+            game_totals["replays"] += 1
+            game_totals["parse_seconds"] += r.parse_seconds
+            game_totals["header_seconds"] += r.header_seconds
+            for phase, seconds in r.phase_seconds.items():
+                game_totals[phase] += seconds
+        return {game: dict(t) for game, t in sorted(totals.items())}
+
+    def ToJson(self) -> dict:
+        return {
+            "parser_version": self.parser_version,
+            "python_version": self.python_version,
+            "replays": [dataclasses.asdict(r) for r in self.replays],
+            "games": self.GetGameTotals(),
+        }
+
+    @classmethod
+    def FromJson(cls, j: dict) -> "BenchmarkRun":
+        return cls(
+            replays=[ReplayBenchmark(**r) for r in j["replays"]],
+            parser_version=j["parser_version"],
+            python_version=j["python_version"],
+        )
+
+
+class _PhaseTimer:
+    """Adds up how long the functions it wraps take, by phase."""
+
+    def __init__(self):
+        self.seconds = collections.Counter()
+
+    def Wrap(self, phase: str, f: Callable) -> Callable:
+        def Timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                self.seconds[phase] += time.perf_counter() - start
+
+        return Timed
+
+
+def _TimeParsePhases(replay: bytes) -> dict[str, float]:
+    timer = _PhaseTimer()
+    td = replay_parsing.td
+    timed_td = types.SimpleNamespace(
+        decrypt=timer.Wrap("decrypt", td.decrypt),
+        decrypt06=timer.Wrap("decrypt", td.decrypt06),
+        unlzss=timer.Wrap("unlzss", td.unlzss),
+    )
+    from_bytes = kaitaistruct.KaitaiStruct.from_bytes.__func__
+    timed_from_bytes = timer.Wrap("kaitai", from_bytes)
+
+    with mock.patch.object(replay_parsing, "td", timed_td), mock.patch.object(
+        kaitaistruct.KaitaiStruct,
+        "from_bytes",
+        classmethod(lambda cls, buf: timed_from_bytes(cls, buf)),
+    ):
+        start = time.perf_counter()
+        replay_parsing.Parse(replay)
+        total = time.perf_counter() - start
+
+    phases = {phase: timer.seconds[phase] for phase in PHASES if phase != "build"}
+    phases["build"] = max(0.0, total - sum(phases.values()))
+    return phases
+
+
+def _Median(f: Callable[[], float], repeat: int) -> float:
+    return statistics.median(f() for _ in range(repeat))
+
+
+def _TimeOnce(f: Callable, replay: bytes) -> float:
+    start = time.perf_counter()
+    f(replay)
+    return time.perf_counter() - start
+
+
+def _MeasureMemory(replay: bytes) -> tuple[int, int, int]:
+    # tracemalloc slows everything down a lot, so this is done in its own
+    # pass rather than alongside the timings.
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        # Hold on to the result until the snapshot is taken.
+        replay_info = replay_parsing.Parse(replay)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        del replay_info
+    finally:
+        tracemalloc.stop()
+    diff = after.compare_to(before, "filename")
+    return (
+        peak,
+        sum(max(0, stat.size_diff) for stat in diff),
+        sum(max(0, stat.count_diff) for stat in diff),
+    )
+
+
+def BenchmarkReplay(path: Path, repeat: int) -> ReplayBenchmark:
+    """Benchmark parsing a single replay file.
+
+    Raises:
+        replay_parsing.Error: The replay can't be parsed.
+    """
+    replay = path.read_bytes()
+    # Parse once first, both to find the game and to warm up any caches.
+    replay_info = replay_parsing.Parse(replay)
+
+    phase_runs = [_TimeParsePhases(replay) for _ in range(repeat)]
+    peak_memory, retained_memory, retained_blocks = _MeasureMemory(replay)
+    return ReplayBenchmark(
+        filename=path.name,
+        game=replay_info.game,
+        size=len(replay),
+        parse_seconds=_Median(lambda: _TimeOnce(replay_parsing.Parse, replay), repeat),
+        header_seconds=_Median(
+            lambda: _TimeOnce(replay_parsing.ParseHeader, replay), repeat
+        ),
+        phase_seconds={
+            phase: statistics.median(run[phase] for run in phase_runs)
+            for phase in PHASES
+        },
+        peak_memory=peak_memory,
+        retained_memory=retained_memory,
+        retained_blocks=retained_blocks,
+    )
+
+
+def Benchmark(
+    paths: Iterable[Path], repeat: int, log: Optional[Callable[[str], None]] = None
+) -> BenchmarkRun:
+    """Benchmark parsing some replay files.
+
+    Replays that can't be parsed are skipped.
+    """
+    results = []
+    for path in sorted(paths):
+        try:
+            results.append(BenchmarkReplay(path, repeat))
+        except replay_parsing.Error as e:
+            if log is not None:
+                log(f"Skipping {path.name}: {e}")
+    return BenchmarkRun(replays=results)
+
+
+def Compare(baseline: BenchmarkRun, current: BenchmarkRun) -> dict[str, float]:
+    """Compare two runs game by game.
+
+    Only replays that appear in both runs are compared.
+
+    Returns:
+        For each game, how long its replays took to parse in the current run
+        relative to the baseline. 1.1 means 10% slower.
+    """
+    before = {r.filename: r for r in baseline.replays}
+    before_seconds = collections.Counter()
+    after_seconds = collections.Counter()
+    for r in current.replays:
+        if r.filename in before:
+            before_seconds[r.game] += before[r.filename].parse_seconds
+            after_seconds[r.game] += r.parse_seconds
+    return {
+        game: after_seconds[game] / before_seconds[game]
+        for game in sorted(after_seconds)
+        if before_seconds[game] > 0
+    }
@@ -3,13 +3,18 @@
 This module is useful when updates are made to the site, allowing new
 information to be derived from existing replay files.
 
-As this module is used only for administrative work, it is not optimized
-for speed.
+Replays are reanalyzed in batches: the replay files for a batch are parsed
+(optionally in worker processes), compared in memory against the existing
+rows, and any changes are written back with bulk updates. This keeps the
+number of queries per batch constant, so that after a parser fix the whole
+archive can be reanalyzed by the reanalyze_replays management command.
 """
 
-import abc
+import collections
 import copy
-from typing import Optional
+import dataclasses
+from concurrent import futures
+from typing import Iterable, Iterator, Optional
 
 from django.db import models as django_models
 from django.db import transaction
@@ -17,145 +22,430 @@ from django.db import transaction
 from replays import constant_helpers
 from replays import game_ids
 from replays import models
+from replays import parse_cache
+from replays import replay_pages
 from replays import replay_parsing
+from replays import replay_ranks
+from replays import replay_storage
+from replays import scoreboard_snapshots
+from replays import stage_tables
 
 
-def DoesReplayNeedUpdate(replay_id: int) -> str:
-    """Return whether a replay would be updated."""
-    return bool(CheckReplay(replay_id))
-
-
-def CheckReplay(replay_id: int) -> str:
-    """Check a replay and return information about how it would be updated."""
-
-    differ = _Differ()
-    _Reanalyze(replay_id, differ)
-    return differ.GetOutput()
-
-
-@transaction.atomic
-def UpdateReplay(replay_id: int) -> None:
-    """Update a replay by recomputing its derived fields."""
-    updater = _Updater()
-    _Reanalyze(replay_id, updater)
-
-
-class _Recorder(abc.ABC):
-    """Internal class that records a difference that happened during reanalysis."""
+@dataclasses.dataclass(frozen=True)
+class ReanalysisResult:
+    """The outcome of reanalyzing a single replay."""
 
-    @abc.abstractmethod
-    def Change(
-        self, name: str, old_model: django_models.Model, new_model: django_models.Model
-    ):
-        """Record a change to a row."""
+    replay_id: int
 
-    @abc.abstractmethod
-    def New(self, name: str, new_model: django_models.Model):
-        """Record a new row."""
+    needs_update: bool = False
+    """Whether the replay's rows differ from what its replay file says."""
 
-    @abc.abstractmethod
-    def Deleted(self, name: str, old_model: django_models.Model):
-        """Record a row being deleted."""
+    diff: str = ""
+    """A human-readable description of the changes, if one was requested."""
 
+    error: Optional[Exception] = None
+    """If the replay could not be reanalyzed, the reason why."""
 
-class _Differ(_Recorder):
-    """A Differ just records changes in text."""
-
-    def __init__(self) -> None:
-        super().__init__()
-        self._output = []
-
-    def _PrefaceWithName(self, name, diff_str):
-        if not diff_str:
-            # Don't preface the empty string.
-            return ""
-        return f"{name}:\n{diff_str}"
-
-    def Change(
-        self, name: str, old_model: django_models.Model, new_model: django_models.Model
-    ):
-        diff = _Diff(old_model, new_model)
-        if diff:
-            self._output.append(self._PrefaceWithName(name, diff))
-
-    def New(self, name: str, new_model: django_models.Model):
-        diff = _Diff(None, new_model)
-        if diff:
-            self._output.append(self._PrefaceWithName(name, diff))
-
-    def Deleted(self, name: str, old_model: django_models.Model):
-        diff = _Diff(old_model, None)
-        if diff:
-            self._output.append(self._PrefaceWithName(name, diff))
-
-    def GetOutput(self):
-        return "\n\n".join([d for d in self._output if d])
 
+def DoesReplayNeedUpdate(replay_id: int) -> bool:
+    """Return whether a replay would be updated."""
+    return _ReanalyzeOne(replay_id, update=False, describe=False).needs_update
 
-class _Updater(_Recorder):
-    """A Differ that actually makes changes to an update."""
 
-    def Change(
-        self, name: str, old_model: django_models.Model, new_model: django_models.Model
-    ):
-        new_model.save()
+def CheckReplay(replay_id: int) -> str:
+    """Check a replay and return information about how it would be updated."""
+    return _ReanalyzeOne(replay_id, update=False, describe=True).diff
 
-    def New(self, name: str, new_model: django_models.Model):
-        new_model.save()
 
-    def Deleted(self, name: str, old_model: django_models.Model):
-        old_model.delete()
+def UpdateReplay(replay_id: int) -> None:
+    """Update a replay by recomputing its derived fields."""
+    _ReanalyzeOne(replay_id, update=True, describe=False)
+
+
+def ReanalyzeReplays(
+    replay_ids: Iterable[int],
+    update: bool,
+    describe: bool = False,
+    chunk_size: int = 100,
+    parse=replay_parsing.Parse,
+) -> list[ReanalysisResult]:
+    """Reanalyze a batch of replays in this process.
+
+    Like ReanalyzeAll, this reads, parses and reanalyzes the replays a chunk
+    at a time, so only one chunk's replay files are in memory at once.
+
+    Args:
+        replay_ids: The replays to reanalyze. Replays without a replay file
+            are skipped.
+        update: If true, write any changes back to the database.
+        describe: If true, fill in each result's diff.
+        chunk_size: The number of replays to handle per chunk and transaction.
+        parse: The function to parse each replay file with. Batches don't go
+            through the parse cache by default, since a batch of a thousand
+            replays would only push everything else out of it.
+
+    Returns:
+        One result per reanalyzed replay, in replay ID order.
+    """
+    constants = constant_helpers.GetConstantModelIndex()
+    replay_ids = sorted(set(replay_ids))
+    results = []
+    for start in range(0, len(replay_ids), chunk_size):
+        replay_files, parsed = _ReadReplayFiles(
+            models.ReplayFile.objects.filter(
+                replay_id__in=replay_ids[start : start + chunk_size]
+            )
+            .order_by("replay_id")
+            .values_list("replay_id", "replay_file", "replay_hash")
+        )
+        parsed.extend(_ParseReplayFile(f, parse) for f in replay_files)
+        results.extend(_ReanalyzeParsed(parsed, constants, update, describe))
+    return results
+
+
+def ReanalyzeAll(
+    update: bool,
+    describe: bool = False,
+    start_id: int = 0,
+    end_id: Optional[int] = None,
+    chunk_size: int = 500,
+    workers: int = 0,
+) -> Iterator[list[ReanalysisResult]]:
+    """Reanalyze every replay with a replay file, one chunk at a time.
+
+    Replay files are streamed in id order, so a run that is interrupted can be
+    resumed by passing the last replay ID it reported as start_id.
+
+    Args:
+        update: If true, write any changes back to the database.
+        describe: If true, fill in each result's diff.
+        start_id: An exclusive lower bound on the replay IDs to reanalyze.
+        end_id: If set, an inclusive upper bound on the replay IDs.
+        chunk_size: The number of replays to handle per chunk and transaction.
+        workers: The number of processes used to parse replays, or 0 to parse
+            in this process.
+
+    Yields:
+        The results for each chunk, in replay ID order.
+    """
+    constants = constant_helpers.GetConstantModelIndex()
+    executor = futures.ProcessPoolExecutor(max_workers=workers) if workers else None
+    try:
+        for chunk in _IterReplayFileChunks(start_id, end_id, chunk_size):
+            replay_files, parsed = _ReadReplayFiles(chunk)
+            if executor is None:
+                parsed.extend(_ParseReplayFile(f) for f in replay_files)
+            elif replay_files:
+                parsed.extend(
+                    executor.map(
+                        _ParseReplayFileInWorker,
+                        replay_files,
+                        chunksize=max(1, len(replay_files) // (workers * 4)),
+                    )
+                )
+            yield _ReanalyzeParsed(parsed, constants, update, describe)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def _IterReplayFileChunks(
+    start_id: int, end_id: Optional[int], chunk_size: int
+) -> Iterator[list[tuple[int, Optional[bytes], Optional[bytes]]]]:
+    """Yield the replay ID, file column and hash of each replay file, in chunks."""
+    q = models.ReplayFile.objects.filter(replay__shot__game__has_replays=True)
+    if end_id is not None:
+        q = q.filter(replay_id__lte=end_id)
+    last_id = start_id
+    while True:
+        chunk = list(
+            q.filter(replay_id__gt=last_id)
+            .order_by("replay_id")
+            .values_list("replay_id", "replay_file", "replay_hash")[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1][0]
+
+
+def _ReadReplayFiles(
+    rows: Iterable[tuple[int, Optional[bytes], Optional[bytes]]],
+) -> tuple[
+    list[tuple[int, bytes]],
+    list[tuple[int, Optional[replay_parsing.ReplayInfo], Optional[Exception]]],
+]:
+    """Read replay files from wherever they are kept.
+
+    A file can be missing from the blob store, or the blob store can fail to
+    return it; either way, only that replay fails, rather than the whole batch.
+
+    Args:
+        rows: The replay ID, file column and hash of each replay file.
+
+    Returns:
+        The ID and contents of each file that was read, and a failed parse
+        result for each one that wasn't.
+    """
+    replay_files = []
+    failed = []
+    for replay_id, replay_file, replay_hash in rows:
+        try:
+            replay_files.append(
+                (replay_id, replay_storage.Read(replay_file, replay_hash))
+            )
+        except Exception as e:
+            failed.append((replay_id, None, e))
+    return replay_files, failed
+
+
+def _ParseReplayFile(
+    id_and_file: tuple[int, bytes],
+    parse=replay_parsing.Parse,
+) -> tuple[int, Optional[replay_parsing.ReplayInfo], Optional[Exception]]:
+    """Parse a replay file. This may run in a worker process, so it can't use the db.
+
+    Batches don't go through the parse cache, since a pass over many replays
+    would only push everything else out of it.
+    """
+    replay_id, replay_file = id_and_file
+    try:
+        return replay_id, parse(replay_file), None
+    except Exception as e:
+        return replay_id, None, e
+
+
+def _ParseReplayFileInWorker(
+    id_and_file: tuple[int, bytes],
+) -> tuple[int, Optional[replay_parsing.ReplayInfo], Optional[Exception]]:
+    replay_id, replay_info, error = _ParseReplayFile(id_and_file)
+    if error is not None:
+        # Not every exception survives being pickled and sent back to the
+        # parent process, so send a description of it instead.
+        error = replay_parsing.BadReplayError(repr(error))
+    return replay_id, replay_info, error
+
+
+def _ReanalyzeOne(replay_id: int, update: bool, describe: bool) -> ReanalysisResult:
+    # A single replay is usually checked and then updated in separate
+    # requests, so it's worth keeping its parse result around in between.
+    results = ReanalyzeReplays(
+        [replay_id], update=update, describe=describe, parse=parse_cache.Parse
+    )
+    if not results:
+        raise models.ReplayFile.DoesNotExist(f"No replay file for {replay_id}")
+    [result] = results
+    if result.error is not None:
+        raise result.error
+    return result
+
+
+@dataclasses.dataclass
+class _Plan:
+    """The changes that reanalysis would make to one replay."""
+
+    old_replay: models.Replay
+    new_replay: models.Replay
+    replay_fields: list[str]
+    changed_stages: list[tuple[models.ReplayStage, models.ReplayStage, list[str]]]
+    new_stages: list[models.ReplayStage]
+    deleted_stages: list[models.ReplayStage]
+
+    stages: list[models.ReplayStage]
+    """Every stage the replay will have once the changes are made, in order."""
+
+    @property
+    def needs_update(self) -> bool:
+        return bool(
+            self.replay_fields
+            or self.changed_stages
+            or self.new_stages
+            or self.deleted_stages
+        )
+
+
+def _ReanalyzeParsed(
+    parsed: list[tuple[int, Optional[replay_parsing.ReplayInfo], Optional[Exception]]],
+    constants: constant_helpers.ConstantModelIndex,
+    update: bool,
+    describe: bool,
+) -> list[ReanalysisResult]:
+    results = {}
+    replay_infos = {}
+    for replay_id, replay_info, error in parsed:
+        if error is not None:
+            results[replay_id] = ReanalysisResult(replay_id, error=error)
+        else:
+            replay_infos[replay_id] = replay_info
+
+    with transaction.atomic():
+        replay_query = models.Replay.objects.filter(id__in=replay_infos).order_by()
+        if update:
+            # Lock the replays, so that they can't be deleted or edited between
+            # now and when the changes are applied.
+            replay_query = replay_query.select_for_update(of=("self",))
+        replays = {r.id: r for r in replay_query}
+
+        stages = collections.defaultdict(list)
+        for s in models.ReplayStage.objects.filter(replay__in=replays).order_by(
+            "replay_id", "stage"
+        ):
+            stages[s.replay_id].append(s)
+
+        plans = []
+        for replay_id, replay_info in replay_infos.items():
+            if replay_id not in replays:
+                # The replay was deleted after its file was read.
+                continue
+            try:
+                plan = _PlanReanalysis(
+                    replays[replay_id], stages[replay_id], replay_info, constants
+                )
+            except Exception as e:
+                results[replay_id] = ReanalysisResult(replay_id, error=e)
+                continue
+            results[replay_id] = ReanalysisResult(
+                replay_id,
+                needs_update=plan.needs_update,
+                diff=_DescribePlan(plan, constants) if describe else "",
+            )
+            if plan.needs_update:
+                plans.append(plan)
 
+        if update:
+            _ApplyPlans(plans, constants)
 
-def _Reanalyze(replay_id: int, recorder: _Recorder) -> str:
-    """Reanalyze computed fields on a replay."""
+    return [results[replay_id] for replay_id in sorted(results)]
 
-    replay = models.Replay.objects.get(id=replay_id)
-    replay_file = models.ReplayFile.objects.get(replay=replay)
-    replay_info = replay_parsing.Parse(replay_file.replay_file)
-    constants = constant_helpers.GetModelInstancesForReplay(replay_info)
-    replay_to_update = copy.deepcopy(replay)
 
-    replay_to_update.SetFromReplayInfo(replay_info)
-    replay_to_update.SetForeignKeysFromConstantModels(constants)
-    recorder.Change("Replay", replay, replay_to_update)
+def _PlanReanalysis(
+    replay: models.Replay,
+    replay_stages: list[models.ReplayStage],
+    replay_info: replay_parsing.ReplayInfo,
+    constants: constant_helpers.ConstantModelIndex,
+) -> _Plan:
+    new_replay = copy.copy(replay)
+    new_replay.SetFromReplayInfo(replay_info)
+    new_replay.SetForeignKeysFromConstantModels(constants.ForReplay(replay_info))
 
-    replay_stages = models.ReplayStage.objects.filter(replay=replay_id).order_by(
-        "stage"
-    )
-    seen_stages = set()
+    stages_by_index = {s.stage: s for s in replay_stages}
+    changed_stages = []
+    new_stages = []
+    stages = []
     for replay_file_stage_info in replay_info.stages:
-        matching_stages = [
-            r for r in replay_stages if r.stage == replay_file_stage_info.stage
-        ]
-        stage_name = f"Stage {replay_file_stage_info.stage}"
-
-        if len(matching_stages) > 1:
-            raise AssertionError(
-                f"{len(matching_stages)} matching stages; this is impossible"
-            )
-        elif len(matching_stages) == 1:
-            seen_stages.add(replay_file_stage_info.stage)
-            matching_stage = matching_stages[0]
-            matching_stage_to_update = copy.deepcopy(matching_stage)
+        matching_stage = stages_by_index.pop(replay_file_stage_info.stage, None)
+        if matching_stage is not None:
+            matching_stage_to_update = copy.copy(matching_stage)
             matching_stage_to_update.SetFromReplayStageInfo(replay_file_stage_info)
-            recorder.Change(stage_name, matching_stage, matching_stage_to_update)
+            changed_fields = _ChangedFields(matching_stage, matching_stage_to_update)
+            if changed_fields:
+                changed_stages.append(
+                    (matching_stage, matching_stage_to_update, changed_fields)
+                )
+            stages.append(matching_stage_to_update)
         else:
             # TODO: Deduplicate this with the real logic in create_replay.py somehow.
             new_stage = models.ReplayStage(
                 replay=replay, stage=replay_file_stage_info.stage
             )
             if replay_info.game == game_ids.GameIDs.TH09:
-                new_stage.th09_p2_shot = models.Shot.objects.select_related("game").get(
-                    game=game_ids.GameIDs.TH09,
-                    shot_id=replay_file_stage_info.th09_p2_shot,
+                new_stage.th09_p2_shot = constants.GetShot(
+                    game_ids.GameIDs.TH09, replay_file_stage_info.th09_p2_shot
                 )
             new_stage.SetFromReplayStageInfo(replay_file_stage_info)
-            recorder.New(stage_name, new_stage)
+            new_stages.append(new_stage)
+            stages.append(new_stage)
+
+    return _Plan(
+        old_replay=replay,
+        new_replay=new_replay,
+        replay_fields=_ChangedFields(replay, new_replay),
+        changed_stages=changed_stages,
+        new_stages=new_stages,
+        deleted_stages=list(stages_by_index.values()),
+        stages=stages,
+    )
+
 
-    for replay_stage in replay_stages:
-        if replay_stage.stage not in seen_stages:
-            recorder.Deleted(f"Stage {replay_stage.stage}", replay_stage)
+def _ApplyPlans(
+    plans: list[_Plan], constants: constant_helpers.ConstantModelIndex
+) -> None:
+    replay_fields = set()
+    stage_fields = set()
+    for p in plans:
+        replay_fields.update(p.replay_fields)
+        for _, _, changed_fields in p.changed_stages:
+            stage_fields.update(changed_fields)
+
+    if replay_fields:
+        models.Replay.objects.bulk_update(
+            [p.new_replay for p in plans if p.replay_fields], sorted(replay_fields)
+        )
+    if stage_fields:
+        models.ReplayStage.objects.bulk_update(
+            [new for p in plans for _, new, _ in p.changed_stages],
+            sorted(stage_fields),
+        )
+    models.ReplayStage.objects.filter(
+        id__in=[s.id for p in plans for s in p.deleted_stages]
+    ).delete()
+    models.ReplayStage.objects.bulk_create([s for p in plans for s in p.new_stages])
+    stage_tables.Store(((p.new_replay, p.stages) for p in plans), constants)
+
+    # Bulk updates don't send signals, so do what the Replay signal handlers
+    # would have done.
+    changed_replays = [p for p in plans if p.replay_fields]
+    replay_ranks.RefreshDivisions(
+        replay_ranks.Division.ForReplay(r)
+        for p in changed_replays
+        for r in (p.old_replay, p.new_replay)
+    )
+    scoreboard_snapshots.InvalidateGames(
+        p.new_replay.shot.game_id for p in changed_replays
+    )
+    replay_pages.InvalidateReplays(p.new_replay.id for p in plans)
+
+
+def _DescribePlan(plan: _Plan, constants: constant_helpers.ConstantModelIndex) -> str:
+    output = [
+        _PrefaceWithName("Replay", _Diff(plan.old_replay, plan.new_replay, constants))
+    ]
+    for old_stage, new_stage, _ in plan.changed_stages:
+        output.append(
+            _PrefaceWithName(
+                f"Stage {new_stage.stage}", _Diff(old_stage, new_stage, constants)
+            )
+        )
+    for new_stage in plan.new_stages:
+        output.append(
+            _PrefaceWithName(
+                f"Stage {new_stage.stage}", _Diff(None, new_stage, constants)
+            )
+        )
+    for old_stage in plan.deleted_stages:
+        output.append(
+            _PrefaceWithName(
+                f"Stage {old_stage.stage}", _Diff(old_stage, None, constants)
+            )
+        )
+    return "\n\n".join([d for d in output if d])
+
+
+def _PrefaceWithName(name, diff_str):
+    if not diff_str:
+        # Don't preface the empty string.
+        return ""
+    return f"{name}:\n{diff_str}"
+
+
+def _ChangedFields(
+    old_model: django_models.Model, new_model: django_models.Model
+) -> list[str]:
+    return [
+        f.name
+        for f in _GetComparableFields(old_model)
+        if f.value_from_object(old_model) != f.value_from_object(new_model)
+    ]
 
 
 def _GetComparableFields(m: django_models.Model):
@@ -169,7 +459,9 @@ def IsComparable(f: django_models.Field) -> bool:
 
 
 def _Diff(
-    old_model: Optional[django_models.Model], new_model: Optional[django_models.Model]
+    old_model: Optional[django_models.Model],
+    new_model: Optional[django_models.Model],
+    constants: constant_helpers.ConstantModelIndex,
 ) -> str:
     diff = []
 
@@ -179,20 +471,20 @@ def _Diff(
         for f in _GetComparableFields(new_model):
             diff.append(
                 "[{field}] (No model!) -> {new}".format(
-                    field=f.name, new=_GetStringForField(f, new_model)
+                    field=f.name, new=_GetStringForField(f, new_model, constants)
                 )
             )
     elif new_model is None:
         for f in _GetComparableFields(old_model):
             diff.append(
                 "[{field}] {old} -> (No model!)".format(
-                    field=f.name, old=_GetStringForField(f, old_model)
+                    field=f.name, old=_GetStringForField(f, old_model, constants)
                 )
             )
     else:
         for f in _GetComparableFields(old_model):
-            old_value = _GetStringForField(f, old_model)
-            new_value = _GetStringForField(f, new_model)
+            old_value = _GetStringForField(f, old_model, constants)
+            new_value = _GetStringForField(f, new_model, constants)
             if old_value != new_value:
                 diff.append(
                     "[{field}] {old} -> {new}".format(
@@ -202,7 +494,11 @@ def _Diff(
     return "\n".join(diff)
 
 
-def _GetStringForField(f: django_models.Field, m: django_models.Model) -> str:
+def _GetStringForField(
+    f: django_models.Field,
+    m: django_models.Model,
+    constants: constant_helpers.ConstantModelIndex,
+) -> str:
     """Get a nice-looking string version of a field."""
     if not f.is_relation:
         return f.value_to_string(m)
@@ -211,12 +507,10 @@ def _GetStringForField(f: django_models.Field, m: django_models.Model) -> str:
     if val is None:
         return "None"
 
-    # This is not terribly efficient, but it has not caused issues yet.
-    # In the future, consider using a cache for these.
     if f.remote_field.model is models.Shot:
-        return models.Shot.objects.get(id=val).shot_id
+        return constants.GetShotById(val).shot_id
     elif f.remote_field.model is models.Route:
-        return models.Route.objects.get(id=val).route_id
+        return constants.GetRouteById(val).route_id
     else:
         # No special handling for these ones.
         return f.value_to_string(m)
@@ -0,0 +1,116 @@
+"""Reads replay files for download without loading them all at once.
+
+Replay files are stored in a bytea column or in the blob store (see
+replay_storage), and loading a ReplayFile the usual way reads the whole file
+into memory. Instead, downloads read the file's size and hash first, which is
+enough to answer conditional and range requests, and then fetch the file a
+chunk at a time as the response is streamed.
+"""
+
+import dataclasses
+from typing import Iterator, Optional
+
+from django.db.models import BinaryField
+from django.db.models.functions import Length, Substr
+
+from replays import models
+from replays import replay_storage
+
+
+CHUNK_SIZE = 64 * 1024
+"""How many bytes of a replay file to fetch from the database at once."""
+
+
+@dataclasses.dataclass(frozen=True)
+class ReplayFileInfo:
+    """Everything about a replay file needed to serve it, except its contents."""
+
+    id: int
+    replay_hash: bytes
+    """The SHA-256 hash of the file."""
+
+    size: int
+    """The size of the file, in bytes."""
+
+    in_database: bool
+    """Whether the file is in the database, rather than the blob store."""
+
+    @property
+    def etag(self) -> str:
+        """A strong ETag for the file, based on its hash."""
+        return f'"{self.replay_hash.hex()}"'
+
+
+def GetReplayFileInfo(replay_id: int) -> Optional[ReplayFileInfo]:
+    """Get a replay's file information, or None if it has no file.
+
+    Raises:
+        replay_storage.MissingReplayFileError: The file isn't in the database,
+            and can't be found in the blob store.
+    """
+    row = (
+        models.ReplayFile.objects.filter(replay_id=replay_id)
+        .annotate(size=Length("replay_file"))
+        .values_list("id", "replay_hash", "size")
+        .first()
+    )
+    if row is None:
+        return None
+    id, replay_hash, size = row
+    replay_hash = bytes(replay_hash)
+    in_database = size is not None
+    if not in_database:
+        store = replay_storage.GetBlobStore()
+        size = store.GetSize(replay_hash) if store is not None else None
+        if size is None:
+            raise replay_storage.MissingReplayFileError(f"Replay file {id} is missing")
+    return ReplayFileInfo(
+        id=id, replay_hash=replay_hash, size=size, in_database=in_database
+    )
+
+
+def _ReadDatabaseChunk(replay_file_id: int, offset: int, length: int):
+    return (
+        models.ReplayFile.objects.filter(id=replay_file_id)
+        .annotate(
+            # SQL substrings start at 1.
+            chunk=Substr("replay_file", offset + 1, length, output_field=BinaryField())
+        )
+        .values_list("chunk", flat=True)
+        .first()
+    )
+
+
+def IterChunks(
+    file_info: ReplayFileInfo, start: int, end: int, chunk_size: int = CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Read part of a replay file, one chunk at a time.
+
+    Each chunk is read separately, so at most one chunk is held in memory.
+
+    Args:
+        file_info: The file to read.
+        start: The offset of the first byte to read.
+        end: The offset just past the last byte to read.
+        chunk_size: The most bytes to read at once.
+
+    Yields:
+        The file's contents between start and end, in order. If the file is
+        deleted or shrinks partway through, this stops early.
+    """
+    in_database = file_info.in_database
+    store = replay_storage.GetBlobStore()
+    offset = start
+    while offset < end:
+        length = min(chunk_size, end - offset)
+        chunk = None
+        if in_database:
+            chunk = _ReadDatabaseChunk(file_info.id, offset, length)
+            # The file may have just been moved to the blob store.
+            in_database = chunk is not None
+        if chunk is None and store is not None:
+            chunk = store.GetRange(file_info.replay_hash, offset, offset + length)
+        if not chunk:
+            return
+        yield bytes(chunk)
+        offset += len(chunk)
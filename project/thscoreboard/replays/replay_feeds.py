@@ -0,0 +1,113 @@
+"""The queries behind the replay tables.
+
+Each feed fetches exactly the columns that replays_to_json needs (ROW_FIELDS),
+with the user, shot, route and rank joined in, as light tuples rather than
+Replay instances. Serializing a feed therefore takes a single query, however
+many replays it has.
+
+Feeds can run to tens of thousands of rows, so rather than iterating over them
+directly, which fetches every row before returning the first, use
+IterateRows() or IterateRowsAsync(). These fetch a fixed number of rows at a
+time through a server-side cursor, so memory use doesn't grow with the feed.
+"""
+
+import itertools
+from typing import AsyncIterator, Iterator
+
+from asgiref.sync import sync_to_async
+from django.db.models import QuerySet
+
+from replays import models
+from replays import replays_to_json
+
+
+_RECENT_REPLAYS = 50
+
+_CHUNK_ROWS = 2000
+"""How many rows to fetch from the database at a time."""
+
+_SCOREBOARD_CATEGORIES = (models.Category.STANDARD, models.Category.TAS)
+
+
+def Rows(replays: models.ReplayQuerySet, named: bool = False) -> QuerySet:
+    """Fetch the columns replays_to_json needs from some replays.
+
+    Args:
+        replays: The replays to fetch.
+        named: If true, the rows are named tuples, with fields named after
+            ROW_FIELDS.
+    """
+    return replays.values_list(*replays_to_json.ROW_FIELDS, named=named)
+
+
+def IterateRows(rows: QuerySet, chunk_size: int = _CHUNK_ROWS) -> Iterator[tuple]:
+    """Iterate over a feed, fetching a chunk of rows at a time.
+
+    On Postgres, this uses a server-side cursor, so neither the database
+    driver nor the queryset holds on to rows that have already been used.
+    """
+    return rows.iterator(chunk_size=chunk_size)
+
+
+async def IterateRowsAsync(
+    rows: QuerySet, chunk_size: int = _CHUNK_ROWS
+) -> AsyncIterator[tuple]:
+    """Iterate over a feed asynchronously, fetching a chunk of rows at a time.
+
+    We can't use QuerySet.aiterator() for this, because for values_list()
+    querysets it runs the query in the event loop, which Django forbids.
+    Instead, each chunk is fetched in a thread.
+    """
+    iterator = IterateRows(rows, chunk_size)
+
+    def NextChunk() -> list[tuple]:
+        return list(itertools.islice(iterator, chunk_size))
+
+    try:
+        while True:
+            chunk = await sync_to_async(NextChunk)()
+            for row in chunk:
+                yield row
+            if len(chunk) < chunk_size:
+                return
+    finally:
+        # Close the database cursor in the thread that opened it, even if the
+        # client went away partway through.
+        await sync_to_async(iterator.close)()
+
+
+def GetRecentReplays() -> QuerySet:
+    """The most recently uploaded replays on the scoreboards, newest first."""
+    return Rows(
+        models.Replay.objects.filter(category__in=_SCOREBOARD_CATEGORIES)
+        .filter(is_listed=True)
+        .filter_visible()
+        .order_by("-created")
+    )[:_RECENT_REPLAYS]
+
+
+def GetUserReplays(user) -> QuerySet:
+    """All of a user's replays, grouped by game and shot."""
+    return Rows(
+        models.Replay.objects.filter(user=user).order_by(
+            "shot__game_id", "shot_id", "created"
+        )
+    )
+
+
+def GetScoreboardReplays(game_id: str) -> models.ReplayQuerySet:
+    """Get the replays that appear on a game's scoreboard, best first.
+
+    This returns Replay instances, so that callers can filter it further; use
+    Rows() to turn it into a feed.
+    """
+    return (
+        models.Replay.objects.filter(category__in=_SCOREBOARD_CATEGORIES)
+        .filter(shot__game=game_id)
+        .filter(
+            replay_type__in=(models.ReplayType.FULL_GAME, models.ReplayType.SCENE_GAME)
+        )
+        .filter(is_listed=True)
+        .filter_visible()
+        .order_by("-score")
+    )
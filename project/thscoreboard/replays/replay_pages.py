@@ -0,0 +1,245 @@
+"""Rendered replay pages, kept in the cache.
+
+Most of a replay's page is the same for everyone who speaks the same language,
+and it only changes when the replay does: when it is edited, listed or
+unlisted, claimed or unclaimed, reanalyzed or deleted. Rendering it, though,
+takes several queries, and links to replays tend to be shared, so a page is
+often requested many times in a short burst.
+
+So, we render the parts of the page that don't depend on the viewer once per
+replay and language, keep them in the cache, and throw them away whenever the
+replay changes. The parts that do depend on the viewer, such as the links to
+edit or delete the replay, and the comment form with its CSRF token, are
+rendered on every request from the facts about the replay kept alongside.
+"""
+
+import dataclasses
+import uuid
+from typing import Iterable, Optional
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models import signals
+from django.template import loader
+from django.utils import translation
+from django.utils.safestring import SafeString
+
+from replays import constant_helpers
+from replays import game_fields
+from replays import game_ids
+from replays import models
+from replays import spell_names
+from replays import stage_tables
+from replays.lib.video_embed import get_video_embed_link
+
+_PAGE_TIMEOUT = 24 * 60 * 60
+"""How long to keep a page, so that pages from older code don't linger."""
+
+_CACHE_ALIAS = "replay_pages"
+"""The cache pages and their generations are kept in; see settings.CACHES."""
+
+
+@dataclasses.dataclass(frozen=True)
+class ReplayPage:
+    """The viewer-independent parts of a replay's page, in a single language."""
+
+    replay_id: int
+    game_id: str
+
+    owner_id: Optional[int]
+    """The ID of the user the replay belongs to, if any."""
+
+    is_claimed: bool
+    """Whether the replay was imported, and then claimed by a user."""
+
+    is_listed: bool
+    has_replay_file: bool
+    comment: str
+    lesanae: bool
+
+    game_name: str
+    shot_name: str
+    route_name: Optional[str]
+    difficulty_name: str
+    score: int
+    player_name: str
+    replay_timestamp: Optional[str]
+
+    summary: SafeString
+    """The heading, score, badges, stage splits and video."""
+
+    details: SafeString
+    """The details table and stage details."""
+
+
+def GetPage(replay_id: int) -> ReplayPage:
+    """Get the page for a visible replay, in the active language.
+
+    Renders and stores the page if there isn't an up-to-date one already.
+
+    Raises:
+        Replay.DoesNotExist: If there's no such replay, or it isn't visible.
+    """
+    # As for scoreboard snapshots, the generation must be read before the
+    # replay is, so that a page rendered from a replay that changes meanwhile
+    # is stored under a generation nobody will ask for again.
+    key = _PageKey(
+        replay_id,
+        translation.get_language(),
+        _GetGeneration(replay_id),
+        constant_helpers.GetConstantModelIndex().version,
+    )
+    page = _Cache().get(key)
+    if page is None:
+        page = _BuildPage(replay_id)
+        _Cache().set(key, page, timeout=_PAGE_TIMEOUT)
+    return page
+
+
+def InvalidateReplays(replay_ids: Iterable[int]) -> None:
+    """Throw away the pages for these replays once the transaction commits."""
+    replay_ids = set(replay_ids)
+    if replay_ids:
+        transaction.on_commit(lambda: _BumpGenerations(replay_ids))
+
+
+def InvalidateReplaysForUser(user) -> None:
+    """Throw away the pages for every replay this user has."""
+    InvalidateReplays(
+        models.Replay.objects.filter(user=user).values_list("id", flat=True)
+    )
+
+
+def _BuildPage(replay_id: int) -> ReplayPage:
+    replay = (
+        models.Replay.objects.select_related(
+            "shot__game", "route", "user", "stage_table"
+        )
+        .filter_visible()
+        .get(id=replay_id)
+    )
+    game_id = replay.shot.game_id
+    replay_stages = stage_tables.GetRows(replay)
+    has_replay_file = replay.HasReplayFile()
+    owned = replay.user is not None
+    player_name = replay.user.username if owned else replay.imported_username
+    route_name = str(replay.route.GetName()) if replay.route else None
+
+    context = {
+        "replay": replay,
+        "game_id": game_id,
+        "game_name": replay.shot.game.GetName(),
+        "shot_name": replay.shot.GetName(),
+        "route_name": route_name,
+        "difficulty_name": replay.GetDifficultyDisplayName(),
+        "category": replay.get_category_display(),
+        "replay_type": game_ids.GetReplayType(replay.replay_type),
+        "spell_name": spell_names.get(
+            game_id,
+            replay.spell_card_id,
+            replay.scene_game_level,
+            replay.scene_game_scene,
+        ),
+        "owned": owned,
+        "player_name": player_name,
+        "has_replay_file": has_replay_file,
+        "replay_file_is_good": replay.is_good,
+        "has_stages": len(replay_stages) != 0,
+        "replay_stages": replay_stages,
+        "table_fields": game_fields.GetGameField(game_id, replay.replay_type),
+    }
+    if replay.video_link:
+        context["video_embed"] = get_video_embed_link(replay.video_link)
+
+    return ReplayPage(
+        replay_id=replay.id,
+        game_id=game_id,
+        owner_id=replay.user_id,
+        is_claimed=replay.imported_username is not None and owned,
+        is_listed=replay.is_listed,
+        has_replay_file=has_replay_file,
+        comment=replay.comment,
+        lesanae=replay.lesanae,
+        game_name=str(context["game_name"]),
+        shot_name=str(context["shot_name"]),
+        route_name=route_name,
+        difficulty_name=str(context["difficulty_name"]),
+        score=replay.score,
+        player_name=player_name,
+        replay_timestamp=replay.GetFormattedTimestampDate(),
+        summary=loader.render_to_string("replays/replay_details_summary.html", context),
+        details=loader.render_to_string("replays/replay_details_info.html", context),
+    )
+
+
+def _Cache():
+    return caches[_CACHE_ALIAS]
+
+
+def _GenerationKey(replay_id: int) -> str:
+    return f"replay_page_generation:{replay_id}"
+
+
+def _PageKey(replay_id: int, language: str, generation: str, version) -> str:
+    return f"replay_page:{replay_id}:{language}:{generation}:{version}"
+
+
+def _GetGeneration(replay_id: int) -> str:
+    return _Cache().get_or_set(
+        _GenerationKey(replay_id), _NewGeneration, timeout=_PAGE_TIMEOUT
+    )
+
+
+def _BumpGenerations(replay_ids: Iterable[int]) -> None:
+    _Cache().set_many(
+        {_GenerationKey(r): _NewGeneration() for r in replay_ids},
+        timeout=_PAGE_TIMEOUT,
+    )
+
+
+def _NewGeneration() -> str:
+    return uuid.uuid4().hex
+
+
+def _InvalidateReplay(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    InvalidateReplays([instance.id])
+
+
+def _InvalidateStageReplay(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    InvalidateReplays([instance.replay_id])
+
+
+def _InvalidateDeletedStage(sender, instance, origin=None, **kwargs):
+    # Stages deleted because their replay was are covered by the replay's own
+    # post_delete, so don't queue another invalidation for each of them.
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if model is sender:
+        _InvalidateStageReplay(sender, instance)
+
+
+def ConnectSignals(replay_model, stage_model) -> None:
+    """Throw away pages when replay_model or stage_model rows change.
+
+    Called once, when the replays app is ready.
+    """
+    signals.post_save.connect(
+        _InvalidateReplay, sender=replay_model, dispatch_uid="replay_pages.post"
+    )
+    signals.post_delete.connect(
+        _InvalidateReplay, sender=replay_model, dispatch_uid="replay_pages.delete"
+    )
+    signals.post_save.connect(
+        _InvalidateStageReplay,
+        sender=stage_model,
+        dispatch_uid="replay_pages.stage_post",
+    )
+    signals.post_delete.connect(
+        _InvalidateDeletedStage,
+        sender=stage_model,
+        dispatch_uid="replay_pages.stage_delete",
+    )
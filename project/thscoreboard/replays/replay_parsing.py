@@ -4,6 +4,7 @@ import datetime
 from kaitaistruct import KaitaiStructError
 
 from replays.lib import time
+from shared_content import request_timing
 from . import game_ids
 from .kaitai_parsers import th06
 from .kaitai_parsers import th07
@@ -32,6 +33,11 @@ import logging
 import tsadecode as td
 
 
+# Bump this whenever a change to the parsers changes what they return for
+# existing replay files, so that cached parse results are thrown away.
+PARSER_VERSION = 1
+
+
 class Error(Exception):
     pass
 
@@ -133,8 +139,54 @@ def convert_stored_PIV_to_displayed(game_id: str, piv: int) -> int:
     return piv
 
 
-def _Parse06(rep_raw):
-    cryptdata = bytearray(rep_raw[15:])
+# How much of a replay's compressed data to decompress when we only want its
+# header. Every header is far smaller than this even when it is stored
+# uncompressed, and this is a multiple of every block size the modern games
+# encrypt with, so decrypting just this much gives the same bytes as
+# decrypting everything.
+_HEADER_PREFIX_SIZE = 0x800
+
+
+def _HeaderPrefix(data, header_only: bool):
+    """Get the part of some compressed data that should be decoded.
+
+    If header_only is set, this is just enough of the data to read the header;
+    otherwise it is all of it.
+    """
+    # The last few blocks of a modern replay are encrypted a little
+    # differently from the rest, so only cut the data short if it is well
+    # clear of the end.
+    if header_only and len(data) > 2 * _HEADER_PREFIX_SIZE:
+        return data[:_HEADER_PREFIX_SIZE]
+    return data
+
+
+def _DecompressModern(comp_data, first_key, second_key, header_only: bool) -> bytes:
+    """Decrypt and decompress the body of a modern (TH10 and later) replay."""
+    comp_data = bytearray(_HeaderPrefix(memoryview(comp_data), header_only))
+    td.decrypt(comp_data, *first_key)
+    td.decrypt(comp_data, *second_key)
+    return td.unlzss(comp_data)
+
+
+@dataclasses.dataclass
+class _HeaderOnlyReplay:
+    """Stands in for a modern replay's Kaitai object when we skip the stages."""
+
+    header: object
+    stages: list = dataclasses.field(default_factory=list)
+
+
+def _ReadModern(replay_class, data: bytes, header_only: bool):
+    if header_only:
+        return _HeaderOnlyReplay(header=replay_class.Header.from_bytes(data))
+    return replay_class.from_bytes(data)
+
+
+def _Parse06(rep_raw, header_only=False):
+    # TH06 replays are encrypted but not compressed, and the stages are only
+    # read when we ask for them.
+    cryptdata = bytearray(_HeaderPrefix(memoryview(rep_raw)[15:], header_only))
     td.decrypt06(cryptdata, rep_raw[14])
     replay = th06.Th06.from_bytes(cryptdata)
 
@@ -142,11 +194,18 @@ def _Parse06(rep_raw):
 
     rep_stages = []
 
-    enumerated_non_dummy_stages = [
-        (i, _pointer.body)
+    non_dummy_stage_ids = [
+        i
         for i, _pointer in enumerate(replay.file_header.stage_offsets)
-        if _pointer.body
+        if _pointer.raw_offset != 0
     ]
+    enumerated_non_dummy_stages = (
+        []
+        if header_only
+        else [
+            (i, replay.file_header.stage_offsets[i].body) for i in non_dummy_stage_ids
+        ]
+    )
     # TH06 stores stage data values from the start of the stage but score from the end
     for (i, current_stage), (j, next_stage) in zip(
         enumerated_non_dummy_stages, enumerated_non_dummy_stages[1:] + [(None, None)]
@@ -161,7 +220,7 @@ def _Parse06(rep_raw):
         rep_stages.append(s)
 
     r_type = game_ids.ReplayTypes.FULL_GAME
-    if len(rep_stages) == 1 and rep_raw[7] != 4:
+    if len(non_dummy_stage_ids) == 1 and rep_raw[7] != 4:
         r_type = game_ids.ReplayTypes.STAGE_PRACTICE
 
     r = ReplayInfo(
@@ -179,28 +238,40 @@ def _Parse06(rep_raw):
     return r
 
 
-def _Parse07(rep_raw):
-    comp_data = bytearray(rep_raw[16:])
+def _Parse07(rep_raw, header_only=False):
+    comp_data = bytearray(memoryview(rep_raw)[16:])
     td.decrypt06(comp_data, rep_raw[13])
     #   please don't ask what is going on here
     #   0x54 - 16 = 68
 
     comp_size = int.from_bytes(comp_data[4:8], byteorder="little")
+    comp_view = memoryview(comp_data)
     replay = th07.Th07.from_bytes(
-        bytearray(rep_raw[0:16])
-        + comp_data[0:68]
-        + td.unlzss(comp_data[68 : 68 + comp_size])
+        b"".join(
+            [
+                rep_raw[0:16],
+                comp_view[0:68],
+                td.unlzss(_HeaderPrefix(comp_view[68 : 68 + comp_size], header_only)),
+            ]
+        )
     )
 
     shots = ["ReimuA", "ReimuB", "MarisaA", "MarisaB", "SakuyaA", "SakuyaB"]
 
     rep_stages = []
 
-    enumerated_non_dummy_stages = [
-        (i, _pointer.body)
+    non_dummy_stage_ids = [
+        i
         for i, _pointer in enumerate(replay.file_header.stage_offsets)
-        if _pointer.body
+        if _pointer.offset != 0
     ]
+    enumerated_non_dummy_stages = (
+        []
+        if header_only
+        else [
+            (i, replay.file_header.stage_offsets[i].body) for i in non_dummy_stage_ids
+        ]
+    )
 
     def is_phantasm(difficulty_code: int) -> bool:
         return difficulty_code == 5
@@ -226,7 +297,7 @@ def _Parse07(rep_raw):
         rep_stages.append(s)
 
     r_type = game_ids.ReplayTypes.FULL_GAME
-    if len(rep_stages) == 1 and replay.header.difficulty not in [4, 5]:
+    if len(non_dummy_stage_ids) == 1 and replay.header.difficulty not in [4, 5]:
         r_type = game_ids.ReplayTypes.STAGE_PRACTICE
 
     # Touhou 7 does not store the year of the replay, but datetimes requires one.
@@ -249,9 +320,9 @@ def _Parse07(rep_raw):
     return r
 
 
-def _Parse08(rep_raw):
+def _Parse08(rep_raw, header_only=False):
     comp_data_size = int.from_bytes(rep_raw[12:16], byteorder="little") - 24
-    comp_data = bytearray(rep_raw[24:comp_data_size])
+    comp_data = bytearray(memoryview(rep_raw)[24:comp_data_size])
 
     #   read the userdata section to use the date for later
     #   th08_userdata is a modified version of thmodern adapted to ZUN's early userdata format
@@ -260,8 +331,15 @@ def _Parse08(rep_raw):
     td.decrypt06(comp_data, rep_raw[21])
     #   basically copied from _Parse07()
     #   0x68 (104) - 24 = 80
+    comp_view = memoryview(comp_data)
     replay = th08.Th08.from_bytes(
-        bytearray(rep_raw[0:24]) + comp_data[0:80] + td.unlzss(comp_data[80:])
+        b"".join(
+            [
+                rep_raw[0:24],
+                comp_view[0:80],
+                td.unlzss(_HeaderPrefix(comp_view[80:], header_only)),
+            ]
+        )
     )
 
     shots = [
@@ -298,14 +376,26 @@ def _Parse08(rep_raw):
     #   else full run
 
     # TH08 stores stage data values from the start of the stage but score from the end
-    route = None
-
-    enumerated_non_dummy_stages = [
-        (i, _pointer.body)
+    non_dummy_stage_ids = [
+        i
         for i, _pointer in enumerate(replay.file_header.stage_offsets)
-        if _pointer.body
+        if _pointer.offset != 0
     ]
 
+    route = None
+    if 6 in non_dummy_stage_ids:
+        route = "Final A"
+    elif 7 in non_dummy_stage_ids:
+        route = "Final B"
+
+    enumerated_non_dummy_stages = (
+        []
+        if header_only
+        else [
+            (i, replay.file_header.stage_offsets[i].body) for i in non_dummy_stage_ids
+        ]
+    )
+
     for (i, current_stage), (j, next_stage) in zip(
         enumerated_non_dummy_stages, enumerated_non_dummy_stages[1:] + [(None, None)]
     ):
@@ -321,15 +411,10 @@ def _Parse08(rep_raw):
             s.graze = next_stage.graze
             s.point_items = next_stage.point_items
 
-        if i == 6:
-            route = "Final A"
-        elif i == 7:
-            route = "Final B"
-
         rep_stages.append(s)
 
     r_type = game_ids.ReplayTypes.FULL_GAME
-    if len(rep_stages) == 1 and replay.header.difficulty != 4:
+    if len(non_dummy_stage_ids) == 1 and replay.header.difficulty != 4:
         r_type = game_ids.ReplayTypes.STAGE_PRACTICE
 
     r = ReplayInfo(
@@ -348,13 +433,16 @@ def _Parse08(rep_raw):
     return r
 
 
-def _Parse09(rep_raw):
+def _Parse09(rep_raw, header_only=False):
+    # TH09 keeps the player's shot and score in the stage data, so there is no
+    # shortcut for header_only; we just don't return the stages.
     comp_data_size = int.from_bytes(rep_raw[12:16], byteorder="little") - 24
-    comp_data = bytearray(rep_raw[24:comp_data_size])
+    comp_data = bytearray(memoryview(rep_raw)[24:comp_data_size])
     td.decrypt06(comp_data, rep_raw[21])
     #   0xc0 (192) - 24 = 168
+    comp_view = memoryview(comp_data)
     replay = th09.Th09.from_bytes(
-        bytearray(rep_raw[0:24]) + comp_data[0:168] + td.unlzss(comp_data[168:])
+        b"".join([rep_raw[0:24], comp_view[0:168], td.unlzss(comp_view[168:])])
     )
     stage_pointers = replay.file_header.stage_offsets
     shots = [
@@ -457,13 +545,14 @@ def _Parse09(rep_raw):
         timestamp=time.strptime(replay.header.date, "%y/%m/%d"),
         name=replay.header.name.replace("\x00", ""),
         replay_type=r_type,
-        stages=rep_stages,
+        stages=[] if header_only else rep_stages,
     )
 
     return r
 
 
-def _Parse095(rep_raw):
+def _Parse095(rep_raw, header_only=False):
+    # TH095 replays are read from the userdata, so there's no stage data to skip.
     encrypted_replay = th095_encrypted.Th095Encrypted.from_bytes(rep_raw)
 
     if encrypted_replay.userdata.level.value == "EX":
@@ -503,13 +592,15 @@ def _Parse095(rep_raw):
     )
 
 
-def _Parse10(rep_raw):
+def _Parse10(rep_raw, header_only=False):
     header = th_modern.ThModern.from_bytes(rep_raw)
-    comp_data = bytearray(header.main.comp_data)
-
-    td.decrypt(comp_data, 0x400, 0xAA, 0xE1)
-    td.decrypt(comp_data, 0x80, 0x3D, 0x7A)
-    replay = th10.Th10.from_bytes(td.unlzss(comp_data))
+    replay = _ReadModern(
+        th10.Th10,
+        _DecompressModern(
+            header.main.comp_data, (0x400, 0xAA, 0xE1), (0x80, 0x3D, 0x7A), header_only
+        ),
+        header_only,
+    )
 
     shots = ["ReimuA", "ReimuB", "ReimuC", "MarisaA", "MarisaB", "MarisaC"]
 
@@ -532,7 +623,7 @@ def _Parse10(rep_raw):
         rep_stages.append(s)
 
     r_type = game_ids.ReplayTypes.FULL_GAME
-    if len(rep_stages) == 1 and replay.header.difficulty != 4:
+    if replay.header.stagecount == 1 and replay.header.difficulty != 4:
         r_type = game_ids.ReplayTypes.STAGE_PRACTICE
 
     r = ReplayInfo(
@@ -552,13 +643,15 @@ def _Parse10(rep_raw):
     return r
 
 
-def _Parse11(rep_raw):
+def _Parse11(rep_raw, header_only=False):
     header = th_modern.ThModern.from_bytes(rep_raw)
-    comp_data = bytearray(header.main.comp_data)
-
-    td.decrypt(comp_data, 0x800, 0xAA, 0xE1)
-    td.decrypt(comp_data, 0x40, 0x3D, 0x7A)
-    replay = th11.Th11.from_bytes(td.unlzss(comp_data))
+    replay = _ReadModern(
+        th11.Th11,
+        _DecompressModern(
+            header.main.comp_data, (0x800, 0xAA, 0xE1), (0x40, 0x3D, 0x7A), header_only
+        ),
+        header_only,
+    )
 
     shots = ["ReimuA", "ReimuB", "ReimuC", "MarisaA", "MarisaB", "MarisaC"]
 
@@ -583,7 +676,7 @@ def _Parse11(rep_raw):
         rep_stages.append(s)
 
     r_type = game_ids.ReplayTypes.FULL_GAME
-    if len(rep_stages) == 1 and replay.header.difficulty != 4:
+    if replay.header.stagecount == 1 and replay.header.difficulty != 4:
         r_type = game_ids.ReplayTypes.STAGE_PRACTICE
 
     r = ReplayInfo(
@@ -603,13 +696,15 @@ def _Parse11(rep_raw):
     return r
 
 
-def _Parse12(rep_raw):
+def _Parse12(rep_raw, header_only=False):
     header = th_modern.ThModern.from_bytes(rep_raw)
-    comp_data = bytearray(header.main.comp_data)
-
-    td.decrypt(comp_data, 0x800, 0x5E, 0xE1)
-    td.decrypt(comp_data, 0x40, 0x7D, 0x3A)
-    replay = th12.Th12.from_bytes(td.unlzss(comp_data))
+    replay = _ReadModern(
+        th12.Th12,
+        _DecompressModern(
+            header.main.comp_data, (0x800, 0x5E, 0xE1), (0x40, 0x7D, 0x3A), header_only
+        ),
+        header_only,
+    )
 
     shots = ["ReimuA", "ReimuB", "MarisaA", "MarisaB", "SanaeA", "SanaeB"]
 
@@ -642,7 +737,7 @@ def _Parse12(rep_raw):
         rep_stages.append(s)
 
     r_type = game_ids.ReplayTypes.FULL_GAME
-    if len(rep_stages) == 1 and replay.header.difficulty != 4:
+    if replay.header.stagecount == 1 and replay.header.difficulty != 4:
         r_type = game_ids.ReplayTypes.STAGE_PRACTICE
 
     r = ReplayInfo(
@@ -662,13 +757,15 @@ def _Parse12(rep_raw):
     return r
 
 
-def _Parse128(rep_raw):
+def _Parse128(rep_raw, header_only=False):
     header = th_modern.ThModern.from_bytes(rep_raw)
-    comp_data = bytearray(header.main.comp_data)
-
-    td.decrypt(comp_data, 0x800, 0x5E, 0xE7)
-    td.decrypt(comp_data, 0x80, 0x7D, 0x36)
-    replay = th128.Th128.from_bytes(td.unlzss(comp_data))
+    replay = _ReadModern(
+        th128.Th128,
+        _DecompressModern(
+            header.main.comp_data, (0x800, 0x5E, 0xE7), (0x80, 0x7D, 0x36), header_only
+        ),
+        header_only,
+    )
 
     routes = [
         "A-1",
@@ -713,13 +810,15 @@ def _Parse128(rep_raw):
     )
 
 
-def _Parse13(rep_raw):
+def _Parse13(rep_raw, header_only=False):
     header = th_modern.ThModern.from_bytes(rep_raw)
-    comp_data = bytearray(header.main.comp_data)
-
-    td.decrypt(comp_data, 0x400, 0x5C, 0xE1)
-    td.decrypt(comp_data, 0x100, 0x7D, 0x3A)
-    replay = th13.Th13.from_bytes(td.unlzss(comp_data))
+    replay = _ReadModern(
+        th13.Th13,
+        _DecompressModern(
+            header.main.comp_data, (0x400, 0x5C, 0xE1), (0x100, 0x7D, 0x3A), header_only
+        ),
+        header_only,
+    )
 
     shots = ["Reimu", "Marisa", "Sanae", "Youmu"]
 
@@ -763,7 +862,7 @@ def _Parse13(rep_raw):
         rep_stages.append(s)
 
     r_type = game_ids.ReplayTypes.FULL_GAME
-    if len(rep_stages) == 1 and replay.header.difficulty != 4:
+    if replay.header.stage_count == 1 and replay.header.difficulty != 4:
         r_type = game_ids.ReplayTypes.STAGE_PRACTICE
 
     r = ReplayInfo(
@@ -783,13 +882,15 @@ def _Parse13(rep_raw):
     return r
 
 
-def _Parse14(rep_raw):
+def _Parse14(rep_raw, header_only=False):
     header = th_modern.ThModern.from_bytes(rep_raw)
-    comp_data = bytearray(header.main.comp_data)
-
-    td.decrypt(comp_data, 0x400, 0x5C, 0xE1)
-    td.decrypt(comp_data, 0x100, 0x7D, 0x3A)
-    replay = th14.Th14.from_bytes(td.unlzss(comp_data))
+    replay = _ReadModern(
+        th14.Th14,
+        _DecompressModern(
+            header.main.comp_data, (0x400, 0x5C, 0xE1), (0x100, 0x7D, 0x3A), header_only
+        ),
+        header_only,
+    )
 
     shots = ["ReimuA", "ReimuB", "MarisaA", "MarisaB", "SakuyaA", "SakuyaB"]
     rep_stages = []
@@ -832,7 +933,7 @@ def _Parse14(rep_raw):
         rep_stages.append(s)
 
     r_type = game_ids.ReplayTypes.FULL_GAME
-    if len(rep_stages) == 1 and replay.header.difficulty != 4:
+    if replay.header.stage_count == 1 and replay.header.difficulty != 4:
         r_type = game_ids.ReplayTypes.STAGE_PRACTICE
 
     r = ReplayInfo(
@@ -852,13 +953,15 @@ def _Parse14(rep_raw):
     return r
 
 
-def _Parse15(rep_raw) -> ReplayInfo:
+def _Parse15(rep_raw, header_only=False) -> ReplayInfo:
     header = th_modern.ThModern.from_bytes(rep_raw)
-    comp_data = bytearray(header.main.comp_data)
-
-    td.decrypt(comp_data, 0x400, 0x5C, 0xE1)
-    td.decrypt(comp_data, 0x100, 0x7D, 0x3A)
-    replay = th15.Th15.from_bytes(td.unlzss(comp_data))
+    replay = _ReadModern(
+        th15.Th15,
+        _DecompressModern(
+            header.main.comp_data, (0x400, 0x5C, 0xE1), (0x100, 0x7D, 0x3A), header_only
+        ),
+        header_only,
+    )
 
     shots = ["Reimu", "Marisa", "Sanae", "Reisen"]
     rep_stages = []
@@ -886,7 +989,7 @@ def _Parse15(rep_raw) -> ReplayInfo:
         rep_stages.append(s)
 
     r_type = game_ids.ReplayTypes.FULL_GAME
-    if len(rep_stages) == 1 and replay.header.difficulty != 4:
+    if replay.header.stage_count == 1 and replay.header.difficulty != 4:
         r_type = game_ids.ReplayTypes.STAGE_PRACTICE
 
     r = ReplayInfo(
@@ -906,13 +1009,15 @@ def _Parse15(rep_raw) -> ReplayInfo:
     return r
 
 
-def _Parse16(rep_raw) -> ReplayInfo:
+def _Parse16(rep_raw, header_only=False) -> ReplayInfo:
     header = th_modern.ThModern.from_bytes(rep_raw)
-    comp_data = bytearray(header.main.comp_data)
-
-    td.decrypt(comp_data, 0x400, 0x5C, 0xE1)
-    td.decrypt(comp_data, 0x100, 0x7D, 0x3A)
-    replay = th16.Th16.from_bytes(td.unlzss(comp_data))
+    replay = _ReadModern(
+        th16.Th16,
+        _DecompressModern(
+            header.main.comp_data, (0x400, 0x5C, 0xE1), (0x100, 0x7D, 0x3A), header_only
+        ),
+        header_only,
+    )
 
     def get_shot(shot_id: int, season_id: int) -> str:
         shots = ["Reimu", "Cirno", "Aya", "Marisa"]
@@ -960,7 +1065,7 @@ def _Parse16(rep_raw) -> ReplayInfo:
         rep_stages.append(s)
 
     r_type = game_ids.ReplayTypes.FULL_GAME
-    if len(rep_stages) == 1 and replay.header.difficulty != 4:
+    if replay.header.stage_count == 1 and replay.header.difficulty != 4:
         r_type = game_ids.ReplayTypes.STAGE_PRACTICE
 
     r = ReplayInfo(
@@ -980,13 +1085,15 @@ def _Parse16(rep_raw) -> ReplayInfo:
     return r
 
 
-def _Parse17(rep_raw) -> ReplayInfo:
+def _Parse17(rep_raw, header_only=False) -> ReplayInfo:
     header = th_modern.ThModern.from_bytes(rep_raw)
-    comp_data = bytearray(header.main.comp_data)
-
-    td.decrypt(comp_data, 0x400, 0x5C, 0xE1)
-    td.decrypt(comp_data, 0x100, 0x7D, 0x3A)
-    replay = th17.Th17.from_bytes(td.unlzss(comp_data))
+    replay = _ReadModern(
+        th17.Th17,
+        _DecompressModern(
+            header.main.comp_data, (0x400, 0x5C, 0xE1), (0x100, 0x7D, 0x3A), header_only
+        ),
+        header_only,
+    )
 
     def get_shot(shot_id: int, subshot_id: int) -> str:
         shots = ["Reimu", "Marisa", "Youmu"]
@@ -1033,7 +1140,7 @@ def _Parse17(rep_raw) -> ReplayInfo:
         rep_stages.append(s)
 
     r_type = game_ids.ReplayTypes.FULL_GAME
-    if len(rep_stages) == 1 and replay.header.difficulty != 4:
+    if replay.header.stage_count == 1 and replay.header.difficulty != 4:
         r_type = game_ids.ReplayTypes.STAGE_PRACTICE
 
     r = ReplayInfo(
@@ -1053,13 +1160,15 @@ def _Parse17(rep_raw) -> ReplayInfo:
     return r
 
 
-def _Parse18(rep_raw) -> ReplayInfo:
+def _Parse18(rep_raw, header_only=False) -> ReplayInfo:
     header = th_modern.ThModern.from_bytes(rep_raw)
-    comp_data = bytearray(header.main.comp_data)
-
-    td.decrypt(comp_data, 0x400, 0x5C, 0xE1)
-    td.decrypt(comp_data, 0x100, 0x7D, 0x3A)
-    replay = th18.Th18.from_bytes(td.unlzss(comp_data))
+    replay = _ReadModern(
+        th18.Th18,
+        _DecompressModern(
+            header.main.comp_data, (0x400, 0x5C, 0xE1), (0x100, 0x7D, 0x3A), header_only
+        ),
+        header_only,
+    )
 
     shots = ["Reimu", "Marisa", "Sakuya", "Sanae"]
 
@@ -1104,7 +1213,7 @@ def _Parse18(rep_raw) -> ReplayInfo:
         rep_stages.append(s)
 
     r_type = game_ids.ReplayTypes.FULL_GAME
-    if len(rep_stages) == 1 and replay.header.difficulty != 4:
+    if replay.header.stage_count == 1 and replay.header.difficulty != 4:
         r_type = game_ids.ReplayTypes.STAGE_PRACTICE
 
     r = ReplayInfo(
@@ -1138,15 +1247,15 @@ def _20SubshotToStone(stone_id: int) -> str:
     ][stone_id]
 
 
-def _Parse20(rep_raw) -> ReplayInfo:
+def _Parse20(rep_raw, header_only=False) -> ReplayInfo:
     header = th_modern_20_header.ThModern20Header.from_bytes(rep_raw)
-    comp_data = bytearray(header.main.comp_data)
-
-    td.decrypt(comp_data, 0x400, 0x5C, 0xE1)
-    td.decrypt(comp_data, 0x100, 0x7D, 0x3A)
-    decomp = td.unlzss(comp_data)
-
-    replay = th20.Th20.from_bytes(decomp)
+    replay = _ReadModern(
+        th20.Th20,
+        _DecompressModern(
+            header.main.comp_data, (0x400, 0x5C, 0xE1), (0x100, 0x7D, 0x3A), header_only
+        ),
+        header_only,
+    )
     character = ["Reimu", "Marisa"][replay.header.shot]
     stones = [_20SubshotToStone(stone_id) for stone_id in replay.header.stones]
     shot = character + stones[0]
@@ -1177,13 +1286,15 @@ def _Parse20(rep_raw) -> ReplayInfo:
     return r
 
 
-def _ParseAlco(rep_raw) -> ReplayInfo:
+def _ParseAlco(rep_raw, header_only=False) -> ReplayInfo:
     header = alco_userdata.AlcoUserdata.from_bytes(rep_raw)
-    comp_data = bytearray(header.main.comp_data)
-
-    td.decrypt(comp_data, 0x400, 0xAA, 0xE1)
-    td.decrypt(comp_data, 0x80, 0x3D, 0x7A)
-    replay = alco.Alco.from_bytes(td.unlzss(comp_data))
+    replay = _ReadModern(
+        alco.Alco,
+        _DecompressModern(
+            header.main.comp_data, (0x400, 0xAA, 0xE1), (0x80, 0x3D, 0x7A), header_only
+        ),
+        header_only,
+    )
 
     rep_stages = []
 
@@ -1216,7 +1327,7 @@ def _ParseAlco(rep_raw) -> ReplayInfo:
     return r
 
 
-def _DetermineTH13orTH14(replay):
+def _DetermineTH13orTH14(replay, header_only=False):
     # thank you ZUN
     # yes, one of the only indications of which game a replay is from here is from a USERDATA string
     header = th_modern.ThModern.from_bytes(replay)
@@ -1224,10 +1335,10 @@ def _DetermineTH13orTH14(replay):
     # we have to just keep finding new replays with fucked strings and adding them to these checks
     if header.userdata.user_desc[4] in [0x90, 0xC9]:
         # the shift-jis character is 廟
-        return _Parse13(replay)
+        return _Parse13(replay, header_only)
     elif header.userdata.user_desc[4] in [0x8B, 0xBB]:
         # the shift-jis character is 城
-        return _Parse14(replay)
+        return _Parse14(replay, header_only)
     # if its not either of the two above, then I don't know
     raise ValueError()
 
@@ -1238,49 +1349,73 @@ def _is_spell_practice_modern(replay_header) -> bool:
 
 def Parse(replay) -> ReplayInfo:
     """Parse a replay file."""
+    return _Parse(replay, header_only=False)
+
+
+def ParseHeader(replay) -> ReplayInfo:
+    """Parse just the header of a replay file.
+
+    This is much cheaper than Parse for most games, since it skips decrypting
+    and decompressing the stage data. The result is the same as Parse's,
+    except that its stages are always empty.
+
+    Because the stage data isn't read, a replay that ParseHeader accepts may
+    still be rejected by Parse if its stage data is corrupted.
+    """
+    return _Parse(replay, header_only=True)
+
+
+def _Parse(replay, header_only: bool) -> ReplayInfo:
+    with request_timing.Measure(request_timing.PARSE):
+        return _ParseUntimed(replay, header_only)
+
 
-    # If replay is a memoryview, cast it to bytes.
-    if isinstance(replay, memoryview):
+def _ParseUntimed(replay, header_only: bool) -> ReplayInfo:
+    # Kaitai only reads from bytes objects without copying them first, so if
+    # replay is a memoryview or bytearray, make a bytes copy here, once. The
+    # parsers below take care not to copy the whole file again; they only
+    # copy the parts they need to decrypt.
+    if not isinstance(replay, bytes):
         replay = bytes(replay)
 
     gamecode = replay[:4]
 
     try:
         if gamecode == b"T6RP":
-            return _Parse06(replay)
+            return _Parse06(replay, header_only)
         elif gamecode == b"T7RP":
-            return _Parse07(replay)
+            return _Parse07(replay, header_only)
         elif gamecode == b"T8RP":
-            return _Parse08(replay)
+            return _Parse08(replay, header_only)
         elif gamecode == b"T9RP":
-            return _Parse09(replay)
+            return _Parse09(replay, header_only)
         elif gamecode == b"t95r":
-            return _Parse095(replay)
+            return _Parse095(replay, header_only)
         elif gamecode == b"t10r":
-            return _Parse10(replay)
+            return _Parse10(replay, header_only)
         elif gamecode == b"t11r":
-            return _Parse11(replay)
+            return _Parse11(replay, header_only)
         elif gamecode == b"t12r":
-            return _Parse12(replay)
+            return _Parse12(replay, header_only)
         elif gamecode == b"t13r":
             # ZUN was drunk and did not change the gamecode for TH14, so this is now used for two games
             # and thus we have to do fuckery to find which one it is
             # fun fact: the games themselves don't test this so if you rename the file you can crash them
-            return _DetermineTH13orTH14(replay)
+            return _DetermineTH13orTH14(replay, header_only)
         elif gamecode == b"t15r":
-            return _Parse15(replay)
+            return _Parse15(replay, header_only)
         elif gamecode == b"t16r":
-            return _Parse16(replay)
+            return _Parse16(replay, header_only)
         elif gamecode == b"t17r":
-            return _Parse17(replay)
+            return _Parse17(replay, header_only)
         elif gamecode == b"t18r":
-            return _Parse18(replay)
+            return _Parse18(replay, header_only)
         elif gamecode == b"t20r":
-            return _Parse20(replay)
+            return _Parse20(replay, header_only)
         elif gamecode == b"128r":
-            return _Parse128(replay)
+            return _Parse128(replay, header_only)
         elif gamecode == b"al1r":
-            return _ParseAlco(replay)
+            return _ParseAlco(replay, header_only)
         else:
             logging.warning("Failed to comprehend gamecode %s", str(gamecode))
             raise UnsupportedGameError("This game is unsupported.")
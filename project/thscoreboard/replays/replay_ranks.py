@@ -0,0 +1,279 @@
+"""Maintains the replays_rank table, which records top-3 placements.
+
+Ranks used to be computed by a view over the entire replay table, which meant
+every scoreboard read re-sorted every replay on the site. Instead, ranks are
+now stored in a real table, and only the "scoring division" (shot, difficulty,
+route, category, and scene) touched by a write is recomputed.
+
+This module also maintains PlayerMedalCount, which totals each player's
+placements per game for the rankings page. Whenever a division is refreshed,
+so are the medal counts for its game.
+
+Most callers do not need to do anything: this module listens to Replay saves
+and deletions, and refreshes the affected divisions automatically. Code that
+bypasses model signals (for example, bulk_create or QuerySet.update) must call
+RefreshDivisions itself.
+"""
+
+import contextlib
+import dataclasses
+import threading
+from typing import Iterable, Optional
+
+from django.db import connection
+from django.db import transaction
+from django.db.models import signals
+
+
+@dataclasses.dataclass(frozen=True)
+class Division:
+    """A set of replays which are ranked against one another."""
+
+    shot_id: int
+    difficulty: Optional[int]
+    route_id: Optional[int]
+    category: int
+    scene_game_level: Optional[int]
+    scene_game_scene: Optional[int]
+
+    @classmethod
+    def ForReplay(cls, replay) -> "Division":
+        return cls(
+            shot_id=replay.shot_id,
+            difficulty=replay.difficulty,
+            route_id=replay.route_id,
+            category=replay.category,
+            scene_game_level=replay.scene_game_level,
+            scene_game_scene=replay.scene_game_scene,
+        )
+
+
+# The fields which, if changed, might change a replay's rank or the rank of
+# other replays in its division. is_listed doesn't affect ranks, but it does
+# affect medal counts.
+_RANK_FIELDS = (
+    "shot_id",
+    "difficulty",
+    "route_id",
+    "category",
+    "scene_game_level",
+    "scene_game_scene",
+    "replay_type",
+    "score",
+    "created",
+    "user_id",
+    "imported_username",
+    "is_listed",
+)
+
+# This query is the same as the one that defined the old replays_rank view,
+# except that it only looks at a single division.
+_DIVISION_FILTER = """
+  shot_id = %(shot_id)s
+  AND difficulty IS NOT DISTINCT FROM %(difficulty)s
+  AND route_id IS NOT DISTINCT FROM %(route_id)s
+  AND category = %(category)s
+  AND scene_game_level IS NOT DISTINCT FROM %(scene_game_level)s
+  AND scene_game_scene IS NOT DISTINCT FROM %(scene_game_scene)s
+"""
+
+_DELETE_DIVISION_SQL = f"DELETE FROM replays_rank WHERE {_DIVISION_FILTER};"
+
+_INSERT_DIVISION_SQL = f"""
+INSERT INTO replays_rank (
+  replay, shot_id, difficulty, route_id, category,
+  scene_game_level, scene_game_scene, place
+)
+SELECT
+  replay, shot_id, difficulty, route_id, category,
+  scene_game_level, scene_game_scene, place
+FROM
+  (
+    SELECT
+      replay, score, shot_id, difficulty, route_id, category,
+      scene_game_level, scene_game_scene,
+      rank() OVER (ORDER BY score DESC, created, replay) AS place
+    FROM
+      (
+        SELECT
+          id AS replay, score, shot_id, difficulty, route_id, category,
+          scene_game_level, scene_game_scene, created,
+          rank() OVER (
+            -- Per-user bests; unowned imported replays are grouped by their
+            -- imported username instead.
+            PARTITION BY user_id, CASE WHEN user_id IS NULL THEN imported_username END
+            ORDER BY score DESC, created, id
+          ) AS per_user_place
+        FROM replays_replay
+        WHERE
+          replay_type IN (1, 5) -- FULL_GAME, SCENE_GAME
+          AND category = 1 -- STANDARD
+          AND (user_id IS NOT NULL OR imported_username IS NOT NULL)
+          AND {_DIVISION_FILTER}
+      ) AS top_replays_per_user
+    WHERE per_user_place = 1
+  ) AS top_replays
+WHERE place <= 3;
+"""
+
+_GAMES_FOR_SHOTS_SQL = (
+    "SELECT DISTINCT game_id FROM replays_shot WHERE id = ANY(%s) ORDER BY game_id;"
+)
+
+_DELETE_MEDAL_COUNTS_SQL = (
+    "DELETE FROM replays_playermedalcount WHERE game_id = ANY(%(game_ids)s);"
+)
+
+_INSERT_MEDAL_COUNTS_SQL = """
+INSERT INTO replays_playermedalcount (
+  game_id, user_id, imported_username,
+  first_place_count, second_place_count, third_place_count
+)
+SELECT
+  replays_shot.game_id,
+  replays_replay.user_id,
+  CASE WHEN replays_replay.user_id IS NULL THEN replays_replay.imported_username END,
+  count(*) FILTER (WHERE replays_rank.place = 1),
+  count(*) FILTER (WHERE replays_rank.place = 2),
+  count(*) FILTER (WHERE replays_rank.place = 3)
+FROM replays_rank
+JOIN replays_replay ON replays_replay.id = replays_rank.replay
+JOIN replays_shot ON replays_shot.id = replays_rank.shot_id
+WHERE
+  replays_shot.game_id = ANY(%(game_ids)s)
+  AND replays_replay.is_listed
+GROUP BY 1, 2, 3;
+"""
+
+
+def RefreshDivisions(divisions: Iterable[Division]) -> None:
+    """Recompute the ranks of every replay in the given divisions.
+
+    The medal counts for the divisions' games are recomputed too.
+
+    If a batch is in progress (see BatchRefresh), the divisions are instead
+    recorded, and refreshed when the batch finishes.
+    """
+    divisions = set(divisions)
+    if not divisions:
+        return
+
+    pending = getattr(_batch_state, "pending", None)
+    if pending is not None:
+        pending.update(divisions)
+        return
+
+    # Sort the divisions so that concurrent refreshes take locks in a
+    # consistent order.
+    divisions = sorted(divisions, key=_SortKey)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for d in divisions:
+            # Serialize refreshes of the same division. Otherwise, two replays
+            # published at once could each recompute the division without
+            # seeing the other.
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [_LockName(d)])
+        # Clear every division before refilling any of them, since a replay
+        # that moved between divisions still has a row in its old one.
+        for d in divisions:
+            cursor.execute(_DELETE_DIVISION_SQL, dataclasses.asdict(d))
+        for d in divisions:
+            cursor.execute(_INSERT_DIVISION_SQL, dataclasses.asdict(d))
+
+        cursor.execute(_GAMES_FOR_SHOTS_SQL, [sorted({d.shot_id for d in divisions})])
+        game_ids = [game_id for (game_id,) in cursor.fetchall()]
+        # Division locks are always taken before game locks, so this can't
+        # deadlock with another refresh.
+        for game_id in game_ids:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(hashtext(%s))",
+                ["player_medals:" + game_id],
+            )
+        cursor.execute(_DELETE_MEDAL_COUNTS_SQL, {"game_ids": game_ids})
+        cursor.execute(_INSERT_MEDAL_COUNTS_SQL, {"game_ids": game_ids})
+
+
+@contextlib.contextmanager
+def BatchRefresh():
+    """Defer rank refreshes until the end of a block.
+
+    This is useful when changing many replays at once. Each affected division
+    is only refreshed once, no matter how many of its replays changed.
+    """
+    if getattr(_batch_state, "pending", None) is not None:
+        # Already batching; the outermost block will do the refresh.
+        yield
+        return
+
+    _batch_state.pending = set()
+    try:
+        yield
+        pending = _batch_state.pending
+    finally:
+        _batch_state.pending = None
+    RefreshDivisions(pending)
+
+
+_batch_state = threading.local()
+
+
+def _SortKey(d: Division):
+    return tuple((v is None, v) for v in dataclasses.astuple(d))
+
+
+def _LockName(d: Division) -> str:
+    return "replays_rank:" + ":".join(str(v) for v in dataclasses.astuple(d))
+
+
+def _RememberRankFields(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._rank_fields_before_save = None
+        return
+    instance._rank_fields_before_save = (
+        sender.objects.filter(pk=instance.pk).values(*_RANK_FIELDS).first()
+    )
+
+
+def _RefreshAfterSave(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    old_fields = getattr(instance, "_rank_fields_before_save", None)
+    instance._rank_fields_before_save = None
+    new_division = Division.ForReplay(instance)
+
+    if created or old_fields is None:
+        RefreshDivisions([new_division])
+        return
+
+    if all(old_fields[f] == getattr(instance, f) for f in _RANK_FIELDS):
+        return
+
+    old_division = Division(
+        shot_id=old_fields["shot_id"],
+        difficulty=old_fields["difficulty"],
+        route_id=old_fields["route_id"],
+        category=old_fields["category"],
+        scene_game_level=old_fields["scene_game_level"],
+        scene_game_scene=old_fields["scene_game_scene"],
+    )
+    RefreshDivisions([old_division, new_division])
+
+
+def _RefreshAfterDelete(sender, instance, **kwargs):
+    RefreshDivisions([Division.ForReplay(instance)])
+
+
+def ConnectSignals(replay_model) -> None:
+    """Keep ranks up to date when replay_model rows change.
+
+    Called once, when the replays app is ready.
+    """
+    signals.pre_save.connect(
+        _RememberRankFields, sender=replay_model, dispatch_uid="replay_ranks.pre"
+    )
+    signals.post_save.connect(
+        _RefreshAfterSave, sender=replay_model, dispatch_uid="replay_ranks.post"
+    )
+    signals.post_delete.connect(
+        _RefreshAfterDelete, sender=replay_model, dispatch_uid="replay_ranks.delete"
+    )
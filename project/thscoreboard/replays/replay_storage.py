@@ -0,0 +1,451 @@
+"""Stores replay files outside the database, keyed by their SHA-256 hash.
+
+Replay files used to live only in the database: ReplayFile.replay_file and
+TemporaryReplayFile.replay. If settings.REPLAY_BLOB_STORE is set, new files
+are written to a blob store instead, and those columns are left empty. Since
+blobs are named after their contents' hash, uploading the same file twice
+stores it once, and publishing an uploaded replay doesn't copy it.
+
+Files that are already in the database stay there until they are moved with
+the move_replay_files_to_blob_store command. Until then, reads check the
+database first and then the blob store, so files can be read while they move.
+
+Blobs are never deleted when the rows that refer to them are. Instead,
+DeleteOrphanedBlobs periodically deletes blobs nothing refers to any more.
+"""
+
+import abc
+import datetime
+import os
+import tempfile
+import threading
+import urllib.parse
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from replays import constant_helpers
+from replays import models
+
+
+class Error(Exception):
+    pass
+
+
+class MissingReplayFileError(Error):
+    """A replay file is in neither the database nor the blob store."""
+
+
+class BlobStore(abc.ABC):
+    """Somewhere to keep replay files, named after their SHA-256 hash.
+
+    Writes must be atomic: a blob either has all of its contents or does not
+    exist.
+    """
+
+    @abc.abstractmethod
+    def Put(self, key: bytes, data: bytes) -> None:
+        """Store a blob.
+
+        If the blob already exists, it is not rewritten, but its modification
+        time is updated so that DeleteOrphanedBlobs leaves it alone.
+        """
+
+    @abc.abstractmethod
+    def Get(self, key: bytes) -> Optional[bytes]:
+        """Read a whole blob, or return None if it does not exist."""
+
+    @abc.abstractmethod
+    def GetRange(self, key: bytes, start: int, end: int) -> Optional[bytes]:
+        """Read part of a blob, or return None if it does not exist.
+
+        Args:
+            key: The blob's key.
+            start: The offset of the first byte to read.
+            end: The offset just past the last byte to read.
+        """
+
+    @abc.abstractmethod
+    def GetSize(self, key: bytes) -> Optional[int]:
+        """Get a blob's size in bytes, or None if it does not exist."""
+
+    @abc.abstractmethod
+    def Delete(self, key: bytes) -> None:
+        """Delete a blob, if it exists."""
+
+    @abc.abstractmethod
+    def IterKeys(self, modified_before: datetime.datetime) -> Iterator[bytes]:
+        """List the blobs last written before a given time."""
+
+
+class FilesystemBlobStore(BlobStore):
+    """Keeps blobs as files in a local directory.
+
+    Blobs are sharded into subdirectories by the first bytes of their hash
+    (so the blob with hash abcdef... is at ab/cd/abcdef...) to keep
+    directories small.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _Path(self, key: bytes) -> Path:
+        name = key.hex()
+        return self.root / name[0:2] / name[2:4] / name
+
+    def Put(self, key: bytes, data: bytes) -> None:
+        path = self._Path(key)
+        if path.exists():
+            os.utime(path)
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file in the same directory and rename it into
+        # place, so that readers never see a partly-written blob.
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_name, path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+    def Get(self, key: bytes) -> Optional[bytes]:
+        try:
+            return self._Path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def GetRange(self, key: bytes, start: int, end: int) -> Optional[bytes]:
+        try:
+            with open(self._Path(key), "rb") as f:
+                f.seek(start)
+                return f.read(max(0, end - start))
+        except FileNotFoundError:
+            return None
+
+    def GetSize(self, key: bytes) -> Optional[int]:
+        try:
+            return self._Path(key).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def Delete(self, key: bytes) -> None:
+        self._Path(key).unlink(missing_ok=True)
+
+    def IterKeys(self, modified_before: datetime.datetime) -> Iterator[bytes]:
+        cutoff = modified_before.timestamp()
+        for path in self.root.glob("??/??/*"):
+            if path.name.startswith("."):
+                continue
+            try:
+                if path.stat().st_mtime >= cutoff:
+                    continue
+                yield bytes.fromhex(path.name)
+            except (FileNotFoundError, ValueError):
+                continue
+
+
+class S3BlobStore(BlobStore):
+    """Keeps blobs in an S3 (or S3-compatible) bucket.
+
+    Args:
+        bucket: The bucket's name.
+        prefix: A prefix for every blob's key, such as "replays/".
+        client: A boto3 S3 client. If None, one is created from the
+            environment, using endpoint_url if it is set.
+        endpoint_url: The URL of an S3-compatible service to use instead of
+            AWS.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        client=None,
+        endpoint_url: Optional[str] = None,
+    ):
+        if client is None:
+            # boto3 is only needed by sites that keep replays in S3.
+            import boto3
+
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = client
+
+    def _Key(self, key: bytes) -> str:
+        return self.prefix + key.hex()
+
+    @staticmethod
+    def _IsNotFound(e: Exception) -> bool:
+        code = getattr(e, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def Put(self, key: bytes, data: bytes) -> None:
+        # S3 writes are atomic, and rewriting an existing object is the
+        # simplest way to update its modification time.
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._Key(key),
+            Body=data,
+            ContentType="application/octet-stream",
+        )
+
+    def Get(self, key: bytes) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._Key(key))
+        except Exception as e:
+            if self._IsNotFound(e):
+                return None
+            raise
+        return response["Body"].read()
+
+    def GetRange(self, key: bytes, start: int, end: int) -> Optional[bytes]:
+        if end <= start:
+            return b"" if self.GetSize(key) is not None else None
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket,
+                Key=self._Key(key),
+                Range=f"bytes={start}-{end - 1}",
+            )
+        except Exception as e:
+            if self._IsNotFound(e):
+                return None
+            raise
+        return response["Body"].read()
+
+    def GetSize(self, key: bytes) -> Optional[int]:
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._Key(key))
+        except Exception as e:
+            if self._IsNotFound(e):
+                return None
+            raise
+        return response["ContentLength"]
+
+    def Delete(self, key: bytes) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._Key(key))
+
+    def IterKeys(self, modified_before: datetime.datetime) -> Iterator[bytes]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                if obj["LastModified"] >= modified_before:
+                    continue
+                try:
+                    yield bytes.fromhex(obj["Key"][len(self.prefix) :])
+                except ValueError:
+                    continue
+
+
+def CreateBlobStore(url: str) -> BlobStore:
+    """Create a blob store from a URL.
+
+    Args:
+        url: Either file:///some/directory, or s3://bucket/optional/prefix.
+            S3-compatible services other than AWS can be used by also setting
+            settings.REPLAY_BLOB_STORE_S3_ENDPOINT_URL.
+
+    Raises:
+        ValueError: The URL isn't for a supported kind of store.
+    """
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme == "file":
+        return FilesystemBlobStore(Path(parsed.path))
+    if parsed.scheme == "s3":
+        prefix = parsed.path.lstrip("/")
+        if prefix and not prefix.endswith("/"):
+            prefix += "/"
+        return S3BlobStore(
+            bucket=parsed.netloc,
+            prefix=prefix,
+            endpoint_url=settings.REPLAY_BLOB_STORE_S3_ENDPOINT_URL,
+        )
+    raise ValueError(f"Unsupported replay blob store: {url}")
+
+
+_store_lock = threading.Lock()
+_store: Optional[tuple[str, BlobStore]] = None
+
+
+def GetBlobStore() -> Optional[BlobStore]:
+    """Get the configured blob store, or None if replays stay in the database."""
+    global _store
+    url = settings.REPLAY_BLOB_STORE
+    if not url:
+        return None
+    with _store_lock:
+        if _store is None or _store[0] != url:
+            _store = (url, CreateBlobStore(url))
+        return _store[1]
+
+
+def Put(
+    data: bytes, replay_hash: Optional[bytes] = None
+) -> tuple[Optional[bytes], bytes]:
+    """Store a replay file in the blob store, if there is one.
+
+    Args:
+        data: The replay file.
+        replay_hash: The file's hash, if the caller already knows it.
+
+    Returns:
+        What to save in the model's file column (None if the file went to the
+        blob store), and the file's hash.
+    """
+    if replay_hash is None:
+        replay_hash = constant_helpers.CalculateReplayFileHash(data)
+    store = GetBlobStore()
+    if store is None:
+        return data, replay_hash
+    store.Put(replay_hash, bytes(data))
+    return None, replay_hash
+
+
+def Read(inline: Optional[bytes], replay_hash: Optional[bytes]) -> bytes:
+    """Read a replay file from wherever it is kept.
+
+    Args:
+        inline: The contents of the model's file column.
+        replay_hash: The file's hash.
+
+    Raises:
+        MissingReplayFileError: The file isn't in the database, and can't be
+            found in the blob store.
+    """
+    if inline is not None:
+        return bytes(inline)
+    store = GetBlobStore()
+    data = None
+    if store is not None and replay_hash is not None:
+        data = store.Get(bytes(replay_hash))
+    if data is None:
+        raise MissingReplayFileError(
+            f"Replay file {bytes(replay_hash or b'').hex()} is missing"
+        )
+    return data
+
+
+def CreateTemporaryReplayFile(user, data: bytes) -> models.TemporaryReplayFile:
+    """Save an uploaded replay file until it is published."""
+    replay, replay_hash = Put(data)
+    temp_replay = models.TemporaryReplayFile(
+        user=user,
+        replay=replay,
+        replay_hash=None if replay is not None else replay_hash,
+    )
+    temp_replay.save()
+    return temp_replay
+
+
+def ReadTemporaryReplayFile(temp_replay: models.TemporaryReplayFile) -> bytes:
+    return Read(temp_replay.replay, temp_replay.replay_hash)
+
+
+def MoveToBlobStore(batch_size: int = 200) -> Iterator[int]:
+    """Move every replay file still in the database to the blob store.
+
+    Each batch is written to the blob store before the database copies are
+    removed, so an interrupted run loses nothing, and can simply be run again.
+
+    Yields:
+        The number of files moved by each batch.
+
+    Raises:
+        Error: No blob store is configured.
+    """
+    store = GetBlobStore()
+    if store is None:
+        raise Error("settings.REPLAY_BLOB_STORE is not set")
+
+    last_id = 0
+    while True:
+        batch = list(
+            models.ReplayFile.objects.filter(id__gt=last_id, replay_file__isnull=False)
+            .order_by("id")
+            .values_list("id", "replay_hash", "replay_file")[:batch_size]
+        )
+        if not batch:
+            break
+        for _, replay_hash, replay_file in batch:
+            store.Put(bytes(replay_hash), bytes(replay_file))
+        models.ReplayFile.objects.filter(id__in=[id for id, _, _ in batch]).update(
+            replay_file=None
+        )
+        last_id = batch[-1][0]
+        yield len(batch)
+
+    last_id = 0
+    while True:
+        batch = list(
+            models.TemporaryReplayFile.objects.filter(
+                id__gt=last_id, replay__isnull=False
+            ).order_by("id")[:batch_size]
+        )
+        if not batch:
+            break
+        for temp_replay in batch:
+            temp_replay.replay, temp_replay.replay_hash = Put(temp_replay.replay)
+        models.TemporaryReplayFile.objects.bulk_update(batch, ["replay", "replay_hash"])
+        last_id = batch[-1].id
+        yield len(batch)
+
+
+ORPHAN_GRACE_PERIOD = datetime.timedelta(days=1)
+"""How old an unused blob must be before DeleteOrphanedBlobs deletes it.
+
+A new blob is written before the row that refers to it, so recent blobs may
+be about to be used.
+"""
+
+
+def _GetReferencedHashes(keys: Iterable[bytes]) -> set[bytes]:
+    keys = list(keys)
+    referenced = set()
+    for model in (models.ReplayFile, models.TemporaryReplayFile):
+        referenced.update(
+            bytes(h)
+            for h in model.objects.filter(replay_hash__in=keys).values_list(
+                "replay_hash", flat=True
+            )
+        )
+    return referenced
+
+
+def DeleteOrphanedBlobs(
+    now: Optional[datetime.datetime] = None, batch_size: int = 500
+) -> int:
+    """Delete blobs that no replay file refers to any more.
+
+    Returns:
+        The number of blobs deleted.
+    """
+    store = GetBlobStore()
+    if store is None:
+        return 0
+    cutoff = (now or timezone.now()) - ORPHAN_GRACE_PERIOD
+
+    deleted = 0
+    batch = []
+    for key in store.IterKeys(modified_before=cutoff):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            deleted += _DeleteUnreferenced(store, batch)
+            batch = []
+    if batch:
+        deleted += _DeleteUnreferenced(store, batch)
+    return deleted
+
+
+def _DeleteUnreferenced(store: BlobStore, keys: list[bytes]) -> int:
+    referenced = _GetReferencedHashes(keys)
+    orphans = [k for k in keys if k not in referenced]
+    for k in orphans:
+        store.Delete(k)
+    return len(orphans)
@@ -0,0 +1,251 @@
+"""Filtered, paginated queries against a game's scoreboard.
+
+The full scoreboard snapshot (see scoreboard_snapshots) contains every listed
+replay for a game, which is a lot to download if the viewer only wants to see
+one difficulty and shot. Instead, clients can ask for just the replays matching
+some filters, a page at a time.
+
+Pages are ordered by score, best first, with ties broken by ID. Rather than
+counting rows with an offset, each page ends with a cursor naming the
+(score, id) of its last replay, and the next page starts after it; this lets
+the database walk the scoring_division index instead of reading every row
+before the page.
+"""
+
+import dataclasses
+from typing import Mapping, Optional
+
+from django.db.models import (
+    Case,
+    CharField,
+    Exists,
+    OuterRef,
+    Q,
+    Value,
+    When,
+    functions,
+)
+
+from replays import constant_helpers
+from replays import models
+from replays import replay_feeds
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+QUERY_PARAMETERS = frozenset(
+    [
+        "difficulty",
+        "shot",
+        "route",
+        "category",
+        "level",
+        "scene",
+        "best_per_player",
+        "cursor",
+        "limit",
+    ]
+)
+"""The query parameters understood by ParseQuery."""
+
+_CATEGORIES = {
+    "standard": models.Category.STANDARD,
+    "tas": models.Category.TAS,
+}
+
+_TRUE_VALUES = ("1", "true")
+_FALSE_VALUES = ("0", "false")
+
+
+class InvalidQueryError(Exception):
+    """Raised if a scoreboard query's parameters don't make sense."""
+
+
+@dataclasses.dataclass(frozen=True)
+class Cursor:
+    """The position just after the last replay on a page."""
+
+    score: int
+    replay_id: int
+
+    def Encode(self) -> str:
+        return f"{self.score}.{self.replay_id}"
+
+    @classmethod
+    def Decode(cls, s: str) -> "Cursor":
+        score, sep, replay_id = s.partition(".")
+        try:
+            if not sep:
+                raise ValueError()
+            return cls(score=int(score), replay_id=int(replay_id))
+        except ValueError:
+            raise InvalidQueryError(f"Invalid cursor {s!r}")
+
+
+@dataclasses.dataclass(frozen=True)
+class ScoreboardQuery:
+    """A request for some of the replays on a game's scoreboard."""
+
+    game_id: str
+    difficulty: Optional[int] = None
+    shot: Optional[models.Shot] = None
+    route: Optional[models.Route] = None
+    category: Optional[models.Category] = None
+    scene_game_level: Optional[int] = None
+    scene_game_scene: Optional[int] = None
+
+    best_per_player: bool = False
+    """If true, only each player's best replay is included."""
+
+    after: Optional[Cursor] = None
+    """If set, only replays after this cursor are included."""
+
+    limit: int = DEFAULT_PAGE_SIZE
+
+
+@dataclasses.dataclass(frozen=True)
+class Page:
+    rows: list[tuple]
+    """The replays on this page, as replays_to_json.ROW_FIELDS values."""
+
+    next_cursor: Optional[Cursor]
+    """Where the next page starts, or None if this is the last page."""
+
+
+def IsScoreboardQuery(params: Mapping[str, str]) -> bool:
+    """Returns whether a request asks for a filtered scoreboard."""
+    return any(p in params for p in QUERY_PARAMETERS)
+
+
+def ParseQuery(game: models.Game, params: Mapping[str, str]) -> ScoreboardQuery:
+    """Parse a scoreboard query from a request's query parameters.
+
+    Raises:
+        InvalidQueryError: A parameter is malformed, or names something that
+            isn't part of this game.
+    """
+    constants = constant_helpers.GetConstantModelIndex()
+    query = {"game_id": game.game_id}
+
+    if "difficulty" in params:
+        difficulty = _ParseInt(params, "difficulty")
+        if not 0 <= difficulty < game.num_difficulties:
+            raise InvalidQueryError(f"Invalid difficulty {difficulty}")
+        query["difficulty"] = difficulty
+    if "shot" in params:
+        try:
+            query["shot"] = constants.GetShot(game.game_id, params["shot"])
+        except models.Shot.DoesNotExist:
+            raise InvalidQueryError(f"Invalid shot {params['shot']!r}")
+    if "route" in params:
+        try:
+            query["route"] = constants.GetRoute(game.game_id, params["route"])
+        except models.Route.DoesNotExist:
+            raise InvalidQueryError(f"Invalid route {params['route']!r}")
+    if "category" in params:
+        try:
+            query["category"] = _CATEGORIES[params["category"].lower()]
+        except KeyError:
+            raise InvalidQueryError(f"Invalid category {params['category']!r}")
+    if "level" in params:
+        query["scene_game_level"] = _ParseInt(params, "level")
+    if "scene" in params:
+        query["scene_game_scene"] = _ParseInt(params, "scene")
+
+    if "best_per_player" in params:
+        value = params["best_per_player"].lower()
+        if value not in _TRUE_VALUES + _FALSE_VALUES:
+            raise InvalidQueryError(f"Invalid best_per_player {value!r}")
+        query["best_per_player"] = value in _TRUE_VALUES
+    if "cursor" in params:
+        query["after"] = Cursor.Decode(params["cursor"])
+    if "limit" in params:
+        limit = _ParseInt(params, "limit")
+        if not 0 < limit <= MAX_PAGE_SIZE:
+            raise InvalidQueryError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        query["limit"] = limit
+
+    return ScoreboardQuery(**query)
+
+
+def _ParseInt(params: Mapping[str, str], name: str) -> int:
+    try:
+        return int(params[name])
+    except ValueError:
+        raise InvalidQueryError(f"Invalid {name} {params[name]!r}")
+
+
+def GetPage(query: ScoreboardQuery) -> Page:
+    """Get a page of the replays matching a query, best first."""
+    replays = _FilterReplays(query)
+    if query.best_per_player:
+        replays = _OnlyBestPerPlayer(replays, _FilterReplays(query))
+    if query.after is not None:
+        replays = replays.filter(
+            Q(score__lt=query.after.score)
+            | Q(score=query.after.score, id__lt=query.after.replay_id)
+        )
+
+    # Fetch one extra replay to find out whether there's another page.
+    rows = list(
+        replay_feeds.Rows(replays.order_by("-score", "-id"), named=True)[
+            : query.limit + 1
+        ]
+    )
+    if len(rows) <= query.limit:
+        return Page(rows=rows, next_cursor=None)
+    rows = rows[: query.limit]
+    last = rows[-1]
+    return Page(rows=rows, next_cursor=Cursor(last.score, last.id))
+
+
+def _FilterReplays(query: ScoreboardQuery) -> models.ReplayQuerySet:
+    replays = replay_feeds.GetScoreboardReplays(query.game_id)
+    if query.difficulty is not None:
+        replays = replays.filter(difficulty=query.difficulty)
+    if query.shot is not None:
+        replays = replays.filter(shot_id=query.shot.id)
+    if query.route is not None:
+        replays = replays.filter(route_id=query.route.id)
+    if query.category is not None:
+        replays = replays.filter(category=query.category)
+    if query.scene_game_level is not None:
+        replays = replays.filter(scene_game_level=query.scene_game_level)
+    if query.scene_game_scene is not None:
+        replays = replays.filter(scene_game_scene=query.scene_game_scene)
+    return replays
+
+
+def _PlayerKey() -> Case:
+    # Imported replays have no user, so they are grouped by imported_username.
+    return Case(
+        When(
+            user__isnull=False,
+            then=functions.Concat(
+                Value("user:"), functions.Cast("user_id", output_field=CharField())
+            ),
+        ),
+        default=functions.Concat(Value("imported:"), "imported_username"),
+        output_field=CharField(),
+    )
+
+
+def _OnlyBestPerPlayer(
+    replays: models.ReplayQuerySet, candidates: models.ReplayQuerySet
+) -> models.ReplayQuerySet:
+    """Exclude replays which the same player has beaten among candidates.
+
+    This is a NOT EXISTS rather than a window function so that the cursor
+    filter applied afterwards doesn't change which replay is a player's best.
+    """
+    better = (
+        candidates.order_by()
+        .annotate(player=_PlayerKey())
+        .filter(player=OuterRef("player"))
+        .filter(
+            Q(score__gt=OuterRef("score"))
+            | Q(score=OuterRef("score"), id__gt=OuterRef("id"))
+        )
+    )
+    return replays.annotate(player=_PlayerKey()).filter(~Exists(better))
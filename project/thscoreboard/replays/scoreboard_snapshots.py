@@ -0,0 +1,151 @@
+"""Precomputed snapshots of each game's scoreboard JSON.
+
+A game's scoreboard is the same for everyone who speaks the same language,
+but building it means serializing every listed replay for that game, which
+for the older games runs to tens of thousands of rows. Instead, we build the
+serialized (and gzipped) scoreboard once per game and language, keep it in
+the cache, and throw it away whenever one of the game's replays changes.
+
+Snapshots are rebuilt lazily, on the first request after they are thrown away.
+"""
+
+import dataclasses
+import gzip
+import hashlib
+import io
+import time
+import uuid
+from typing import Iterable
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import signals
+from django.utils import translation
+
+from replays import models
+from replays import replay_feeds
+from replays import replays_to_json
+
+
+@dataclasses.dataclass(frozen=True)
+class Snapshot:
+    """A serialized scoreboard for a single game and language."""
+
+    gzipped_content: bytes
+    """The scoreboard NDJSON, already gzipped."""
+
+    etag: str
+    """A strong ETag for the (uncompressed) content."""
+
+    last_modified: int
+    """When the snapshot was built, in seconds since the epoch."""
+
+    @property
+    def content(self) -> bytes:
+        return gzip.decompress(self.gzipped_content)
+
+
+def GetSnapshot(game_id: str) -> Snapshot:
+    """Get the scoreboard snapshot for a game in the active language.
+
+    Builds and stores the snapshot if there isn't an up-to-date one already.
+    """
+    # The generation must be read before the replays are, so that if a replay
+    # changes while we're building, we store the snapshot under a generation
+    # nobody will ask for again rather than serving it as up-to-date.
+    key = _SnapshotKey(game_id, translation.get_language(), _GetGeneration(game_id))
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = _BuildSnapshot(
+            replays_to_json.encode_rows(
+                replay_feeds.IterateRows(
+                    replay_feeds.Rows(replay_feeds.GetScoreboardReplays(game_id))
+                )
+            )
+        )
+        cache.set(key, snapshot, timeout=None)
+    return snapshot
+
+
+def InvalidateGames(game_ids: Iterable[str]) -> None:
+    """Throw away the snapshots for these games once the transaction commits.
+
+    Waiting for the commit means that a request can't rebuild the snapshot
+    from data that is about to change.
+    """
+    game_ids = set(game_ids)
+    if game_ids:
+        transaction.on_commit(lambda: _BumpGenerations(game_ids))
+
+
+def InvalidateGamesForUser(user) -> None:
+    """Throw away the snapshots for every game this user has a replay in."""
+    InvalidateGames(
+        models.Replay.objects.filter(user=user)
+        .values_list("shot__game_id", flat=True)
+        .distinct()
+    )
+
+
+def _BuildSnapshot(lines: Iterable[bytes]) -> Snapshot:
+    # Compress and hash the lines as they arrive, so that only the compressed
+    # scoreboard is ever held in memory in full.
+    digest = hashlib.sha256()
+    gzipped = io.BytesIO()
+    # mtime=0 keeps the compressed bytes stable for the same content.
+    with gzip.GzipFile(fileobj=gzipped, mode="wb", mtime=0) as f:
+        for line in lines:
+            digest.update(line)
+            f.write(line)
+    return Snapshot(
+        gzipped_content=gzipped.getvalue(),
+        etag='"' + digest.hexdigest()[:32] + '"',
+        last_modified=int(time.time()),
+    )
+
+
+def _GenerationKey(game_id: str) -> str:
+    return f"scoreboard_snapshot_generation:{game_id}"
+
+
+def _SnapshotKey(game_id: str, language: str, generation: str) -> str:
+    return f"scoreboard_snapshot:{game_id}:{language}:{generation}"
+
+
+def _GetGeneration(game_id: str) -> str:
+    # Generations are random rather than counters so that if the cache evicts
+    # a generation, we can't accidentally start reusing an old one.
+    return cache.get_or_set(_GenerationKey(game_id), _NewGeneration, timeout=None)
+
+
+def _BumpGenerations(game_ids: Iterable[str]) -> None:
+    cache.set_many(
+        {_GenerationKey(g): _NewGeneration() for g in game_ids}, timeout=None
+    )
+
+
+def _NewGeneration() -> str:
+    return uuid.uuid4().hex
+
+
+def _InvalidateReplayGame(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    InvalidateGames([instance.shot.game_id])
+
+
+def ConnectSignals(replay_model) -> None:
+    """Throw away snapshots when replay_model rows change.
+
+    Called once, when the replays app is ready.
+    """
+    signals.post_save.connect(
+        _InvalidateReplayGame,
+        sender=replay_model,
+        dispatch_uid="scoreboard_snapshots.post",
+    )
+    signals.post_delete.connect(
+        _InvalidateReplayGame,
+        sender=replay_model,
+        dispatch_uid="scoreboard_snapshots.delete",
+    )
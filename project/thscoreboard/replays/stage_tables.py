@@ -0,0 +1,160 @@
+"""Each replay's stage splits, formatted for display.
+
+Formatting a replay's stages derives power, lives, bombs and a handful of
+game-specific gauges from every one of its ReplayStage rows. Rather than doing
+that every time the replay's page is viewed, we do it whenever the stages are
+written (by create_replay and reanalyze_replay) and store the result as the
+replay's ReplayStageTable, so that the page reads a single row.
+
+Tables that are missing, or were built by an older version of
+game_fields.FormatStageRow, are built the first time they are read.
+
+The stored rows are the same in every language. The only value that is
+translated, TH09's player 2 shot, is stored by ID and named by GetRows().
+"""
+
+import copy
+from typing import Any, Iterable, Optional
+
+from django.db.models import QuerySet
+from django.db.models import signals
+
+from replays import constant_helpers
+from replays import game_fields
+from replays import game_ids
+from replays import models
+
+
+def Build(
+    replay: models.Replay,
+    stages: Iterable[models.ReplayStage],
+    constants: Optional[constant_helpers.ConstantModelIndex] = None,
+) -> models.ReplayStageTable:
+    """Build a replay's stage table, without saving it.
+
+    Args:
+        replay: The replay.
+        stages: All of the replay's stages.
+        constants: The constant model index. Fetched if not given.
+    """
+    if constants is None:
+        constants = constant_helpers.GetConstantModelIndex()
+    shot = constants.GetShotById(replay.shot_id)
+    return models.ReplayStageTable(
+        replay=replay,
+        version=game_fields.STAGE_TABLE_VERSION,
+        rows=game_fields.FormatStages(
+            shot.game_id,
+            sorted((_AsSaved(s) for s in stages), key=lambda s: s.stage),
+            shot.shot_id,
+            constants,
+        ),
+    )
+
+
+def _AsSaved(stage: models.ReplayStage) -> models.ReplayStage:
+    """Copy a stage, with its values as they are saved to the database.
+
+    The parser gives some integer fields as floats, such as TH12's bomb
+    pieces, which come in halves; saving them truncates them. Format the
+    values that will be read back, not the ones that were parsed.
+    """
+    saved = copy.copy(stage)
+    for f in stage._meta.concrete_fields:
+        if not f.is_relation:
+            setattr(saved, f.attname, f.get_prep_value(getattr(stage, f.attname)))
+    return saved
+
+
+def Store(
+    replays_and_stages: Iterable[tuple[models.Replay, Iterable[models.ReplayStage]]],
+    constants: Optional[constant_helpers.ConstantModelIndex] = None,
+) -> None:
+    """Build and save the stage tables for some replays, in a single query.
+
+    Any tables the replays already have are replaced.
+
+    Args:
+        replays_and_stages: Pairs of a replay and all of its stages.
+        constants: The constant model index. Fetched if not given.
+    """
+    if constants is None:
+        constants = constant_helpers.GetConstantModelIndex()
+    tables = [Build(replay, stages, constants) for replay, stages in replays_and_stages]
+    if tables:
+        _Save(tables)
+
+
+def GetRows(replay: models.Replay) -> list[dict[str, Any]]:
+    """Get a replay's formatted stages, in the active language.
+
+    If the replay has no up-to-date stage table, one is built and stored. To
+    avoid a query, select "stage_table" along with the replay.
+
+    Returns:
+        One dict per stage, in order. Values that would be blank are left out.
+    """
+    try:
+        table = replay.stage_table
+    except models.ReplayStageTable.DoesNotExist:
+        table = None
+
+    if table is None or table.version != game_fields.STAGE_TABLE_VERSION:
+        table = Build(replay, models.ReplayStage.objects.filter(replay=replay))
+        _Save([table])
+
+    return [_Localize(row) for row in table.rows]
+
+
+def _Save(tables: list[models.ReplayStageTable]) -> None:
+    models.ReplayStageTable.objects.bulk_create(
+        tables,
+        update_conflicts=True,
+        unique_fields=["replay"],
+        update_fields=["version", "rows"],
+    )
+
+
+def _Localize(row: dict[str, Any]) -> dict[str, Any]:
+    p2_shot = row.get("th09_p2_shot")
+    if p2_shot is None:
+        return row
+    return dict(
+        row, th09_p2_shotFormat=game_ids.GetShotName(game_ids.GameIDs.TH09, p2_shot)
+    )
+
+
+def _InvalidateStageTable(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    models.ReplayStageTable.objects.filter(replay=instance.replay_id).delete()
+
+
+def _InvalidateDeletedStage(sender, instance, origin=None, **kwargs):
+    # When a replay (or its user) is deleted, its stages are deleted along
+    # with it, one signal per stage; its stage table goes too, so there's
+    # nothing to do.
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if model is sender:
+        _InvalidateStageTable(sender, instance)
+
+
+def ConnectSignals(stage_model) -> None:
+    """Throw away a replay's stage table when one of its stages is saved or deleted.
+
+    This catches stages edited one at a time, as on the admin site; the stage
+    table is rebuilt when it is next read. Code that writes stages in bulk
+    calls Store() instead.
+
+    Called once, when the replays app is ready.
+    """
+    signals.post_save.connect(
+        _InvalidateStageTable,
+        sender=stage_model,
+        dispatch_uid="stage_tables.post",
+    )
+    signals.post_delete.connect(
+        _InvalidateDeletedStage,
+        sender=stage_model,
+        dispatch_uid="stage_tables.delete",
+    )
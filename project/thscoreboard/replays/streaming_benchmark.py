@@ -0,0 +1,185 @@
+"""Compares how many clients a JSON feed can serve under WSGI and under ASGI.
+
+Each run sends the same request from many clients at once, straight to
+Django's WSGI or ASGI handler (no server or network in between). Clients
+read slowly, pausing after each chunk of the response, like a browser on a
+slow connection would.
+
+Under WSGI, each client holds a worker thread until its response has been
+sent, so at most `workers` clients are served at a time. Under ASGI, a client
+waiting to read more of the response holds nothing but a coroutine.
+
+Only feeds served through replay_table_helpers.encode_feed, such as the front
+page's and each user's, are streamed. The game scoreboards are served from a
+snapshot in a single piece, so benchmarking them doesn't measure streaming.
+"""
+
+import asyncio
+import concurrent.futures
+import dataclasses
+import time
+import urllib.parse
+from typing import Optional
+
+from django.core.handlers import asgi
+from django.core.handlers import wsgi
+
+
+@dataclasses.dataclass(frozen=True)
+class StreamingRun:
+    """Measurements of many clients fetching a feed at once."""
+
+    server: str
+    clients: int
+    seconds: float
+    total_bytes: int
+    statuses: dict[int, int]
+    """The number of responses with each status code."""
+
+    def ClientsPerSecond(self) -> float:
+        return self.clients / self.seconds if self.seconds else 0.0
+
+    def BytesPerSecond(self) -> float:
+        return self.total_bytes / self.seconds if self.seconds else 0.0
+
+
+def BenchmarkWsgi(
+    path: str,
+    clients: int,
+    workers: int,
+    client_delay: float,
+    host: str = "localhost",
+) -> StreamingRun:
+    """Fetch path from many clients through Django's WSGI handler.
+
+    Args:
+        path: The path to fetch, which may include a query string.
+        clients: How many clients fetch the path.
+        workers: How many threads serve requests, like uWSGI's workers.
+        client_delay: How long each client waits after reading each chunk.
+        host: The Host header to send; must be in ALLOWED_HOSTS.
+    """
+    handler = wsgi.WSGIHandler()
+    parsed = urllib.parse.urlsplit(path)
+
+    def Fetch() -> tuple[int, int]:
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": parsed.path,
+            "QUERY_STRING": parsed.query,
+            "SERVER_NAME": host,
+            "SERVER_PORT": "80",
+            "HTTP_HOST": host,
+            "REMOTE_ADDR": "127.0.0.1",
+            "wsgi.url_scheme": "http",
+            "wsgi.input": _EmptyInput(),
+        }
+        status = []
+
+        def StartResponse(status_line, headers, exc_info=None):
+            status.append(int(status_line.split(" ", 1)[0]))
+
+        size = 0
+        response = handler(environ, StartResponse)
+        try:
+            for chunk in response:
+                size += len(chunk)
+                time.sleep(client_delay)
+        finally:
+            response.close()
+        return status[0], size
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda _: Fetch(), range(clients)))
+    return _MakeRun("wsgi", results, time.perf_counter() - start)
+
+
+async def BenchmarkAsgi(
+    path: str,
+    clients: int,
+    client_delay: float,
+    host: str = "localhost",
+) -> StreamingRun:
+    """Fetch path from many clients through Django's ASGI handler.
+
+    Args:
+        path: The path to fetch, which may include a query string.
+        clients: How many clients fetch the path, all at once.
+        client_delay: How long each client waits after reading each chunk.
+        host: The Host header to send; must be in ALLOWED_HOSTS.
+    """
+    handler = asgi.ASGIHandler()
+    parsed = urllib.parse.urlsplit(path)
+
+    async def Fetch() -> tuple[int, int]:
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": parsed.path,
+            "raw_path": parsed.path.encode("ascii"),
+            "query_string": parsed.query.encode("ascii"),
+            "root_path": "",
+            "headers": [(b"host", host.encode("ascii"))],
+            "client": ("127.0.0.1", 0),
+            "server": (host, 80),
+        }
+        status = []
+        size = 0
+        request_sent = False
+        done = asyncio.Event()
+
+        async def Receive():
+            # The request has no body; after that, wait until the response
+            # has been sent rather than reporting a disconnect.
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def Send(message):
+            nonlocal size
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if message.get("more_body"):
+                    await asyncio.sleep(client_delay)
+                else:
+                    done.set()
+
+        await handler(scope, Receive, Send)
+        done.set()
+        return status[0], size
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(Fetch() for _ in range(clients)))
+    return _MakeRun("asgi", results, time.perf_counter() - start)
+
+
+def _MakeRun(
+    server: str, results: list[tuple[int, int]], seconds: float
+) -> StreamingRun:
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    return StreamingRun(
+        server=server,
+        clients=len(results),
+        seconds=seconds,
+        total_bytes=sum(size for _, size in results),
+        statuses=statuses,
+    )
+
+
+class _EmptyInput:
+    def read(self, size: Optional[int] = None) -> bytes:
+        return b""
+
+    def readline(self, size: Optional[int] = None) -> bytes:
+        return b""
@@ -1,13 +1,42 @@
 """Template tags used to get access to games."""
 
 from django import template
+from django.template import loader
+from django.utils import translation
+from django.utils.safestring import SafeString
 
+from replays import constant_helpers
 from replays import get_all_games
 from replays import models
 
 register = template.Library()
 
+# The rendered game_nav, by language, along with the constant tables version
+# it was rendered from.
+_game_navs: dict[str, tuple[str, SafeString]] = {}
+
 
 @register.simple_tag
 def get_all_games_by_category() -> dict[str, list[models.Game]]:
     return get_all_games.get_all_games_by_category()
+
+
+@register.simple_tag
+def game_nav() -> SafeString:
+    """Render the list of scoreboards in the sidebar.
+
+    Nearly every page shows this list, and it only changes when the constant
+    tables do, so it is rendered once per language and reused.
+    """
+    version = constant_helpers.GetConstantModelIndex().version
+    language = translation.get_language()
+    cached = _game_navs.get(language)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    html = loader.render_to_string(
+        "replays/game_nav.html",
+        {"all_games_by_category": get_all_games.get_all_games_by_category()},
+    )
+    _game_navs[language] = (version, html)
+    return html
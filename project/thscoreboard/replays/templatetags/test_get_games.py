@@ -0,0 +1,39 @@
+from django.core.cache import cache
+from django.utils import translation
+
+from replays import constant_helpers
+from replays import game_ids
+from replays.templatetags import get_games
+from replays.testing import test_case
+
+
+class GameNavTest(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def testLinksToEveryGame(self):
+        html = get_games.game_nav()
+
+        for game in constant_helpers.GetConstantModelIndex().GetGames():
+            self.assertIn(f'href="/replays/{game.game_id}"', html)
+
+    def testIsRenderedOncePerLanguage(self):
+        with translation.override("en-us"):
+            english = get_games.game_nav()
+        with translation.override("ja"):
+            japanese = get_games.game_nav()
+
+        with self.assertNumQueries(0), translation.override("en-us"):
+            self.assertIs(get_games.game_nav(), english)
+        with self.assertNumQueries(0), translation.override("ja"):
+            self.assertIs(get_games.game_nav(), japanese)
+
+    def testIsRenderedAgainWhenTheConstantTablesChange(self):
+        before = get_games.game_nav()
+
+        constant_helpers.InvalidateConstantModelIndex()
+
+        after = get_games.game_nav()
+        self.assertIsNot(after, before)
+        self.assertIn(f'href="/replays/{game_ids.GameIDs.TH06}"', after)
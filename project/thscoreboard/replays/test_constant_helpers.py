@@ -1,6 +1,11 @@
+from unittest import mock
+
+from django.core.cache import cache
+
 from replays import game_ids
 from replays import constant_helpers
 from replays import replay_parsing
+from replays.management.commands import setup_constant_tables
 from replays.testing import test_case
 from replays.testing import test_replays
 
@@ -38,3 +43,54 @@ class ConstantHelpersTest(test_case.ReplayTestCase):
             constant_helpers.GetModelInstancesForReplay(replay_info)
 
         self.assertEqual(ctx.exception.id, "th5000")
+
+
+class ConstantModelIndexTest(test_case.ReplayTestCase):
+    def testIndexIsReused(self):
+        constant_helpers.GetConstantModelIndex()
+
+        with self.assertNumQueries(0):
+            replay_info = replay_parsing.Parse(test_replays.GetRaw("th8_normal"))
+            constants = constant_helpers.GetModelInstancesForReplay(replay_info)
+
+        self.assertEqual(constants.shot.shot_id, "Yukari")
+
+    def testVersionIsNotCheckedOnEveryCall(self):
+        constant_helpers.GetConstantModelIndex()
+
+        with mock.patch.object(cache, "get_or_set") as get_or_set:
+            constant_helpers.GetConstantModelIndex()
+
+        get_or_set.assert_not_called()
+
+    def testNoticesOtherProcessesInvalidatingIndex(self):
+        index = constant_helpers.GetConstantModelIndex()
+        cache.set(constant_helpers._CONSTANT_TABLES_VERSION_KEY, "from elsewhere")
+
+        self.assertIs(constant_helpers.GetConstantModelIndex(), index)
+        with mock.patch.object(constant_helpers, "_VERSION_CHECK_INTERVAL", 0):
+            self.assertIsNot(constant_helpers.GetConstantModelIndex(), index)
+
+    def testSetUpConstantTablesInvalidatesIndex(self):
+        index = constant_helpers.GetConstantModelIndex()
+
+        setup_constant_tables.SetUpConstantTables()
+
+        self.assertIsNot(constant_helpers.GetConstantModelIndex(), index)
+
+    def testShotsForGame(self):
+        index = constant_helpers.GetConstantModelIndex()
+
+        shots = index.GetShotsForGame(game_ids.GameIDs.TH06)
+
+        self.assertEqual(
+            [s.shot_id for s in shots], ["ReimuA", "ReimuB", "MarisaA", "MarisaB"]
+        )
+        self.assertEqual(index.GetShotsForGame("th99"), [])
+
+    def testRoutesForGame(self):
+        index = constant_helpers.GetConstantModelIndex()
+
+        routes = index.GetRoutesForGame(game_ids.GameIDs.TH08)
+
+        self.assertEqual([r.route_id for r in routes], ["Final A", "Final B"])
@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.utils import translation
+
+from replays import constant_helpers
+from replays import filter_catalogue
+from replays import game_ids
+from replays import models
+from replays.testing import test_case
+
+
+class FilterCatalogueTest(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def testGameFilters(self):
+        game_filters = filter_catalogue.GetGameFilters(game_ids.GameIDs.TH08)
+
+        self.assertEqual(game_filters.game.game_id, game_ids.GameIDs.TH08)
+        self.assertEqual(
+            [f.name for f in game_filters.AllFilters()],
+            ["Difficulty", "Shot", "Route", "Category"],
+        )
+        self.assertEqual(game_filters.category.values, ["Standard", "Tool-Assisted"])
+        self.assertFalse(game_filters.category.has_all)
+        self.assertTrue(game_filters.show_route)
+
+    def testIsBuiltOnce(self):
+        first = filter_catalogue.GetGameFilters(game_ids.GameIDs.TH06)
+
+        with self.assertNumQueries(0):
+            second = filter_catalogue.GetGameFilters(game_ids.GameIDs.TH16)
+            third = filter_catalogue.GetGameFilters(game_ids.GameIDs.TH06)
+
+        self.assertIs(first, third)
+        self.assertEqual(second.game.game_id, game_ids.GameIDs.TH16)
+
+    def testIsRebuiltWhenTheConstantTablesChange(self):
+        before = filter_catalogue.GetGameFilters(game_ids.GameIDs.TH06)
+
+        constant_helpers.InvalidateConstantModelIndex()
+
+        self.assertIsNot(filter_catalogue.GetGameFilters(game_ids.GameIDs.TH06), before)
+
+    def testIsPerLanguage(self):
+        with translation.override("en-us"):
+            english = filter_catalogue.GetGameFilters(game_ids.GameIDs.TH06)
+        with translation.override("ja"):
+            japanese = filter_catalogue.GetGameFilters(game_ids.GameIDs.TH06)
+        with translation.override("en-us"):
+            english_again = filter_catalogue.GetGameFilters(game_ids.GameIDs.TH06)
+
+        self.assertIsNot(english, japanese)
+        self.assertIs(english, english_again)
+        for f in japanese.AllFilters():
+            for value in f.values:
+                self.assertIs(type(value), str)
+
+    def testUnknownGame(self):
+        with self.assertRaises(models.Game.DoesNotExist):
+            filter_catalogue.GetGameFilters("th99")
+
+    def testToJson(self):
+        with translation.override("en-us"):
+            json = filter_catalogue.GetGameFilters(game_ids.GameIDs.TH095).ToJson()
+
+        self.assertEqual(json["game"], game_ids.GameIDs.TH095)
+        self.assertEqual(
+            [(f["name"], f["has_all"]) for f in json["filters"]],
+            [("Level", True), ("Scene", True), ("Category", False)],
+        )
+        self.assertFalse(json["show_route"])
@@ -1,4 +1,6 @@
 from django import test
+from django.utils import functional
+from django.utils import translation
 
 from replays import game_ids
 from replays import models
@@ -30,6 +32,48 @@ class GameIDsTestCase(test.SimpleTestCase):
         )
         self.assertEqual(shot_name, "Reimu A")
 
+    def testGetShotNameForUnknownShot(self):
+        self.assertEqual(
+            game_ids.GetShotName(game_id=game_ids.GameIDs.TH08, shot_id="Mokou"),
+            "Mokou",
+        )
+        self.assertEqual(
+            game_ids.GetShotName(game_id=game_ids.GameIDs.TH06, shot_id="Mokou"),
+            "Bug shot",
+        )
+
+    def testGetCharacterAndSubshotNames(self):
+        self.assertEqual(
+            game_ids.GetCharacterName(game_ids.GameIDs.TH20, "MarisaGreen2"), "Marisa"
+        )
+        self.assertEqual(
+            game_ids.GetSubshotName(game_ids.GameIDs.TH20, "MarisaGreen2"), "Green2"
+        )
+        self.assertEqual(
+            game_ids.GetSubshotName(game_ids.GameIDs.TH17, "YoumuOtter"), "Otter"
+        )
+        self.assertIsNone(game_ids.GetSubshotName(game_ids.GameIDs.TH16, "Reimu"))
+        # Shots that aren't in the tables are still named by their parts.
+        self.assertEqual(
+            game_ids.GetSubshotName(game_ids.GameIDs.TH16, "NewShotWinter"), "Winter"
+        )
+
+    def testTranslationTableIsResolvedOncePerLanguage(self):
+        builds = []
+
+        def Build():
+            builds.append(1)
+            return {("key",): functional.lazy(translation.get_language, str)()}
+
+        table = game_ids._TranslationTable(Build)
+        with translation.override("en-us"):
+            self.assertEqual(table.Get()[("key",)], "en-us")
+            self.assertEqual(table.Get()[("key",)], "en-us")
+        with translation.override("ja"):
+            self.assertEqual(table.Get()[("key",)], "ja")
+
+        self.assertEqual(len(builds), 2)
+
     def testGetDifficultyName(self):
         difficulty_name = game_ids.GetDifficultyName(
             game_id=game_ids.GameIDs.TH06,
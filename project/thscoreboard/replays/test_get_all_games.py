@@ -19,3 +19,12 @@ class ReplayTest(test_case.ReplayTestCase):
             (g.game_id for g in all_games),
             (g.game_id for g in games_from_categories),
         )
+
+    def testNeedsNoQueriesOnceLoaded(self):
+        get_all_games.get_all_games_by_category()
+
+        with self.assertNumQueries(0):
+            get_all_games.get_all_games_by_category()
+            get_all_games.get_pc98_games()
+            get_all_games.get_windows_games()
+            get_all_games.get_scene_games()
@@ -1,8 +1,12 @@
 from datetime import datetime, timezone
+import json
+import multiprocessing
 from pathlib import Path
+import tempfile
 import unittest
 
 from replays.management.commands.import_royalflare import (
+    bulk_main,
     import_royalflare,
     parse_timestamp_from_json,
     parse_replay_path_from_json,
@@ -91,3 +95,99 @@ class ImportRoyalflareTest(test_case.ReplayTestCase):
 
         imported_replay: models.Replay = models.Replay.objects.get()
         self.assertEqual(imported_replay.route.GetName(), "Final B")
+
+
+class BulkImportRoyalflareTest(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.json_file = tempfile.NamedTemporaryFile(
+            mode="w", suffix=".json", encoding="utf-8"
+        )
+        self.addCleanup(self.json_file.close)
+
+    def _WriteJson(self, *replay_names):
+        infos = [
+            {
+                "player": f"Player {i}",
+                "comment": f"Comment {i}",
+                "replay": str(test_replays.TEST_REPLAY_LOCATION / f"{name}.rpy"),
+                "uploaded": "2022/01/01",
+            }
+            for i, name in enumerate(replay_names)
+        ]
+        json.dump(infos, self.json_file)
+        self.json_file.flush()
+
+    def _Import(self, workers=0):
+        return bulk_main(
+            str(test_replays.TEST_REPLAY_LOCATION.parent),
+            self.json_file.name,
+            workers=workers,
+            batch_size=2,
+            log=lambda _: None,
+        )
+
+    def testImportsReplays(self):
+        self._WriteJson("th10_normal", "th8_normal", "th6_extra")
+
+        stats = self._Import()
+
+        self.assertEqual(stats.imported, 3)
+        imported_replay = models.Replay.objects.get(imported_username="Player 1")
+        self.assertEqual(imported_replay.comment, "Comment 1")
+        self.assertIsNone(imported_replay.user)
+        self.assertEqual(imported_replay.route.GetName(), "Final B")
+        self.assertEqual(
+            imported_replay.created,
+            datetime(year=2022, month=1, day=1, tzinfo=timezone.utc),
+        )
+        self.assertTrue(imported_replay.is_good)
+        self.assertTrue(imported_replay.is_clear)
+        self.assertTrue(
+            models.ReplayStage.objects.filter(replay=imported_replay).exists()
+        )
+        self.assertEqual(
+            bytes(models.ReplayFile.objects.get(replay=imported_replay).replay_file),
+            test_replays.GetRaw("th8_normal"),
+        )
+
+    def testRanksImportedReplays(self):
+        self._WriteJson("th10_normal")
+
+        self._Import()
+
+        replay = models.Replay.objects.select_related("rank_view").get()
+        self.assertEqual(replay.GetRank(), 1)
+
+    def testSkipsDuplicates(self):
+        self._WriteJson("th10_normal", "th8_normal", "th10_normal")
+
+        stats = self._Import()
+
+        self.assertEqual(stats.imported, 2)
+        self.assertEqual(stats.duplicates, 1)
+        self.assertEqual(models.Replay.objects.count(), 2)
+
+        stats = self._Import()
+
+        self.assertEqual(stats.imported, 0)
+        self.assertEqual(stats.duplicates, 3)
+
+    def testReportsFailures(self):
+        self._WriteJson("th10_normal", "does_not_exist")
+
+        stats = self._Import()
+
+        self.assertEqual(stats.imported, 1)
+        self.assertEqual(stats.failures, 1)
+
+    def testParsesInWorkerProcesses(self):
+        if multiprocessing.current_process().daemon:
+            # For example, when running tests with --parallel.
+            self.skipTest("Daemonic processes can't start worker processes")
+        self._WriteJson("th10_normal", "th8_normal", "th6_extra")
+
+        stats = self._Import(workers=2)
+
+        self.assertEqual(stats.imported, 3)
+        self.assertEqual(models.Replay.objects.count(), 3)
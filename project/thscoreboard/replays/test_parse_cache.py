@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django import test
+from django.core.cache import cache
+
+from replays import parse_cache
+from replays import replay_parsing
+from replays.testing import test_replays
+
+
+class ParseCacheTest(test.SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        parse_cache.ClearLocal()
+        cache.clear()
+        self.replay = test_replays.GetRaw("th10_normal")
+
+    def _SpyOn(self, name):
+        return mock.patch.object(
+            replay_parsing, name, wraps=getattr(replay_parsing, name)
+        )
+
+    def testParsesOnlyOnce(self):
+        with self._SpyOn("Parse") as spy:
+            first = parse_cache.Parse(self.replay)
+            second = parse_cache.Parse(self.replay)
+
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(first, replay_parsing.Parse(self.replay))
+        self.assertEqual(second, first)
+
+    def testResultsAreCopies(self):
+        first = parse_cache.Parse(self.replay)
+        first.stages.clear()
+
+        self.assertNotEqual(parse_cache.Parse(self.replay).stages, [])
+
+    def testHeaderReusesFullParse(self):
+        parse_cache.Parse(self.replay)
+
+        with self._SpyOn("ParseHeader") as spy:
+            header = parse_cache.ParseHeader(self.replay)
+
+        spy.assert_not_called()
+        self.assertEqual(header, replay_parsing.ParseHeader(self.replay))
+
+    def testHeaderIsCachedOnItsOwn(self):
+        with self._SpyOn("ParseHeader") as spy:
+            parse_cache.ParseHeader(self.replay)
+            header = parse_cache.ParseHeader(self.replay)
+
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(header.stages, [])
+
+    def testErrorsAreNotCached(self):
+        bad = test_replays.GetRaw("th10_small")
+        with self._SpyOn("Parse") as spy:
+            for _ in range(2):
+                with self.assertRaises(replay_parsing.BadReplayError):
+                    parse_cache.Parse(bad)
+
+        self.assertEqual(spy.call_count, 2)
+
+    @test.override_settings(REPLAY_PARSE_CACHE_SIZE=1)
+    def testLeastRecentlyUsedIsEvicted(self):
+        other = test_replays.GetRaw("th6_extra")
+        with self._SpyOn("Parse") as spy:
+            parse_cache.Parse(self.replay)
+            parse_cache.Parse(other)
+            parse_cache.Parse(self.replay)
+
+        self.assertEqual(spy.call_count, 3)
+
+    def testNewParserVersionInvalidates(self):
+        with self._SpyOn("Parse") as spy:
+            parse_cache.Parse(self.replay)
+            with mock.patch.object(replay_parsing, "PARSER_VERSION", -1):
+                parse_cache.Parse(self.replay)
+
+        self.assertEqual(spy.call_count, 2)
+
+    @test.override_settings(REPLAY_PARSE_SHARED_CACHE="default")
+    def testSharedCache(self):
+        with self._SpyOn("Parse") as spy:
+            parse_cache.Parse(self.replay)
+            # Simulate another process, which has its own local cache.
+            parse_cache.ClearLocal()
+            replay_info = parse_cache.Parse(self.replay)
+
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(replay_info, replay_parsing.Parse(self.replay))
@@ -0,0 +1,37 @@
+import unittest
+
+from replays import parser_benchmark
+from replays.testing import test_replays
+
+
+class ParserBenchmarkTest(unittest.TestCase):
+    def setUp(self):
+        self.paths = [
+            test_replays.TEST_REPLAY_LOCATION / "th10_normal.rpy",
+            test_replays.TEST_REPLAY_LOCATION / "th6_extra.rpy",
+            test_replays.TEST_REPLAY_LOCATION / "th10_small.rpy",
+        ]
+
+    def testBenchmark(self):
+        skipped = []
+        run = parser_benchmark.Benchmark(self.paths, repeat=1, log=skipped.append)
+
+        self.assertEqual(
+            [r.filename for r in run.replays], ["th10_normal.rpy", "th6_extra.rpy"]
+        )
+        self.assertEqual(len(skipped), 1)
+
+        th10 = run.replays[0]
+        self.assertEqual(th10.game, "th10")
+        self.assertEqual(set(th10.phase_seconds), set(parser_benchmark.PHASES))
+        self.assertGreater(th10.phase_seconds["unlzss"], 0)
+        self.assertGreater(th10.peak_memory, 0)
+        self.assertEqual(run.GetGameTotals()["th10"]["replays"], 1)
+
+    def testRoundTripAndCompare(self):
+        run = parser_benchmark.Benchmark(self.paths[:1], repeat=1)
+
+        loaded = parser_benchmark.BenchmarkRun.FromJson(run.ToJson())
+
+        self.assertEqual(loaded, run)
+        self.assertEqual(parser_benchmark.Compare(loaded, run), {"th10": 1.0})
@@ -1,8 +1,15 @@
 import datetime
+import multiprocessing
+import tempfile
+from unittest import mock
+
+from django import test
 
 from replays import game_ids
 from replays import models
+from replays import parse_cache
 from replays import reanalyze_replay
+from replays import replay_storage
 from replays.testing import test_case
 from replays.testing import test_replays
 
@@ -214,3 +221,166 @@ class ReanalyzeReplayTest(test_case.ReplayTestCase):
         reanalyze_replay.UpdateReplay(replay.id)
         new_replay = models.Replay.objects.get(id=replay.id)
         self.assertEqual(new_replay.route.route_id, "Final B")
+
+
+class ReanalyzeBatchTest(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.createUser("some-user")
+        self.th07_replay = test_replays.CreateAsPublishedReplay(
+            "th7_lunatic", self.user
+        )
+        self.th10_replay = test_replays.CreateAsPublishedReplay(
+            "th10_normal", self.user
+        )
+
+        # Break both replays.
+        self.th07_replay.shot = models.Shot.objects.get(
+            game=game_ids.GameIDs.TH07, shot_id="MarisaA"
+        )
+        self.th07_replay.save()
+        models.ReplayStage.objects.get(replay=self.th10_replay, stage=2).delete()
+
+    def testReanalyzeReplaysWithoutUpdate(self):
+        results = reanalyze_replay.ReanalyzeReplays(
+            [self.th07_replay.id, self.th10_replay.id], update=False, describe=True
+        )
+
+        self.assertEqual(
+            [r.replay_id for r in results], [self.th07_replay.id, self.th10_replay.id]
+        )
+        self.assertTrue(all(r.needs_update for r in results))
+        self.assertIn("MarisaA -> SakuyaB", results[0].diff)
+        self.assertIn("Stage 2:", results[1].diff)
+        self.assertTrue(reanalyze_replay.DoesReplayNeedUpdate(self.th07_replay.id))
+
+    def testReanalyzeReplaysWithUpdate(self):
+        reanalyze_replay.ReanalyzeReplays(
+            [self.th07_replay.id, self.th10_replay.id], update=True
+        )
+
+        self.assertEqual(
+            models.Replay.objects.get(id=self.th07_replay.id).shot.shot_id, "SakuyaB"
+        )
+        self.assertEqual(
+            models.ReplayStage.objects.filter(replay=self.th10_replay).count(), 6
+        )
+        self.assertFalse(reanalyze_replay.DoesReplayNeedUpdate(self.th07_replay.id))
+        self.assertFalse(reanalyze_replay.DoesReplayNeedUpdate(self.th10_replay.id))
+
+    def testUpdateRefreshesRanks(self):
+        reanalyze_replay.ReanalyzeReplays([self.th07_replay.id], update=True)
+
+        rank = models.ReplayRank.objects.get(replay=self.th07_replay)
+        self.assertEqual(rank.shot.shot_id, "SakuyaB")
+
+    def testQueriesDoNotGrowWithBatchSize(self):
+        more_replays = [
+            test_replays.CreateAsPublishedReplay(name, self.user)
+            for name in ("th6_extra", "th8_normal", "th11_normal")
+        ]
+        ids = [self.th07_replay.id, self.th10_replay.id]
+
+        with self.assertNumQueries(5):
+            reanalyze_replay.ReanalyzeReplays(ids, update=False)
+        with self.assertNumQueries(5):
+            reanalyze_replay.ReanalyzeReplays(
+                ids + [r.id for r in more_replays], update=False
+            )
+
+    def testReanalyzeReplaysInChunks(self):
+        results = reanalyze_replay.ReanalyzeReplays(
+            [self.th10_replay.id, self.th07_replay.id], update=True, chunk_size=1
+        )
+
+        self.assertEqual(
+            [r.replay_id for r in results], [self.th07_replay.id, self.th10_replay.id]
+        )
+        self.assertFalse(reanalyze_replay.DoesReplayNeedUpdate(self.th07_replay.id))
+        self.assertFalse(reanalyze_replay.DoesReplayNeedUpdate(self.th10_replay.id))
+
+    def testBatchesSkipTheParseCache(self):
+        with mock.patch.object(parse_cache, "Parse") as cached_parse:
+            reanalyze_replay.ReanalyzeReplays(
+                [self.th07_replay.id, self.th10_replay.id], update=False
+            )
+
+        cached_parse.assert_not_called()
+
+    def testSingleReplaysUseTheParseCache(self):
+        with mock.patch.object(
+            parse_cache, "Parse", wraps=parse_cache.Parse
+        ) as cached_parse:
+            reanalyze_replay.UpdateReplay(self.th07_replay.id)
+
+        cached_parse.assert_called_once()
+
+    def _DeleteBlob(self, replay):
+        """Move a replay's file to an empty blob store, as if it had been lost."""
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        use_blob_store = test.override_settings(
+            REPLAY_BLOB_STORE=f"file://{temp_dir.name}"
+        )
+        use_blob_store.enable()
+        self.addCleanup(use_blob_store.disable)
+        models.ReplayFile.objects.filter(replay=replay).update(replay_file=None)
+
+    def testReanalyzeReplaysWithMissingBlob(self):
+        self._DeleteBlob(self.th07_replay)
+
+        results = reanalyze_replay.ReanalyzeReplays(
+            [self.th07_replay.id, self.th10_replay.id], update=True
+        )
+
+        self.assertEqual(
+            [r.replay_id for r in results], [self.th07_replay.id, self.th10_replay.id]
+        )
+        self.assertIsInstance(results[0].error, replay_storage.MissingReplayFileError)
+        self.assertIsNone(results[1].error)
+        self.assertFalse(reanalyze_replay.DoesReplayNeedUpdate(self.th10_replay.id))
+
+    def testReanalyzeAllWithMissingBlob(self):
+        self._DeleteBlob(self.th07_replay)
+
+        [results] = list(reanalyze_replay.ReanalyzeAll(update=True))
+
+        self.assertIsInstance(results[0].error, replay_storage.MissingReplayFileError)
+        self.assertIsNone(results[1].error)
+        self.assertFalse(reanalyze_replay.DoesReplayNeedUpdate(self.th10_replay.id))
+
+    def testReanalyzeAllInChunks(self):
+        chunks = list(reanalyze_replay.ReanalyzeAll(update=True, chunk_size=1))
+
+        self.assertEqual(len(chunks), 2)
+        self.assertFalse(reanalyze_replay.DoesReplayNeedUpdate(self.th07_replay.id))
+        self.assertFalse(reanalyze_replay.DoesReplayNeedUpdate(self.th10_replay.id))
+
+    def testReanalyzeAllDryRun(self):
+        for results in reanalyze_replay.ReanalyzeAll(update=False, chunk_size=1):
+            for r in results:
+                self.assertTrue(r.needs_update)
+
+        self.assertTrue(reanalyze_replay.DoesReplayNeedUpdate(self.th07_replay.id))
+
+    def testReanalyzeAllRespectsBounds(self):
+        chunks = list(
+            reanalyze_replay.ReanalyzeAll(
+                update=True, start_id=self.th07_replay.id, end_id=self.th10_replay.id
+            )
+        )
+
+        self.assertEqual(
+            [[r.replay_id for r in c] for c in chunks], [[self.th10_replay.id]]
+        )
+        self.assertTrue(reanalyze_replay.DoesReplayNeedUpdate(self.th07_replay.id))
+
+    def testReanalyzeAllInWorkerProcesses(self):
+        if multiprocessing.current_process().daemon:
+            # For example, when running tests with --parallel.
+            self.skipTest("Daemonic processes can't start worker processes")
+
+        list(reanalyze_replay.ReanalyzeAll(update=True, workers=2))
+
+        self.assertFalse(reanalyze_replay.DoesReplayNeedUpdate(self.th07_replay.id))
+        self.assertFalse(reanalyze_replay.DoesReplayNeedUpdate(self.th10_replay.id))
@@ -0,0 +1,111 @@
+from asgiref.sync import async_to_sync
+from django import test as django_test
+from django.core.cache import cache
+
+from replays import constant_helpers
+from replays import game_ids
+from replays import models
+from replays import replay_feeds
+from replays.testing import test_case
+from replays.testing import test_replays
+from replays.views import index
+from replays.views import replay_list
+from replays.views import user as user_views
+
+
+class ReplayFeedsTestCase(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.factory = django_test.RequestFactory()
+        self.user = self.createUser("somebody")
+
+    def _CreateReplays(self, count):
+        shots = [
+            models.Shot.objects.get(game_id=game_ids.GameIDs.TH05, shot_id="Mima"),
+            models.Shot.objects.get(
+                game_id=game_ids.GameIDs.TH08, shot_id="Reimu & Yukari"
+            ),
+            models.Shot.objects.get(game_id=game_ids.GameIDs.TH17, shot_id="ReimuWolf"),
+        ]
+        final_b = models.Route.objects.get(
+            game_id=game_ids.GameIDs.TH08, route_id="Final B"
+        )
+        for i in range(count):
+            shot = shots[i % len(shots)]
+            replay = test_replays.CreateReplayWithoutFile(
+                user=self.createUser(f"player{i}") if i % 2 else self.user,
+                shot=shot,
+                difficulty=i % 4,
+                score=1000 * (i + 1),
+                route=final_b if shot.game_id == game_ids.GameIDs.TH08 else None,
+            )
+            if i % 5 == 4:
+                models.Replay.objects.filter(id=replay.id).update(
+                    user=None, imported_username=f"imported{i}"
+                )
+        # The constant tables are cached separately; make sure they are
+        # loaded before counting queries.
+        constant_helpers.GetConstantModelIndex()
+
+    def _Content(self, response):
+        if response.streaming:
+            return b"".join(response.streaming_content)
+        return response.content
+
+    def _AssertQueryBudget(self, budget, get_response):
+        """Check that a view makes the same few queries for 1 or 10 replays."""
+        self._CreateReplays(1)
+        with self.assertNumQueries(budget):
+            self.assertEqual(len(self._Content(get_response()).splitlines()), 1)
+
+        cache.clear()
+        self._CreateReplays(9)
+        constant_helpers.GetConstantModelIndex()
+        with self.assertNumQueries(budget):
+            self.assertGreater(len(self._Content(get_response()).splitlines()), 1)
+
+    def testIndexQueryBudget(self):
+        self._AssertQueryBudget(
+            1,
+            lambda: async_to_sync(index.index_json)(
+                self.factory.get("/replays/index/json")
+            ),
+        )
+
+    def testUserPageQueryBudget(self):
+        self._AssertQueryBudget(
+            2,
+            lambda: async_to_sync(user_views.user_page_json)(
+                self.factory.get("/replays/user/somebody/json"), "somebody"
+            ),
+        )
+
+    def testScoreboardQueryBudget(self):
+        self._AssertQueryBudget(
+            1,
+            lambda: async_to_sync(replay_list.game_scoreboard_json)(
+                self.factory.get("/replays/th05/json"), game_ids.GameIDs.TH05
+            ),
+        )
+
+    def testFilteredScoreboardQueryBudget(self):
+        self._AssertQueryBudget(
+            2,
+            lambda: async_to_sync(replay_list.game_scoreboard_json)(
+                self.factory.get("/replays/th05/json", {"shot": "Mima"}),
+                game_ids.GameIDs.TH05,
+            ),
+        )
+
+    def testRecentReplaysAreNewestFirst(self):
+        self._CreateReplays(3)
+
+        ids = [row[0] for row in replay_feeds.GetRecentReplays()]
+
+        self.assertEqual(
+            ids,
+            list(
+                models.Replay.objects.order_by("-created").values_list("id", flat=True)
+            ),
+        )
@@ -0,0 +1,138 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache import caches
+from django.utils import translation
+
+from replays import constant_helpers
+from replays import models
+from replays import reanalyze_replay
+from replays import replay_pages
+from replays.testing import test_case
+from replays.testing import test_replays
+
+
+class ReplayPagesTest(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        caches["replay_pages"].clear()
+        self.user = self.createUser("somebody")
+        self.replay = test_replays.CreateAsPublishedReplay(
+            "th10_normal", user=self.user, comment="Nice run"
+        )
+        constant_helpers.GetConstantModelIndex()
+
+    def testPage(self):
+        page = replay_pages.GetPage(self.replay.id)
+
+        self.assertEqual(page.replay_id, self.replay.id)
+        self.assertEqual(page.game_id, "th10")
+        self.assertEqual(page.owner_id, self.user.id)
+        self.assertFalse(page.is_claimed)
+        self.assertTrue(page.has_replay_file)
+        self.assertEqual(page.comment, "Nice run")
+        self.assertEqual(page.player_name, "somebody")
+        self.assertIn("somebody", page.summary)
+        self.assertIn("Stage details", page.details)
+
+    def testIsRenderedOnce(self):
+        first = replay_pages.GetPage(self.replay.id)
+
+        with self.assertNumQueries(0):
+            second = replay_pages.GetPage(self.replay.id)
+
+        self.assertEqual(first, second)
+
+    def testIsPerLanguage(self):
+        with translation.override("en-us"):
+            replay_pages.GetPage(self.replay.id)
+        # Rendering the page looks up the replay and whether it has a file.
+        with translation.override("ja"), self.assertNumQueries(2):
+            replay_pages.GetPage(self.replay.id)
+
+    def testSavingReplayThrowsPageAway(self):
+        replay_pages.GetPage(self.replay.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.replay.comment = "Edited"
+            self.replay.save()
+
+        self.assertEqual(replay_pages.GetPage(self.replay.id).comment, "Edited")
+
+    def testDeletingReplayThrowsPageAway(self):
+        replay_pages.GetPage(self.replay.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.replay.delete()
+
+        with self.assertRaises(models.Replay.DoesNotExist):
+            replay_pages.GetPage(self.replay.id)
+
+    def testSavingStageThrowsPageAway(self):
+        replay_pages.GetPage(self.replay.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stage = models.ReplayStage.objects.get(replay=self.replay, stage=1)
+            stage.score = 123456789
+            stage.save()
+
+        self.assertIn("123,456,789", replay_pages.GetPage(self.replay.id).details)
+
+    def testDeletingStageThrowsPageAway(self):
+        models.ReplayStage.objects.filter(replay=self.replay, stage=6).update(
+            score=123456789
+        )
+        models.ReplayStageTable.objects.all().delete()
+        self.assertIn("123,456,789", replay_pages.GetPage(self.replay.id).details)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.ReplayStage.objects.get(replay=self.replay, stage=6).delete()
+
+        self.assertNotIn("123,456,789", replay_pages.GetPage(self.replay.id).details)
+
+    def testDeletingReplayInvalidatesPageOnce(self):
+        with mock.patch.object(
+            replay_pages, "InvalidateReplays", wraps=replay_pages.InvalidateReplays
+        ) as invalidate:
+            self.replay.delete()
+
+        invalidate.assert_called_once()
+
+    def testReanalysisThrowsPageAway(self):
+        models.ReplayStage.objects.filter(replay=self.replay, stage=1).update(
+            score=123456789
+        )
+        models.ReplayStageTable.objects.all().delete()
+        self.assertIn("123,456,789", replay_pages.GetPage(self.replay.id).details)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reanalyze_replay.UpdateReplay(self.replay.id)
+
+        self.assertNotIn("123,456,789", replay_pages.GetPage(self.replay.id).details)
+
+    def testDeletedUsersReplaysAreHidden(self):
+        replay_pages.GetPage(self.replay.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.MarkForDeletion()
+
+        with self.assertRaises(models.Replay.DoesNotExist):
+            replay_pages.GetPage(self.replay.id)
+
+    def testOtherReplaysAreKept(self):
+        other = test_replays.CreateAsPublishedReplay("th6_extra", user=self.user)
+        replay_pages.GetPage(other.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.replay.save()
+
+        with self.assertNumQueries(0):
+            replay_pages.GetPage(other.id)
+
+    def testPagesDoNotPushOutOtherCacheEntries(self):
+        cache.set("something_else", 1)
+
+        replay_pages._BumpGenerations(range(1000))
+
+        self.assertEqual(cache.get("something_else"), 1)
@@ -1,3 +1,4 @@
+import dataclasses
 import datetime
 import unittest
 
@@ -640,3 +641,68 @@ class AlcoReplayTestCase(unittest.TestCase):
         s1end = r.stages[0]
         self.assertEqual(s1end.stage, 1)
         self.assertEqual(s1end.score, 1269907)
+
+
+class ParseHeaderTestCase(unittest.TestCase):
+    def testMatchesParse(self):
+        for filename in [
+            "th6_extra",
+            "th6_hard_1cc",
+            "th7_extra",
+            "th7_phantasm",
+            "th8_normal",
+            "th8_extra",
+            "th8_spell_practice",
+            "th9_lunatic",
+            "th9_pvp",
+            "th95_3-1",
+            "th10_normal",
+            "th10_stage_practice",
+            "th11_normal",
+            "th11_small_file",
+            "th12_stage_practice",
+            "th128_c1",
+            "th13_normal",
+            "th14_normal",
+            "th15_hard",
+            "th16_spell_practice",
+            "th17_lunatic",
+            "th18_normal",
+            "th20_normal",
+            "alco_all_clear",
+        ]:
+            with self.subTest(filename=filename):
+                replay = test_replays.GetRaw(filename)
+                full = replay_parsing.Parse(replay)
+                header = replay_parsing.ParseHeader(replay)
+
+                self.assertEqual(header.stages, [])
+                # Some replays have a slowdown of NaN, which isn't equal to itself.
+                self.assertEqual(repr(header.slowdown), repr(full.slowdown))
+                self.assertEqual(
+                    dataclasses.replace(header, slowdown=None),
+                    dataclasses.replace(full, stages=[], slowdown=None),
+                )
+
+    def testTruncatedFile(self):
+        with self.assertRaises(replay_parsing.BadReplayError):
+            replay_parsing.ParseHeader(test_replays.GetRaw("th10_small"))
+
+
+class BufferTypesTestCase(unittest.TestCase):
+    def testAcceptsAnyBuffer(self):
+        for filename in ["th6_extra", "th7_lunatic", "th8_normal", "th10_normal"]:
+            with self.subTest(filename=filename):
+                replay = test_replays.GetRaw(filename)
+                expected = replay_parsing.Parse(replay)
+
+                self.assertEqual(replay_parsing.Parse(memoryview(replay)), expected)
+                self.assertEqual(replay_parsing.Parse(bytearray(replay)), expected)
+
+    def testDoesNotModifyTheInput(self):
+        replay = bytearray(test_replays.GetRaw("th7_lunatic"))
+        original = bytes(replay)
+
+        replay_parsing.Parse(replay)
+
+        self.assertEqual(replay, original)
@@ -0,0 +1,153 @@
+from replays import game_ids
+from replays import models
+from replays import replay_ranks
+from replays.testing import test_case
+from replays.testing import test_replays
+
+
+class ReplayRanksTest(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user1 = self.createUser("user1")
+        self.user2 = self.createUser("user2")
+        self.user3 = self.createUser("user3")
+        self.user4 = self.createUser("user4")
+        self.th05_mima = models.Shot.objects.get(
+            game_id=game_ids.GameIDs.TH05, shot_id="Mima"
+        )
+
+    def _Create(self, user, score, difficulty=1):
+        return test_replays.CreateReplayWithoutFile(
+            user=user,
+            difficulty=difficulty,
+            shot=self.th05_mima,
+            score=score,
+        )
+
+    def _Place(self, replay):
+        return (
+            models.Replay.objects.select_related("rank_view")
+            .get(id=replay.id)
+            .GetRank()
+        )
+
+    def testDeletingAReplayPromotesTheNextOne(self):
+        first = self._Create(self.user1, 400)
+        second = self._Create(self.user2, 300)
+        third = self._Create(self.user3, 200)
+        fourth = self._Create(self.user4, 100)
+        self.assertIsNone(self._Place(fourth))
+
+        first.delete()
+
+        self.assertEqual(self._Place(second), 1)
+        self.assertEqual(self._Place(third), 2)
+        self.assertEqual(self._Place(fourth), 3)
+
+    def testChangingCategoryRemovesRank(self):
+        first = self._Create(self.user1, 400)
+        second = self._Create(self.user2, 300)
+
+        first.category = models.Category.TAS
+        first.save()
+
+        self.assertIsNone(self._Place(first))
+        self.assertEqual(self._Place(second), 1)
+
+    def testChangingDivisionRefreshesBothDivisions(self):
+        first = self._Create(self.user1, 400)
+        second = self._Create(self.user2, 300)
+
+        first.difficulty = 2
+        first.save()
+
+        self.assertEqual(self._Place(first), 1)
+        self.assertEqual(self._Place(second), 1)
+
+    def testClaimingReplayAppliesPerPlayerBest(self):
+        self._Create(self.user1, 400)
+        imported = models.Replay.objects.create(
+            imported_username="rf",
+            shot=self.th05_mima,
+            difficulty=1,
+            score=300,
+            category=models.Category.STANDARD,
+            is_clear=True,
+            replay_type=models.ReplayType.FULL_GAME,
+        )
+        self.assertEqual(self._Place(imported), 2)
+
+        imported.user = self.user1
+        imported.save()
+
+        self.assertIsNone(self._Place(imported))
+
+    def testBatchRefreshDefersUntilTheEnd(self):
+        first = self._Create(self.user1, 400)
+        second = self._Create(self.user2, 300)
+
+        with replay_ranks.BatchRefresh():
+            first.delete()
+            self.assertEqual(self._Place(second), 2)
+
+        self.assertEqual(self._Place(second), 1)
+
+
+class PlayerMedalCountTest(ReplayRanksTest):
+    def _Medals(self):
+        return {
+            (m.user_id or m.imported_username): (
+                m.first_place_count,
+                m.second_place_count,
+                m.third_place_count,
+            )
+            for m in models.PlayerMedalCount.objects.filter(
+                game_id=game_ids.GameIDs.TH05
+            )
+        }
+
+    def testCountsMedals(self):
+        self._Create(self.user1, 400, difficulty=1)
+        self._Create(self.user1, 400, difficulty=2)
+        self._Create(self.user2, 300, difficulty=1)
+        self._Create(self.user3, 200, difficulty=1)
+        self._Create(self.user4, 100, difficulty=1)
+
+        self.assertEqual(
+            self._Medals(),
+            {
+                self.user1.id: (2, 0, 0),
+                self.user2.id: (0, 1, 0),
+                self.user3.id: (0, 0, 1),
+            },
+        )
+
+    def testImportedReplaysCountByUsername(self):
+        models.Replay.objects.create(
+            imported_username="rf",
+            shot=self.th05_mima,
+            difficulty=1,
+            score=300,
+            category=models.Category.STANDARD,
+            is_clear=True,
+            replay_type=models.ReplayType.FULL_GAME,
+        )
+
+        self.assertEqual(self._Medals(), {"rf": (1, 0, 0)})
+
+    def testDeletingAReplayUpdatesMedals(self):
+        first = self._Create(self.user1, 400)
+        self._Create(self.user2, 300)
+
+        first.delete()
+
+        self.assertEqual(self._Medals(), {self.user2.id: (1, 0, 0)})
+
+    def testUnlistedReplaysDoNotCount(self):
+        first = self._Create(self.user1, 400)
+        self._Create(self.user2, 300)
+
+        first.is_listed = False
+        first.save()
+
+        self.assertEqual(self._Medals(), {self.user2.id: (0, 1, 0)})
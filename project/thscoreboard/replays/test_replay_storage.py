@@ -0,0 +1,218 @@
+import datetime
+import tempfile
+from pathlib import Path
+
+from django import test
+
+from replays import constant_helpers
+from replays import models
+from replays import replay_downloads
+from replays import replay_storage
+from replays.testing import fake_s3
+from replays.testing import test_case
+from replays.testing import test_replays
+
+
+_DATA = b"some replay file"
+_KEY = constant_helpers.CalculateReplayFileHash(_DATA)
+_LATER = datetime.datetime.now(tz=datetime.timezone.utc) + datetime.timedelta(hours=1)
+
+
+class _BlobStoreTests:
+    """Tests every BlobStore implementation should pass."""
+
+    def testGet(self):
+        self.store.Put(_KEY, _DATA)
+
+        self.assertEqual(self.store.Get(_KEY), _DATA)
+        self.assertEqual(self.store.GetSize(_KEY), len(_DATA))
+
+    def testGetRange(self):
+        self.store.Put(_KEY, _DATA)
+
+        self.assertEqual(self.store.GetRange(_KEY, 5, 11), b"replay")
+        self.assertEqual(self.store.GetRange(_KEY, 12, 100), b"file")
+
+    def testMissing(self):
+        self.assertIsNone(self.store.Get(_KEY))
+        self.assertIsNone(self.store.GetRange(_KEY, 0, 4))
+        self.assertIsNone(self.store.GetSize(_KEY))
+
+    def testPutTwice(self):
+        self.store.Put(_KEY, _DATA)
+        self.store.Put(_KEY, _DATA)
+
+        self.assertEqual(list(self.store.IterKeys(_LATER)), [_KEY])
+
+    def testDelete(self):
+        self.store.Put(_KEY, _DATA)
+
+        self.store.Delete(_KEY)
+        self.store.Delete(_KEY)
+
+        self.assertIsNone(self.store.Get(_KEY))
+
+    def testIterKeysSkipsNewBlobs(self):
+        self.store.Put(_KEY, _DATA)
+
+        self.assertEqual(
+            list(self.store.IterKeys(_LATER - datetime.timedelta(days=1))), []
+        )
+
+
+class FilesystemBlobStoreTest(_BlobStoreTests, test.SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        self.store = replay_storage.FilesystemBlobStore(self.root)
+
+    def testFilesAreSharded(self):
+        self.store.Put(_KEY, _DATA)
+
+        name = _KEY.hex()
+        self.assertEqual(
+            [p.relative_to(self.root) for p in self.root.rglob("*") if p.is_file()],
+            [Path(name[0:2], name[2:4], name)],
+        )
+
+
+class S3BlobStoreTest(_BlobStoreTests, test.SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = fake_s3.FakeS3Client()
+        self.store = replay_storage.S3BlobStore(
+            "bucket", prefix="replays/", client=self.client
+        )
+
+    def testKeysArePrefixed(self):
+        self.store.Put(_KEY, _DATA)
+
+        self.assertEqual(
+            list(self.client.objects), [("bucket", "replays/" + _KEY.hex())]
+        )
+
+
+class CreateBlobStoreTest(test.SimpleTestCase):
+    def testFilesystem(self):
+        store = replay_storage.CreateBlobStore("file:///var/replays")
+
+        self.assertIsInstance(store, replay_storage.FilesystemBlobStore)
+        self.assertEqual(store.root, Path("/var/replays"))
+
+    def testUnsupported(self):
+        with self.assertRaises(ValueError):
+            replay_storage.CreateBlobStore("ftp://example.com/replays")
+
+
+class ReplayStorageTest(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.createUser("storage-user")
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.root = Path(temp_dir.name)
+        self.use_blob_store = test.override_settings(
+            REPLAY_BLOB_STORE=f"file://{self.root}"
+        )
+
+    def _Blobs(self):
+        return [p for p in self.root.rglob("*") if p.is_file()]
+
+    def testPublishedReplayIsInBlobStore(self):
+        with self.use_blob_store:
+            replay = test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+            replay_file = models.ReplayFile.objects.get(replay=replay)
+
+            self.assertIsNone(replay_file.replay_file)
+            self.assertEqual(
+                replay_storage.Read(replay_file.replay_file, replay_file.replay_hash),
+                test_replays.GetRaw("th10_normal"),
+            )
+
+    def testSameUploadIsStoredOnce(self):
+        contents = test_replays.GetRaw("th10_normal")
+        with self.use_blob_store:
+            first = replay_storage.CreateTemporaryReplayFile(self.user, contents)
+            second = replay_storage.CreateTemporaryReplayFile(self.user, contents)
+
+            self.assertIsNone(first.replay)
+            self.assertEqual(replay_storage.ReadTemporaryReplayFile(second), contents)
+        self.assertEqual(len(self._Blobs()), 1)
+
+    def testWithoutBlobStore(self):
+        replay = test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+
+        replay_file = models.ReplayFile.objects.get(replay=replay)
+        self.assertEqual(
+            bytes(replay_file.replay_file), test_replays.GetRaw("th10_normal")
+        )
+        self.assertEqual(self._Blobs(), [])
+
+    def testMissingFile(self):
+        with self.use_blob_store:
+            with self.assertRaises(replay_storage.MissingReplayFileError):
+                replay_storage.Read(None, _KEY)
+
+    def testMoveToBlobStore(self):
+        replay = test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+        temp_replay = replay_storage.CreateTemporaryReplayFile(
+            self.user, test_replays.GetRaw("th11_normal")
+        )
+
+        with self.use_blob_store:
+            self.assertEqual(list(replay_storage.MoveToBlobStore(batch_size=1)), [1, 1])
+
+            replay_file = models.ReplayFile.objects.get(replay=replay)
+            temp_replay.refresh_from_db()
+            self.assertIsNone(replay_file.replay_file)
+            self.assertIsNone(temp_replay.replay)
+            self.assertEqual(
+                replay_storage.Read(replay_file.replay_file, replay_file.replay_hash),
+                test_replays.GetRaw("th10_normal"),
+            )
+            self.assertEqual(
+                replay_storage.ReadTemporaryReplayFile(temp_replay),
+                test_replays.GetRaw("th11_normal"),
+            )
+
+    def testMoveToBlobStoreWithoutBlobStore(self):
+        with self.assertRaises(replay_storage.Error):
+            list(replay_storage.MoveToBlobStore())
+
+    def testDownloadDuringMove(self):
+        replay = test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+
+        with self.use_blob_store:
+            file_info = replay_downloads.GetReplayFileInfo(replay.id)
+            chunks = replay_downloads.IterChunks(file_info, 0, file_info.size)
+            first_chunk = next(chunks)
+            list(replay_storage.MoveToBlobStore())
+
+            self.assertEqual(
+                first_chunk + b"".join(chunks), test_replays.GetRaw("th10_normal")
+            )
+
+    def testDeleteOrphanedBlobs(self):
+        with self.use_blob_store:
+            kept = test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+            deleted = test_replays.CreateAsPublishedReplay(
+                "th11_normal", user=self.user
+            )
+            deleted.delete()
+
+            self.assertEqual(replay_storage.DeleteOrphanedBlobs(), 0)
+            self.assertEqual(
+                replay_storage.DeleteOrphanedBlobs(
+                    _LATER + replay_storage.ORPHAN_GRACE_PERIOD
+                ),
+                1,
+            )
+
+            replay_file = models.ReplayFile.objects.get(replay=kept)
+            self.assertEqual(
+                replay_storage.Read(replay_file.replay_file, replay_file.replay_hash),
+                test_replays.GetRaw("th10_normal"),
+            )
+        self.assertEqual(len(self._Blobs()), 1)
@@ -1,13 +1,17 @@
 import datetime
+import json
 from unittest.mock import patch
 
 from replays.testing import test_case
-from replays.replays_to_json import ReplayToJsonConverter
+from replays.replays_to_json import convert_replays_to_json_bytes
 from replays.test_replay_parsing import ParseTestReplay
 from replays.create_replay import PublishNewReplay
+from replays import constant_helpers
 from replays import models
+from replays import replays_to_json
 from replays.testing import test_replays
 from replays.testing import test_utilities
+from shared_content import request_timing
 
 
 class ReplaysToJsonTestCase(test_case.ReplayTestCase):
@@ -65,8 +69,9 @@ class ReplaysToJsonTestCase(test_case.ReplayTestCase):
         replays = models.Replay.objects.order_by("-score")
 
         with test_utilities.OverrideTranslations():
-            converter = ReplayToJsonConverter()
-            json_data = [converter.convert_replay_to_dict(replay) for replay in replays]
+            json_data = [
+                json.loads(line) for line in convert_replays_to_json_bytes(replays)
+            ]
 
         for json_replay_data in json_data:
             assert json_replay_data
@@ -110,8 +115,9 @@ class ReplaysToJsonTestCase(test_case.ReplayTestCase):
 
         replays = models.Replay.objects.order_by("-score")
         with test_utilities.OverrideTranslations():
-            converter = ReplayToJsonConverter()
-            json_data = [converter.convert_replay_to_dict(replay) for replay in replays]
+            json_data = [
+                json.loads(line) for line in convert_replays_to_json_bytes(replays)
+            ]
 
         self.assertEqual(json_data[0]["Score"]["text"], "🥇1,000,000,000")
         self.assertEqual(json_data[1]["Score"]["text"], "🥈900,000,000")
@@ -135,8 +141,57 @@ class ReplaysToJsonTestCase(test_case.ReplayTestCase):
         replays = models.Replay.objects.order_by("-score")
 
         with test_utilities.OverrideTranslations():
-            converter = ReplayToJsonConverter()
-            json_data = [converter.convert_replay_to_dict(replay) for replay in replays]
+            json_data = [
+                json.loads(line) for line in convert_replays_to_json_bytes(replays)
+            ]
 
         self.assertEqual(json_data[0]["Score"]["text"], "🥇1,000,000,000")
         self.assertEqual(json_data[1]["Score"]["text"], "🥇900,000,000")
+
+    def testOutputMatchesJsonDumps(self):
+        test_replays.CreateAsPublishedReplay("th8_normal", user=self.user)
+        test_replays.CreateAsPublishedReplay("th95_Ex-2", user=self.user)
+        test_replays.CreateAsPublishedReplay("th17_lunatic", user=self.user)
+
+        with test_utilities.OverrideTranslations():
+            lines = list(convert_replays_to_json_bytes(models.Replay.objects.all()))
+
+        self.assertEqual(len(lines), 3)
+        for line in lines:
+            self.assertEqual(
+                line, (json.dumps(json.loads(line)) + "\n").encode("utf-8")
+            )
+
+    def testMakesOneQuery(self):
+        for i in range(3):
+            test_replays.CreateReplayWithoutFile(
+                user=self.user,
+                shot=models.Shot.objects.get(game_id="th08", shot_id="Reimu & Yukari"),
+                difficulty=i,
+                score=1000 * i,
+            )
+        constant_helpers.GetConstantModelIndex()
+
+        with self.assertNumQueries(1):
+            lines = list(convert_replays_to_json_bytes(models.Replay.objects.all()))
+
+        self.assertEqual(len(lines), 3)
+
+    def testTimesEncodingOncePerChunk(self):
+        for i in range(3):
+            test_replays.CreateReplayWithoutFile(
+                user=self.user,
+                shot=models.Shot.objects.get(game_id="th08", shot_id="Reimu & Yukari"),
+                difficulty=i,
+                score=1000 * i,
+            )
+        timer = request_timing.RequestTimer()
+
+        with patch.object(replays_to_json, "_TIMED_ROWS", 2), patch.object(
+            timer, "Add", wraps=timer.Add
+        ) as add, request_timing.Timing(timer):
+            lines = list(convert_replays_to_json_bytes(models.Replay.objects.all()))
+
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(add.call_count, 2)
+        self.assertGreater(timer.seconds[request_timing.JSON], 0)
@@ -0,0 +1,127 @@
+from replays import game_ids
+from replays import models
+from replays import scoreboard_query
+from replays.testing import test_case
+from replays.testing import test_replays
+
+
+class ParseQueryTestCase(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.th05 = models.Game.objects.get(game_id=game_ids.GameIDs.TH05)
+        self.th08 = models.Game.objects.get(game_id=game_ids.GameIDs.TH08)
+
+    def testEmpty(self):
+        query = scoreboard_query.ParseQuery(self.th05, {})
+        self.assertEqual(query, scoreboard_query.ScoreboardQuery(game_id="th05"))
+
+    def testFilters(self):
+        query = scoreboard_query.ParseQuery(
+            self.th08,
+            {
+                "difficulty": "3",
+                "shot": "Reimu & Yukari",
+                "route": "Final B",
+                "category": "TAS",
+                "best_per_player": "true",
+                "cursor": "1000.12",
+                "limit": "20",
+            },
+        )
+        self.assertEqual(query.difficulty, 3)
+        self.assertEqual(query.shot.shot_id, "Reimu & Yukari")
+        self.assertEqual(query.route.route_id, "Final B")
+        self.assertEqual(query.category, models.Category.TAS)
+        self.assertTrue(query.best_per_player)
+        self.assertEqual(query.after, scoreboard_query.Cursor(1000, 12))
+        self.assertEqual(query.limit, 20)
+
+    def testInvalid(self):
+        for params in [
+            {"difficulty": "x"},
+            {"difficulty": "9"},
+            {"shot": "Reimu & Yukari"},
+            {"route": "Final A"},
+            {"category": "unusual"},
+            {"best_per_player": "maybe"},
+            {"cursor": "1000"},
+            {"limit": "0"},
+            {"limit": str(scoreboard_query.MAX_PAGE_SIZE + 1)},
+        ]:
+            with self.subTest(params=params):
+                with self.assertRaises(scoreboard_query.InvalidQueryError):
+                    scoreboard_query.ParseQuery(self.th05, params)
+
+
+class GetPageTestCase(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = self.createUser("alice")
+        self.bob = self.createUser("bob")
+        self.mima = models.Shot.objects.get(
+            game_id=game_ids.GameIDs.TH05, shot_id="Mima"
+        )
+        self.yuka = models.Shot.objects.get(
+            game_id=game_ids.GameIDs.TH05, shot_id="Yuuka"
+        )
+
+    def _Create(self, user, score, shot=None, difficulty=1):
+        return test_replays.CreateReplayWithoutFile(
+            user=user, shot=shot or self.mima, difficulty=difficulty, score=score
+        )
+
+    def _Query(self, **kwargs):
+        return scoreboard_query.ScoreboardQuery(game_id=game_ids.GameIDs.TH05, **kwargs)
+
+    def testFilters(self):
+        wanted = self._Create(self.alice, 100)
+        self._Create(self.alice, 200, shot=self.yuka)
+        self._Create(self.alice, 300, difficulty=3)
+
+        page = scoreboard_query.GetPage(self._Query(difficulty=1, shot=self.mima))
+
+        self.assertEqual([r.id for r in page.rows], [wanted.id])
+        self.assertIsNone(page.next_cursor)
+
+    def testPaginatesByCursor(self):
+        r1 = self._Create(self.alice, 300)
+        r2 = self._Create(self.bob, 200)
+        r3 = self._Create(self.alice, 200)
+        r4 = self._Create(self.bob, 100)
+
+        first = scoreboard_query.GetPage(self._Query(limit=2))
+        self.assertEqual([r.id for r in first.rows], [r1.id, r3.id])
+        self.assertEqual(first.next_cursor, scoreboard_query.Cursor(200, r3.id))
+
+        second = scoreboard_query.GetPage(self._Query(limit=2, after=first.next_cursor))
+        self.assertEqual([r.id for r in second.rows], [r2.id, r4.id])
+        self.assertIsNone(second.next_cursor)
+
+    def testBestPerPlayer(self):
+        alice_best = self._Create(self.alice, 300)
+        self._Create(self.alice, 250)
+        bob_best = self._Create(self.bob, 200, shot=self.yuka)
+        self._Create(self.bob, 100)
+        imported = self._Create(self.bob, 150)
+        models.Replay.objects.filter(id=imported.id).update(
+            user=None, imported_username="bob"
+        )
+
+        page = scoreboard_query.GetPage(self._Query(best_per_player=True))
+
+        self.assertEqual(
+            [r.id for r in page.rows], [alice_best.id, bob_best.id, imported.id]
+        )
+
+    def testBestPerPlayerWithCursor(self):
+        self._Create(self.alice, 300)
+        self._Create(self.alice, 250)
+        bob_best = self._Create(self.bob, 200)
+
+        first = scoreboard_query.GetPage(self._Query(best_per_player=True, limit=1))
+        second = scoreboard_query.GetPage(
+            self._Query(best_per_player=True, limit=1, after=first.next_cursor)
+        )
+
+        self.assertEqual([r.id for r in second.rows], [bob_best.id])
+        self.assertIsNone(second.next_cursor)
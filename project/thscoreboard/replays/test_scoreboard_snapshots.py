@@ -0,0 +1,131 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.utils import translation
+
+from replays import game_ids
+from replays import models
+from replays import scoreboard_snapshots
+from replays.testing import test_case
+from replays.testing import test_replays
+
+
+class ScoreboardSnapshotsTest(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = self.createUser("somebody")
+        self.th05_mima = models.Shot.objects.get(
+            game_id=game_ids.GameIDs.TH05, shot_id="Mima"
+        )
+
+    def _Create(self, score):
+        with self.captureOnCommitCallbacks(execute=True):
+            return test_replays.CreateReplayWithoutFile(
+                user=self.user,
+                difficulty=1,
+                shot=self.th05_mima,
+                score=score,
+            )
+
+    def _Ids(self, snapshot):
+        return [json.loads(line)["Id"] for line in snapshot.content.splitlines()]
+
+    def testContainsReplays(self):
+        r1 = self._Create(100)
+        r2 = self._Create(200)
+
+        snapshot = scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH05)
+
+        self.assertEqual(self._Ids(snapshot), [r2.id, r1.id])
+
+    def testEtagMatchesContent(self):
+        self._Create(100)
+        self._Create(200)
+
+        snapshot = scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH05)
+
+        self.assertEqual(
+            snapshot.etag,
+            '"' + hashlib.sha256(snapshot.content).hexdigest()[:32] + '"',
+        )
+
+    def testSnapshotIsReused(self):
+        self._Create(100)
+        first = scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH05)
+
+        with self.assertNumQueries(0):
+            second = scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH05)
+
+        self.assertEqual(first, second)
+
+    def testNewReplayInvalidatesSnapshot(self):
+        r1 = self._Create(100)
+        before = scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH05)
+
+        r2 = self._Create(200)
+        after = scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH05)
+
+        self.assertEqual(self._Ids(after), [r2.id, r1.id])
+        self.assertNotEqual(before.etag, after.etag)
+
+    def testUnlistingInvalidatesSnapshot(self):
+        r1 = self._Create(100)
+        scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH05)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            r1.is_listed = False
+            r1.save()
+
+        snapshot = scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH05)
+        self.assertEqual(self._Ids(snapshot), [])
+
+    def testDeletionInvalidatesSnapshot(self):
+        r1 = self._Create(100)
+        scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH05)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            r1.delete()
+
+        snapshot = scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH05)
+        self.assertEqual(self._Ids(snapshot), [])
+
+    def testOtherGamesAreUnaffected(self):
+        self._Create(100)
+        th06_snapshot = scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH06)
+
+        self._Create(200)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH06), th06_snapshot
+            )
+
+    def testSnapshotsArePerLanguage(self):
+        self._Create(100)
+
+        with translation.override("en-us"):
+            english = scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH05)
+        with translation.override("ja"):
+            japanese = scoreboard_snapshots.GetSnapshot(game_ids.GameIDs.TH05)
+
+        # Each language's snapshot is built and stored separately, even though
+        # they only differ if translations are compiled.
+        generation = scoreboard_snapshots._GetGeneration(game_ids.GameIDs.TH05)
+        self.assertEqual(
+            cache.get(
+                scoreboard_snapshots._SnapshotKey(
+                    game_ids.GameIDs.TH05, "en-us", generation
+                )
+            ),
+            english,
+        )
+        self.assertEqual(
+            cache.get(
+                scoreboard_snapshots._SnapshotKey(
+                    game_ids.GameIDs.TH05, "ja", generation
+                )
+            ),
+            japanese,
+        )
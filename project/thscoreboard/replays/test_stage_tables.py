@@ -0,0 +1,167 @@
+import datetime
+from unittest import mock
+
+from django.utils import translation
+
+from replays import constant_helpers
+from replays import create_replay
+from replays import game_fields
+from replays import game_ids
+from replays import models
+from replays import reanalyze_replay
+from replays import replay_parsing
+from replays import stage_tables
+from replays.testing import test_case
+from replays.testing import test_replays
+
+
+class StageTablesTest(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.createUser("somebody")
+
+    def _GetTable(self, replay: models.Replay) -> models.ReplayStageTable:
+        return models.ReplayStageTable.objects.get(replay=replay)
+
+    def testPublishStoresTable(self):
+        replay = test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+
+        table = self._GetTable(replay)
+        self.assertEqual(table.version, game_fields.STAGE_TABLE_VERSION)
+        self.assertEqual(
+            table.rows,
+            game_fields.FormatStages(
+                game_ids.GameIDs.TH10,
+                models.ReplayStage.objects.filter(replay=replay),
+                replay.shot.shot_id,
+            ),
+        )
+        self.assertEqual([row["stage"] for row in table.rows], list("123456"))
+        self.assertEqual(table.rows[0]["power"], "5.00")
+
+    def testPublishImportedReplaysStoresTables(self):
+        contents = test_replays.GetRaw("th6_extra")
+        [replay] = create_replay.PublishImportedReplays(
+            [
+                create_replay.ImportedReplay(
+                    replay_file=contents,
+                    replay_hash=b"not-a-real-hash",
+                    replay_info=replay_parsing.Parse(contents),
+                    comment="",
+                    created_timestamp=datetime.datetime(
+                        2009, 4, 5, tzinfo=datetime.timezone.utc
+                    ),
+                    imported_username="somebody else",
+                )
+            ]
+        )
+
+        self.assertEqual(
+            [row["stage"] for row in self._GetTable(replay).rows], ["Extra"]
+        )
+
+    def testBlankValuesAreLeftOut(self):
+        replay = test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+
+        for row in self._GetTable(replay).rows:
+            self.assertNotIn("th13_trance", row)
+            self.assertNotIn("", row.values())
+
+    def testFormatsValuesAsSaved(self):
+        # TH12's parser gives bomb pieces as floats, which are truncated when
+        # they're saved.
+        replay = test_replays.CreateAsPublishedReplay("th12_normal", user=self.user)
+        published = self._GetTable(replay).rows
+        models.ReplayStageTable.objects.all().delete()
+
+        rebuilt = stage_tables.GetRows(
+            models.Replay.objects.select_related("stage_table").get()
+        )
+
+        self.assertEqual(published, rebuilt)
+        self.assertEqual(published[1]["bombs"], "2 (0/3)")
+
+    def testGetRowsNeedsNoQueries(self):
+        test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+        replay = models.Replay.objects.select_related("stage_table").get()
+
+        with self.assertNumQueries(0):
+            rows = stage_tables.GetRows(replay)
+
+        self.assertEqual(len(rows), 6)
+
+    def testGetRowsBuildsMissingTable(self):
+        replay = test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+        expected = self._GetTable(replay).rows
+        models.ReplayStageTable.objects.all().delete()
+        replay = models.Replay.objects.select_related("stage_table").get()
+
+        self.assertEqual(stage_tables.GetRows(replay), expected)
+        self.assertEqual(self._GetTable(replay).rows, expected)
+
+    def testGetRowsRebuildsOutdatedTable(self):
+        replay = test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+        expected = self._GetTable(replay).rows
+        models.ReplayStageTable.objects.update(
+            version=game_fields.STAGE_TABLE_VERSION - 1, rows=[]
+        )
+        replay = models.Replay.objects.select_related("stage_table").get()
+
+        self.assertEqual(stage_tables.GetRows(replay), expected)
+        self.assertEqual(
+            self._GetTable(replay).version, game_fields.STAGE_TABLE_VERSION
+        )
+
+    def testSavingAStageDropsTable(self):
+        replay = test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+        stage = models.ReplayStage.objects.get(replay=replay, stage=1)
+        stage.power = 20
+        stage.save()
+
+        self.assertFalse(models.ReplayStageTable.objects.exists())
+        replay = models.Replay.objects.select_related("stage_table").get()
+        self.assertEqual(stage_tables.GetRows(replay)[0]["power"], "1.00")
+
+    def testDeletingAStageDropsTable(self):
+        replay = test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+        models.ReplayStage.objects.get(replay=replay, stage=6).delete()
+
+        self.assertFalse(models.ReplayStageTable.objects.exists())
+        replay = models.Replay.objects.select_related("stage_table").get()
+        self.assertEqual(
+            [row["stage"] for row in stage_tables.GetRows(replay)], list("12345")
+        )
+
+    def testDeletingAReplayLeavesTableToCascade(self):
+        replay = test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+
+        with mock.patch.object(stage_tables, "_InvalidateStageTable") as invalidate:
+            replay.delete()
+
+        invalidate.assert_not_called()
+        self.assertFalse(models.ReplayStageTable.objects.exists())
+
+    def testTh09NamesPlayerTwoShot(self):
+        replay = test_replays.CreateAsPublishedReplay("th9_lunatic", user=self.user)
+
+        stored_row = self._GetTable(replay).rows[0]
+        p2_shot = models.ReplayStage.objects.get(replay=replay, stage=1).th09_p2_shot
+        self.assertEqual(stored_row["th09_p2_shot"], p2_shot.shot_id)
+        self.assertNotIn("th09_p2_shotFormat", stored_row)
+
+        replay = models.Replay.objects.select_related("stage_table").get()
+        constant_helpers.GetConstantModelIndex()
+        with translation.override("en-us"), self.assertNumQueries(0):
+            row = stage_tables.GetRows(replay)[0]
+        self.assertEqual(row["th09_p2_shotFormat"], p2_shot.GetName())
+
+    def testReanalysisUpdatesTable(self):
+        replay = test_replays.CreateAsPublishedReplay("th10_normal", user=self.user)
+        expected = self._GetTable(replay).rows
+        models.ReplayStage.objects.filter(replay=replay, stage=6).delete()
+        models.ReplayStage.objects.filter(replay=replay, stage=1).update(power=400)
+        models.ReplayStageTable.objects.update(rows=[])
+
+        reanalyze_replay.UpdateReplay(replay.id)
+
+        self.assertEqual(self._GetTable(replay).rows, expected)
@@ -0,0 +1,78 @@
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django import db
+from django.core import signals
+
+from replays import models
+from replays import replay_feeds
+from replays import streaming_benchmark
+from replays.testing import test_case
+from replays.testing import test_replays
+from users.middleware import record_ip
+
+
+class StreamingBenchmarkTest(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        # The requests go through every middleware. Keep the visits they
+        # record in memory rather than letting a background thread commit them.
+        patcher = mock.patch.object(
+            record_ip, "_recorder", record_ip.VisitRecorder(background=False)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        test_replays.CreateAsPublishedReplay(
+            "th6_extra",
+            user=self.createUser("somebody"),
+            category=models.Category.STANDARD,
+        )
+        # Make sure the feed really is streamed, rather than served whole.
+        patcher = mock.patch.object(
+            replay_feeds, "IterateRowsAsync", wraps=replay_feeds.IterateRowsAsync
+        )
+        self.iterate_rows_async = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            replay_feeds, "IterateRows", wraps=replay_feeds.IterateRows
+        )
+        self.iterate_rows = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testAsgi(self):
+        # Like Django's test client, don't let the handler close the test's
+        # connection, which is in the middle of a transaction.
+        signals.request_started.disconnect(db.close_old_connections)
+        self.addCleanup(signals.request_started.connect, db.close_old_connections)
+        signals.request_finished.disconnect(db.close_old_connections)
+        self.addCleanup(signals.request_finished.connect, db.close_old_connections)
+
+        run = async_to_sync(streaming_benchmark.BenchmarkAsgi)(
+            "/replays/user/somebody/json",
+            clients=3,
+            client_delay=0,
+            host="testserver",
+        )
+
+        self.assertEqual(run.server, "asgi")
+        self.assertEqual(run.statuses, {200: 3})
+        self.assertGreater(run.total_bytes, 0)
+        self.assertEqual(run.total_bytes % 3, 0)
+        self.assertEqual(self.iterate_rows_async.call_count, 3)
+
+    def testWsgi(self):
+        run = streaming_benchmark.BenchmarkWsgi(
+            "/replays/index/json",
+            clients=3,
+            workers=2,
+            client_delay=0,
+            host="testserver",
+        )
+
+        self.assertEqual(run.server, "wsgi")
+        self.assertEqual(run.clients, 3)
+        self.assertEqual(run.statuses, {200: 3})
+        # The worker threads have their own database connections, which can't
+        # see this test's replay, so the feeds are empty; but they are still
+        # streamed.
+        self.assertEqual(self.iterate_rows.call_count, 3)
@@ -1,6 +1,17 @@
+import tempfile
+from unittest import mock
+
+from django import test as django_test
+from django.core.cache import cache
+from django.core.cache import caches
+
+from replays import models
 from replays import replay_parsing
+from replays import replay_storage
 from replays.testing import test_case
 from replays.testing import test_replays
+from replays.views import view_replay
+from users.middleware import record_ip
 
 from . import game_ids
 from . import game_fields
@@ -47,3 +58,190 @@ class TestTableFields(test_case.ReplayTestCase):
                                 self.assertIsNone(
                                     s[key], msg=f"Unexpected field {key} found"
                                 )
+
+
+class DownloadReplayTestCase(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = django_test.RequestFactory()
+        self.user = self.createUser("download-user")
+        self.replay = test_replays.CreateAsPublishedReplay(
+            "th10_normal", user=self.user
+        )
+        self.contents = test_replays.GetRaw("th10_normal")
+
+    def _Download(self, method="get", **headers):
+        url = f"/replays/th10/{self.replay.id}/download"
+        request = getattr(self.factory, method)(url, headers=headers)
+        request.user = self.user
+        return view_replay.download_replay(request, "th10", self.replay.id)
+
+    def testDownload(self):
+        response = self._Download()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.contents)
+        self.assertEqual(response["Content-Length"], str(len(self.contents)))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn(".rpy", response["Content-Disposition"])
+
+    def testDownloadIsChunked(self):
+        response = self._Download()
+
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b"".join(chunks), self.contents)
+
+    def testHead(self):
+        response = self._Download(method="head")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"")
+        self.assertEqual(response["Content-Length"], str(len(self.contents)))
+
+    def testNotModified(self):
+        etag = self._Download()["ETag"]
+
+        response = self._Download(If_None_Match=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def testRange(self):
+        response = self._Download(Range="bytes=100-199")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), self.contents[100:200])
+        self.assertEqual(response["Content-Length"], "100")
+        self.assertEqual(
+            response["Content-Range"], f"bytes 100-199/{len(self.contents)}"
+        )
+
+    def testSuffixRange(self):
+        response = self._Download(Range="bytes=-10")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), self.contents[-10:])
+
+    def testRangeNotSatisfiable(self):
+        response = self._Download(Range=f"bytes={len(self.contents)}-")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.contents)}")
+
+    def testStaleIfRangeSendsWholeFile(self):
+        response = self._Download(Range="bytes=100-199", If_Range='"stale"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.contents)
+
+    def testMatchingIfRange(self):
+        etag = self._Download()["ETag"]
+
+        response = self._Download(Range="bytes=100-199", If_Range=etag)
+
+        self.assertEqual(response.status_code, 206)
+
+    def testDownloadFromBlobStore(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        with django_test.override_settings(REPLAY_BLOB_STORE=f"file://{temp_dir.name}"):
+            list(replay_storage.MoveToBlobStore())
+
+            whole = self._Download()
+            part = self._Download(Range="bytes=100-199")
+
+            self.assertEqual(b"".join(whole.streaming_content), self.contents)
+            self.assertEqual(whole["Content-Length"], str(len(self.contents)))
+            self.assertEqual(part.status_code, 206)
+            self.assertEqual(b"".join(part.streaming_content), self.contents[100:200])
+
+
+class ReplayDetailsTestCase(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        # Keep the visits the requests record in memory rather than letting a
+        # background thread commit them.
+        patcher = mock.patch.object(
+            record_ip, "_recorder", record_ip.VisitRecorder(background=False)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        caches["replay_pages"].clear()
+        self.user = self.createUser("details-user")
+        self.replay = test_replays.CreateAsPublishedReplay(
+            "th10_normal", user=self.user
+        )
+
+    def testShowsStoredStages(self):
+        models.ReplayStageTable.objects.update(
+            rows=[{"stage": "Stored", "score": 123456789}]
+        )
+
+        response = self.client.get(f"/replays/th10/{self.replay.id}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context["replay_stages"], [{"stage": "Stored", "score": 123456789}]
+        )
+        self.assertContains(response, "123,456,789")
+
+    def testBuildsMissingStageTable(self):
+        models.ReplayStageTable.objects.all().delete()
+
+        response = self.client.get(f"/replays/th10/{self.replay.id}")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["replay_stages"]), 6)
+        self.assertTrue(
+            models.ReplayStageTable.objects.filter(replay=self.replay).exists()
+        )
+
+    def testRedirectsToTheRightGame(self):
+        response = self.client.get(f"/replays/th06/{self.replay.id}")
+
+        self.assertRedirects(
+            response, f"/replays/th10/{self.replay.id}", fetch_redirect_response=False
+        )
+
+    def testManageLinksDependOnViewer(self):
+        staff = self.createUser("details-staff", is_staff=True)
+        delete_link = f"/replays/th10/{self.replay.id}/delete"
+        edit_link = f"/replays/th10/{self.replay.id}/edit"
+        reanalyze_link = f"/replays/th10/{self.replay.id}/reanalyze"
+
+        # The first request fills the cache; later ones must still be
+        # tailored to the viewer.
+        response = self.client.get(f"/replays/th10/{self.replay.id}")
+        self.assertNotContains(response, delete_link)
+        self.assertNotContains(response, edit_link)
+        self.assertNotContains(response, "edit_comment")
+
+        self.client.force_login(self.user)
+        response = self.client.get(f"/replays/th10/{self.replay.id}")
+        self.assertContains(response, delete_link)
+        self.assertContains(response, edit_link)
+        self.assertContains(response, "edit_comment")
+        self.assertNotContains(response, reanalyze_link)
+
+        self.client.force_login(staff)
+        response = self.client.get(f"/replays/th10/{self.replay.id}")
+        self.assertContains(response, delete_link)
+        self.assertContains(response, reanalyze_link)
+        self.assertNotContains(response, edit_link)
+
+    def testEditingCommentUpdatesPage(self):
+        self.client.get(f"/replays/th10/{self.replay.id}")
+        self.client.force_login(self.user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                f"/replays/th10/{self.replay.id}/edit_comment",
+                {"comment": "A new comment"},
+            )
+
+        self.client.logout()
+        self.assertContains(
+            self.client.get(f"/replays/th10/{self.replay.id}"), "A new comment"
+        )
@@ -0,0 +1,64 @@
+"""An in-memory stand-in for a boto3 S3 client, for testing S3BlobStore.
+
+Only the calls S3BlobStore makes are supported.
+"""
+
+import datetime
+import io
+import re
+
+
+class ClientError(Exception):
+    """Mimics botocore's ClientError, which carries an S3 error code."""
+
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.objects: dict[tuple[str, str], tuple[bytes, datetime.datetime]] = {}
+
+    def _Get(self, bucket, key):
+        try:
+            return self.objects[(bucket, key)]
+        except KeyError:
+            raise ClientError("NoSuchKey")
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = (
+            bytes(Body),
+            datetime.datetime.now(tz=datetime.timezone.utc),
+        )
+
+    def get_object(self, Bucket, Key, Range=None):
+        data, _ = self._Get(Bucket, Key)
+        if Range is not None:
+            first, last = re.match(r"bytes=(\d+)-(\d+)$", Range).groups()
+            data = data[int(first) : int(last) + 1]
+        return {"Body": io.BytesIO(data)}
+
+    def head_object(self, Bucket, Key):
+        try:
+            data, _ = self._Get(Bucket, Key)
+        except ClientError:
+            # HEAD responses have no body, so S3 only reports the status.
+            raise ClientError("404")
+        return {"ContentLength": len(data)}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def get_paginator(self, operation):
+        assert operation == "list_objects_v2"
+        return self
+
+    def paginate(self, Bucket, Prefix=""):
+        yield {
+            "Contents": [
+                {"Key": key, "LastModified": modified}
+                for (bucket, key), (_, modified) in sorted(self.objects.items())
+                if bucket == Bucket and key.startswith(Prefix)
+            ]
+        }
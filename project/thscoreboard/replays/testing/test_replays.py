@@ -8,6 +8,7 @@ from replays import create_replay
 from replays import game_ids
 from replays import models
 from replays import replay_parsing
+from replays import replay_storage
 
 TEST_REPLAY_LOCATION = Path("replays/replays_for_tests")
 
@@ -63,8 +64,7 @@ def CreateAsPublishedReplay(
     """Create a replay according to a file, with sensible defaults."""
 
     replay_file_contents = GetRaw(filename)
-    temp_replay = models.TemporaryReplayFile(user=user, replay=replay_file_contents)
-    temp_replay.save()
+    temp_replay = replay_storage.CreateTemporaryReplayFile(user, replay_file_contents)
 
     replay_info = replay_parsing.Parse(replay_file_contents)
     if replay_type is not None:
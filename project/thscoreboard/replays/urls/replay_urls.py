@@ -41,6 +41,11 @@ urlpatterns = [
         "<str:game_id>/json",
         replay_list.game_scoreboard_json,
     ),
+    path(
+        "<str:game_id>/filters",
+        replay_list.game_scoreboard_filters_json,
+        name="Replays/GameScoreboardFilters",
+    ),
     path(
         "<str:game_id>/d<int:difficulty>",
         replay_list.game_scoreboard_old_url,
@@ -12,7 +12,9 @@ from replays import create_replay
 from replays import forms
 from replays import limits
 from replays import models
+from replays import parse_cache
 from replays import replay_parsing
+from replays import replay_storage
 from replays import game_ids
 from replays.views import view_replay
 
@@ -42,7 +44,8 @@ def _HandleReplay(request, replay_bytes):
         )
 
     try:
-        replay_info = replay_parsing.Parse(replay_bytes)
+        # The stages aren't needed until the replay is published.
+        replay_info = parse_cache.ParseHeader(replay_bytes)
     except replay_parsing.Error as e:
         raise ValidationError(str(e))
 
@@ -70,10 +73,9 @@ def upload_file(request):
                 # We check that the replay can be parsed, but don't care about its
                 # contents.
 
-                temp_replay = models.TemporaryReplayFile(
-                    user=request.user, replay=file_contents
+                temp_replay = replay_storage.CreateTemporaryReplayFile(
+                    request.user, file_contents
                 )
-                temp_replay.save()
 
                 return redirect(publish_replay, temp_replay.id)
 
@@ -111,7 +113,8 @@ def publish_replay(request, temp_replay_id):
     except models.TemporaryReplayFile.DoesNotExist:
         raise Http404()
 
-    replay_info = replay_parsing.Parse(bytes(temp_replay.replay))
+    replay_bytes = replay_storage.ReadTemporaryReplayFile(temp_replay)
+    replay_info = parse_cache.ParseHeader(replay_bytes)
 
     if request.method == "POST":
         form = forms.PublishReplayForm(
@@ -119,7 +122,7 @@ def publish_replay(request, temp_replay_id):
         )
 
         # test if replay already exists, and return an error if so
-        duplicate = constant_helpers.GetReplayFileWithSameHash(temp_replay.replay)
+        duplicate = constant_helpers.GetReplayFileWithSameHash(replay_bytes)
         if duplicate is not None:
             # if the temp replay doesn't exist anymore, the user can't even get to this page so this code doesn't really help
             # when submitting twice
@@ -127,6 +130,13 @@ def publish_replay(request, temp_replay_id):
             raise Http404()
 
         if form.is_valid():
+            # Only read the stages now that we're about to save them.
+            try:
+                replay_info = parse_cache.Parse(replay_bytes)
+            except replay_parsing.Error as e:
+                form.add_error(None, str(e))
+                return render(request, "replays/publish.html", {"form": form})
+
             if "uses_bombs" in form.cleaned_data:
                 no_bomb = not form.cleaned_data["uses_bombs"]
             else:
@@ -30,7 +30,7 @@ def edit_replay(request: http.HttpRequest, game_id: str, replay_id: int):
             status=403,
         )
 
-    if not hasattr(replay, "replayfile"):
+    if not replay.HasReplayFile():
         return shortcuts.render(
             request,
             "simple_message.html",
@@ -5,7 +5,6 @@ import os
 from django.contrib.auth import decorators as auth_decorators
 from django.views.decorators import http as http_decorators
 from django.shortcuts import render
-from django.db import transaction
 from django import urls
 
 from replays import models
@@ -15,23 +14,39 @@ from replays import reanalyze_replay
 # The number of replays to view and reanalyze at once.
 # This must be low enough that the request will never take over 30 seconds,
 # to avoid timeouts.
-_BATCH_SIZE = os.environ.get("REANALYZE_BATCH_SIZE") or 1000
+_BATCH_SIZE = int(os.environ.get("REANALYZE_BATCH_SIZE") or 1000)
 
 
 def _ShortNameForReplay(r):
     return "{id} ({user}, {game})".format(
         id=r.id,
-        user=r.user.username,
+        user=r.user.username if r.user else r.imported_username,
         game=r.shot.game.GetShortName(),
     )
 
 
+def _FailedReplayLinks(replays, results):
+    """Link to each replay that couldn't be reanalyzed, with the reason why."""
+    errors = {r.replay_id: r.error for r in results if r.error is not None}
+    return [
+        {
+            "name": _ShortNameForReplay(r),
+            "url": urls.reverse(
+                viewname="Replays/Details", args=(r.shot.game_id, r.id)
+            ),
+            "error": f"{type(errors[r.id]).__name__}: {errors[r.id]}",
+        }
+        for r in replays
+        if r.id in errors
+    ]
+
+
 def _select_next_replays_with_files(pagination_token, end_token=None):
     q = models.Replay.objects.filter(id__gt=pagination_token)
     if end_token is not None:
-        q.filter(id__lte=end_token)
+        q = q.filter(id__lte=end_token)
     return (
-        q.select_related("shot", "shot__game")
+        q.select_related("shot", "shot__game", "user")
         .filter(shot__game__has_replays=True)
         .order_by("id")[:_BATCH_SIZE]
     )
@@ -42,33 +57,28 @@ def _select_next_replays_with_files(pagination_token, end_token=None):
 def batch_reanalyze_preview(request, pagination_token: int = 0):
     """Preview the reanalysis of a page of replays."""
 
-    replay_links = []
-
-    # Bind r now so we can use it outside of the for loop.
-    # This way, we can access the last element in the query without having to
-    # conduct additional queries.
-    r = None
-
-    # To lessen the big load on the database, this view function is not
-    # performed in one transaction.
-    for r in _select_next_replays_with_files(pagination_token):
-        # Typically in Django we would simply pass the replay instance to the
-        # template engine, and define its rendering in the template. However,
-        # since this method could easily return a very large number of replays,
-        # we instead only keep the minimum information to render the replays
-        # around.
-        if reanalyze_replay.DoesReplayNeedUpdate(r.id):
-            replay_links.append(
-                {
-                    "name": _ShortNameForReplay(r),
-                    "url": urls.reverse(
-                        viewname="Replays/Reanalysis", args=(r.shot.game_id, r.id)
-                    ),
-                }
-            )
-
-    if r:
-        next_token = r.id
+    replays = list(_select_next_replays_with_files(pagination_token))
+    results = reanalyze_replay.ReanalyzeReplays([r.id for r in replays], update=False)
+    needs_update = {result.replay_id for result in results if result.needs_update}
+
+    # Typically in Django we would simply pass the replay instance to the
+    # template engine, and define its rendering in the template. However,
+    # since this method could easily return a very large number of replays,
+    # we instead only keep the minimum information to render the replays
+    # around.
+    replay_links = [
+        {
+            "name": _ShortNameForReplay(r),
+            "url": urls.reverse(
+                viewname="Replays/Reanalysis", args=(r.shot.game_id, r.id)
+            ),
+        }
+        for r in replays
+        if r.id in needs_update
+    ]
+
+    if replays:
+        next_token = replays[-1].id
     else:
         # Since there are no replays, the "next token" is the same as the
         # current token.
@@ -78,6 +88,7 @@ def batch_reanalyze_preview(request, pagination_token: int = 0):
 
     context = {
         "replays": replay_links,
+        "failed_replays": _FailedReplayLinks(replays, results),
         "current_token": pagination_token,
         "next_token": next_token,
         "more_pages": more_pages,
@@ -101,30 +112,32 @@ def reanalyze_page(request, start_token: int, end_token: int):
         end_token: A pagination token; an exclusive upper bound for the set of
             replays to be reanalyzed.
     """
-    replay_links = []
-
-    # To lessen the big load on the database, the updates are performed in many
-    # small transactions, not one big one.
-    for r in _select_next_replays_with_files(
-        pagination_token=start_token, end_token=end_token
-    ):
-        if reanalyze_replay.DoesReplayNeedUpdate(r.id):
-            with transaction.atomic():
-                # The replay might have been deleted during this method's
-                # resolution.
-                if models.Replay.objects.filter(id=r.id).exists():
-                    reanalyze_replay.UpdateReplay(r.id)
-                    replay_links.append(
-                        {
-                            "name": _ShortNameForReplay(r),
-                            "url": urls.reverse(
-                                viewname="Replays/Details", args=(r.shot.game_id, r.id)
-                            ),
-                        }
-                    )
+    replays = list(
+        _select_next_replays_with_files(
+            pagination_token=start_token, end_token=end_token
+        )
+    )
+    # Replays deleted in the meantime are skipped, and have no result.
+    results = reanalyze_replay.ReanalyzeReplays([r.id for r in replays], update=True)
+    updated = {result.replay_id for result in results if result.needs_update}
+
+    replay_links = [
+        {
+            "name": _ShortNameForReplay(r),
+            "url": urls.reverse(
+                viewname="Replays/Details", args=(r.shot.game_id, r.id)
+            ),
+        }
+        for r in replays
+        if r.id in updated
+    ]
 
     return render(
         request,
         "replays/successfully_reanalyzed_batch.html",
-        {"replays": replay_links, "end_token": end_token},
+        {
+            "replays": replay_links,
+            "failed_replays": _FailedReplayLinks(replays, results),
+            "end_token": end_token,
+        },
     )
@@ -1,28 +1,85 @@
 """Contains views which list various replays."""
 
-import dataclasses
+import hashlib
+import re
 from typing import Optional
 
+from asgiref.sync import sync_to_async
+from django import http
 from django import urls
+from django.utils import cache as cache_utils
+from django.utils import http as http_utils
 from django.views.decorators import http as http_decorators
 from django.shortcuts import get_object_or_404, render, redirect
-from django.db.models import Manager
 from django.core.handlers.wsgi import WSGIRequest
 
-from replays import models
-from replays import game_ids
-from replays.models import Game, Shot, Route
-from replays.replays_to_json import convert_replays_to_json_bytes
-from replays.views.replay_table_helpers import stream_json_bytes_to_http_reponse
+from replays import filter_catalogue
+from replays import replays_to_json
+from replays import scoreboard_query
+from replays import scoreboard_snapshots
+from replays.models import Game
 
-_SCOREBOARD_CATEGORIES = (models.Category.STANDARD, models.Category.TAS)
+_ACCEPTS_GZIP_RE = re.compile(r"\bgzip\b")
+
+_FILTERS_MAX_AGE = 24 * 60 * 60
 
 
 @http_decorators.require_safe
-def game_scoreboard_json(request: WSGIRequest, game_id: str):
-    replays = _get_all_replay_for_game(game_id)
-    replay_jsons = convert_replays_to_json_bytes(replays)
-    return stream_json_bytes_to_http_reponse(replay_jsons)
+async def game_scoreboard_json(request: WSGIRequest, game_id: str):
+    """Serve the replays on a game's scoreboard.
+
+    Without filters, this is the game's scoreboard snapshot, which is kept
+    whole in the cache, so unlike the other replay feeds it isn't streamed.
+    """
+    if scoreboard_query.IsScoreboardQuery(request.GET):
+        return await sync_to_async(_filtered_scoreboard_json)(request, game_id)
+
+    snapshot = await sync_to_async(scoreboard_snapshots.GetSnapshot)(game_id)
+
+    not_modified = cache_utils.get_conditional_response(
+        request, etag=snapshot.etag, last_modified=snapshot.last_modified
+    )
+    if not_modified is not None:
+        response = not_modified
+    elif _ACCEPTS_GZIP_RE.search(request.headers.get("Accept-Encoding", "")):
+        response = http.HttpResponse(
+            snapshot.gzipped_content, content_type="application/json"
+        )
+        # The snapshot is stored compressed, so GZipMiddleware leaves it alone.
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = http.HttpResponse(snapshot.content, content_type="application/json")
+
+    response["ETag"] = snapshot.etag
+    response["Last-Modified"] = http_utils.http_date(snapshot.last_modified)
+    response["Content-Disposition"] = 'attachment; filename="output.json"'
+    cache_utils.patch_vary_headers(response, ["Accept-Encoding", "Accept-Language"])
+    return response
+
+
+def _filtered_scoreboard_json(request: WSGIRequest, game_id: str):
+    """Serve a page of the replays on a scoreboard matching some filters.
+
+    See scoreboard_query for the query parameters. If there are more replays,
+    the response has a Link header pointing to the next page.
+    """
+    game = get_object_or_404(Game, game_id=game_id)
+    try:
+        query = scoreboard_query.ParseQuery(game, request.GET)
+    except scoreboard_query.InvalidQueryError as e:
+        return http.HttpResponseBadRequest(str(e))
+
+    page = scoreboard_query.GetPage(query)
+    response = http.HttpResponse(
+        b"".join(replays_to_json.encode_rows(page.rows)),
+        content_type="application/json",
+    )
+    if page.next_cursor is not None:
+        next_query = request.GET.copy()
+        next_query["cursor"] = page.next_cursor.Encode()
+        response["Link"] = f'<{request.path}?{next_query.urlencode()}>; rel="next"'
+    cache_utils.patch_vary_headers(response, ["Accept-Language"])
+    return response
 
 
 def game_scoreboard_old_url(
@@ -53,181 +110,46 @@ def game_scoreboard(
     request: WSGIRequest,
     game_id: str,
 ):
-    game: Game = get_object_or_404(Game, game_id=game_id)
-    filter_options = get_filter_options(game)
-    filter_options.append(
-        Filter("Category", _get_scoreboard_category_names(), has_all=False)
-    )
-    show_route = game_id in [
-        game_ids.GameIDs.TH01,
-        game_ids.GameIDs.TH08,
-        game_ids.GameIDs.TH128,
-    ]
+    game_filters = _get_game_filters_or_404(game_id)
 
     return render(
         request,
         "replays/game_scoreboard.html",
         {
-            "game": game,
-            "filters": filter_options,
-            "show_route": show_route,
+            "game": game_filters.game,
+            "filters": game_filters.AllFilters(),
+            "show_route": game_filters.show_route,
         },
     )
 
 
-@dataclasses.dataclass(frozen=True)
-class Filter:
-    name: str
-    values: str
-    has_all: bool = True
-
-
-def get_filter_options(game: Game) -> list[Filter]:
-    if game.game_id == game_ids.GameIDs.TH01 or game.game_id == game_ids.GameIDs.TH128:
-        return _get_filter_options_th01_th128(game)
-    elif game.game_id == game_ids.GameIDs.TH08:
-        return _get_filter_options_th08(game)
-    elif game.game_id == game_ids.GameIDs.TH095:
-        return _get_filter_options_th095(game)
-    elif game.game_id == game_ids.GameIDs.TH13:
-        return _get_filter_options_th13(game)
-    elif game.game_id == game_ids.GameIDs.TH16:
-        return _get_filter_options_th16(game)
-    elif game.game_id == game_ids.GameIDs.TH17:
-        return _get_filter_options_th17(game)
-    elif game.game_id == game_ids.GameIDs.TH20:
-        return _get_filter_options_th20(game)
-    elif game.game_id == game_ids.GameIDs.ALCO:
-        return _get_filter_options_alco(game)
-    else:
-        return _get_filter_options_default(game)
-
-
-def _get_scoreboard_category_names() -> list[str]:
-    return [c.label for c in _SCOREBOARD_CATEGORIES]
-
-
-def _get_filter_options_default(game: Game) -> list[Filter]:
-    all_shots = [shot.GetName() for shot in Shot.objects.filter(game=game.game_id)]
-    all_difficulties = [game.GetDifficultyName(d) for d in range(game.num_difficulties)]
-    return [
-        Filter("Difficulty", all_difficulties),
-        Filter("Shot", all_shots),
-    ]
-
-
-def _get_filter_options_th01_th128(game: Game) -> list[Filter]:
-    all_difficulties = [game.GetDifficultyName(d) for d in range(game.num_difficulties)]
-    all_routes = [route.GetName() for route in Route.objects.filter(game=game.game_id)]
-    return [
-        Filter("Difficulty", all_difficulties),
-        Filter("Route", all_routes),
-    ]
-
-
-def _get_filter_options_th08(game: Game) -> list[Filter]:
-    all_shots = [shot.GetName() for shot in Shot.objects.filter(game=game.game_id)]
-    all_difficulties = [game.GetDifficultyName(d) for d in range(game.num_difficulties)]
-    all_routes = [route.GetName() for route in Route.objects.filter(game=game.game_id)]
-    return [
-        Filter("Difficulty", all_difficulties),
-        Filter("Shot", all_shots),
-        Filter("Route", all_routes),
-    ]
-
-
-def _get_filter_options_th095(game: Game) -> list[Filter]:
-    all_levels = [
-        game.GetSceneGameLevelName(d + 1) for d in range(game.num_scene_game_levels)
-    ]
-    all_scenes = [
-        game.GetSceneGameSceneName(d + 1) for d in range(game.num_scene_game_scenes)
-    ]
-    return [Filter("Level", all_levels), Filter("Scene", all_scenes)]
-
-
-def _get_filter_options_th13(game: Game) -> list[Filter]:
-    all_shots = [shot.GetName() for shot in Shot.objects.filter(game=game.game_id)]
-    # Exclude difficulty 5, Overdrive, which only appears in spell practice.
-    all_difficulties = [game.GetDifficultyName(d) for d in range(5)]
-
-    return [
-        Filter("Difficulty", all_difficulties),
-        Filter("Shot", all_shots),
-    ]
+@http_decorators.require_safe
+def game_scoreboard_filters_json(request: WSGIRequest, game_id: str):
+    """Serve the filters for a game's scoreboard, in the active language.
 
+    They only change when the constant tables do, so clients may keep them for
+    a day, and then revalidate them with the ETag.
+    """
+    game_filters = _get_game_filters_or_404(game_id)
+    response = http.JsonResponse(game_filters.ToJson())
+    etag = '"' + hashlib.sha256(response.content).hexdigest()[:32] + '"'
 
-def _get_filter_options_th16(game: Game) -> list[Filter]:
-    all_characters = _deduplicate_list_preserving_order(
-        shot.GetCharacterName() for shot in Shot.objects.filter(game=game.game_id)
-    )
-    all_seasons = _deduplicate_list_preserving_order(
-        shot.GetSubshotName() for shot in Shot.objects.filter(game=game.game_id)
-    )
-    all_seasons.remove(None)
-    all_difficulties = [game.GetDifficultyName(d) for d in range(game.num_difficulties)]
-    return [
-        Filter("Difficulty", all_difficulties),
-        Filter("Character", all_characters),
-        Filter("Season", all_seasons),
-    ]
-
-
-def _get_filter_options_th17(game: Game) -> list[Filter]:
-    all_characters = _deduplicate_list_preserving_order(
-        shot.GetCharacterName() for shot in Shot.objects.filter(game=game.game_id)
-    )
-    all_goasts = _deduplicate_list_preserving_order(
-        shot.GetSubshotName() for shot in Shot.objects.filter(game=game.game_id)
-    )
-    all_difficulties = [game.GetDifficultyName(d) for d in range(game.num_difficulties)]
-    return [
-        Filter("Difficulty", all_difficulties),
-        Filter("Character", all_characters),
-        Filter("Goast", all_goasts),
-    ]
+    not_modified = cache_utils.get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        response = not_modified
+    response["ETag"] = etag
+    cache_utils.patch_cache_control(response, max_age=_FILTERS_MAX_AGE)
+    cache_utils.patch_vary_headers(response, ["Accept-Language"])
+    return response
 
 
-def _get_filter_options_th20(game: Game) -> list[Filter]:
-    all_characters = _deduplicate_list_preserving_order(
-        shot.GetCharacterName() for shot in Shot.objects.filter(game=game.game_id)
-    )
-    all_stones = _deduplicate_list_preserving_order(
-        shot.GetSubshotName() for shot in Shot.objects.filter(game=game.game_id)
-    )
-    all_difficulties = [game.GetDifficultyName(d) for d in range(game.num_difficulties)]
-    return [
-        Filter("Difficulty", all_difficulties),
-        Filter("Character", all_characters),
-        Filter("Stone", all_stones),
-    ]
-
-
-def _get_filter_options_alco(game: Game) -> list[Filter]:
-    return []
-
-
-def _get_all_replay_for_game(game_id: str) -> Manager[models.Replay]:
-    return (
-        models.Replay.objects.prefetch_related("shot")
-        .prefetch_related("route")
-        .select_related("rank_view")
-        .filter(category__in=(models.Category.STANDARD, models.Category.TAS))
-        .filter(shot__game=game_id)
-        .filter(
-            replay_type__in=(models.ReplayType.FULL_GAME, models.ReplayType.SCENE_GAME)
-        )
-        .filter(is_listed=True)
-        .filter_visible()
-        .order_by("-score")
-    )
+def _get_game_filters_or_404(game_id: str) -> filter_catalogue.GameFilters:
+    try:
+        return filter_catalogue.GetGameFilters(game_id)
+    except Game.DoesNotExist:
+        raise http.Http404(f"No game {game_id}")
 
 
-def _deduplicate_list_preserving_order(list_: list) -> list:
-    deduplicated_list = []
-    seen = set()
-    for item in list_:
-        if item not in seen:
-            deduplicated_list.append(item)
-            seen.add(item)
-    return deduplicated_list
+def get_filter_options(game: Game) -> list[filter_catalogue.Filter]:
+    """Get the filters particular to a game, in the active language."""
+    return list(filter_catalogue.GetGameFilters(game.game_id).filters)
@@ -1,13 +1,57 @@
-from typing import Iterable
-from django.http import StreamingHttpResponse
+from typing import AsyncIterable, AsyncIterator, Iterable, Union
+
+from django.core.handlers import asgi
+from django.db.models import QuerySet
+from django.http import HttpRequest, StreamingHttpResponse
+
+from replays import replay_feeds
+from replays import replays_to_json
+
+
+_ASYNC_CHUNK_SIZE = 64 * 1024
+"""Roughly how many bytes to send at once when streaming asynchronously."""
 
 
 def stream_json_bytes_to_http_reponse(
-    replay_bytes: Iterable[bytes],
+    replay_bytes: Union[Iterable[bytes], AsyncIterable[bytes]],
 ) -> StreamingHttpResponse:
     response = StreamingHttpResponse(
-        iter(replay_bytes),
+        replay_bytes if hasattr(replay_bytes, "__aiter__") else iter(replay_bytes),
         content_type="application/json",
     )
     response["Content-Disposition"] = 'attachment; filename="output.json"'
     return response
+
+
+def encode_feed(
+    request: HttpRequest, rows: QuerySet
+) -> Union[Iterable[bytes], AsyncIterable[bytes]]:
+    """Serialize a replay feed in whichever way suits the server.
+
+    Under ASGI, the rows are fetched and sent asynchronously, so a slow client
+    only holds on to a coroutine rather than a worker; the server stops asking
+    for more rows while the client catches up. Under WSGI, the response is
+    iterated synchronously anyway, and Django would have to buffer an
+    asynchronous iterator in full, so the rows are fetched synchronously.
+    """
+    if isinstance(request, asgi.ASGIRequest):
+        return _batch_chunks(
+            replays_to_json.aencode_rows(replay_feeds.IterateRowsAsync(rows))
+        )
+    return replays_to_json.encode_rows(replay_feeds.IterateRows(rows))
+
+
+async def _batch_chunks(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    # Each chunk becomes a separate message to the ASGI server, so join rows
+    # together rather than sending them one at a time.
+    batch = []
+    size = 0
+    async for chunk in chunks:
+        batch.append(chunk)
+        size += len(chunk)
+        if size >= _ASYNC_CHUNK_SIZE:
+            yield b"".join(batch)
+            batch = []
+            size = 0
+    if batch:
+        yield b"".join(batch)
@@ -57,3 +57,35 @@ class CreateReplayTestCase(test_case.ReplayTestCase):
 
         with self.assertRaises(models.TemporaryReplayFile.DoesNotExist):
             models.TemporaryReplayFile.objects.get(id=temp_replay.id)
+
+    def testStagesAreCheckedWhenPublishing(self):
+        replay_file_contents = bytearray(test_replays.GetRaw("th10_normal"))
+        # Corrupt the stage data, leaving the header alone.
+        replay_file_contents[-2000:-1500] = b"\xff" * 500
+        replay_file_contents = bytes(replay_file_contents)
+        replay_info = replay_parsing.ParseHeader(replay_file_contents)
+
+        temp_replay = models.TemporaryReplayFile(
+            user=self.user, replay=replay_file_contents
+        )
+        temp_replay.save()
+
+        request = self.factory.post(
+            urls.reverse("publish_replay", kwargs={"temp_replay_id": temp_replay.id}),
+            data={
+                "score": replay_info.score,
+                "category": models.Category.STANDARD,
+                "comment": "",
+                "is_good": True,
+                "is_clear": True,
+                "video_link": "",
+                "name": replay_info.name,
+                "uses_bombs": True,
+            },
+        )
+        request.user = self.user
+        response = create_replay.publish_replay(request, temp_replay.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "This replay is corrupted")
+        self.assertFalse(models.Replay.objects.exists())
@@ -0,0 +1,57 @@
+from django import test as django_test
+
+from replays import models
+from replays.testing import test_case
+from replays.testing import test_replays
+from replays.views import reanalyze_all_replays
+
+
+class ReanalyzeAllReplaysTestCase(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = django_test.RequestFactory()
+        self.staff = self.createUser("staff-user", is_staff=True)
+        self.staff.is_superuser = True
+        self.staff.save()
+        self.good = test_replays.CreateAsPublishedReplay(
+            "th10_normal", self.createUser("good-user")
+        )
+        self.bad = test_replays.CreateAsPublishedReplay(
+            "th6_extra", self.createUser("bad-user")
+        )
+        models.ReplayFile.objects.filter(replay=self.bad).update(
+            replay_file=b"not a replay file"
+        )
+
+    def testPreviewListsFailedReplays(self):
+        request = self.factory.get("/replays/reanalyze_all")
+        request.user = self.staff
+
+        response = reanalyze_all_replays.batch_reanalyze_preview(request)
+
+        self.assertContains(response, "Replays that could not be reanalyzed")
+        self.assertContains(response, f"{self.bad.id} (bad-user, ")
+        self.assertContains(response, "UnsupportedGameError")
+        self.assertNotContains(response, f"{self.good.id} (good-user, ")
+
+    def testReanalyzePageListsFailedReplays(self):
+        request = self.factory.post(
+            f"/replays/reanalyze_batch/0/{self.bad.id}", data={}
+        )
+        request.user = self.staff
+
+        response = reanalyze_all_replays.reanalyze_page(request, 0, self.bad.id)
+
+        self.assertContains(response, "Replays that could not be reanalyzed")
+        self.assertContains(response, f"{self.bad.id} (bad-user, ")
+        self.assertContains(response, "UnsupportedGameError")
+
+    def testPreviewListsReplaysWithMissingFiles(self):
+        models.ReplayFile.objects.filter(replay=self.good).update(replay_file=None)
+        request = self.factory.get("/replays/reanalyze_all")
+        request.user = self.staff
+
+        response = reanalyze_all_replays.batch_reanalyze_preview(request)
+
+        self.assertContains(response, f"{self.good.id} (good-user, ")
+        self.assertContains(response, "MissingReplayFileError")
@@ -1,10 +1,17 @@
+import gzip
+import json
+
+from asgiref.sync import async_to_sync
+from django import http
 from django import test as django_test
 from django import urls
+from django.core.cache import cache
 from replays import models
 
 from replays import game_ids
 from replays.views import replay_list
 from replays.testing import test_case
+from replays.testing import test_replays
 
 
 class GameScoreboardRedirectTestCase(test_case.ReplayTestCase):
@@ -91,3 +98,136 @@ class GetFilterOptionsTestCase(test_case.ReplayTestCase):
         self.assertHasFilterWithNValues("Difficulty", 5, filter_options)
         self.assertHasFilterWithNValues("Character", 3, filter_options)
         self.assertHasFilterWithNValues("Goast", 3, filter_options)
+
+
+class GameScoreboardFiltersTestCase(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.factory = django_test.RequestFactory()
+
+    def _Get(self, game_id, **headers):
+        request = self.factory.get(f"/replays/{game_id}/filters", headers=headers)
+        return replay_list.game_scoreboard_filters_json(request, game_id)
+
+    def testServesFilters(self):
+        response = self._Get(game_ids.GameIDs.TH06)
+
+        self.assertEqual(response.status_code, 200)
+        filters = json.loads(response.content)["filters"]
+        self.assertEqual(
+            [f["name"] for f in filters], ["Difficulty", "Shot", "Category"]
+        )
+        self.assertIn("max-age=86400", response["Cache-Control"])
+        self.assertIn("Accept-Language", response["Vary"])
+
+    def testNotModified(self):
+        etag = self._Get(game_ids.GameIDs.TH06)["ETag"]
+
+        response = self._Get(game_ids.GameIDs.TH06, if_none_match=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def testUnknownGame(self):
+        with self.assertRaises(http.Http404):
+            self._Get("th99")
+
+    def testScoreboardPageShowsFilters(self):
+        request = self.factory.get(f"/replays/{game_ids.GameIDs.TH08}")
+
+        response = replay_list.game_scoreboard(request, game_ids.GameIDs.TH08)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'filterType="Route"')
+        self.assertContains(response, 'filterType="Category"')
+
+
+class GameScoreboardJsonTestCase(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = self.createUser("somebody")
+        test_replays.CreateReplayWithoutFile(
+            user=self.user,
+            difficulty=1,
+            shot=models.Shot.objects.get(game_id=game_ids.GameIDs.TH05, shot_id="Mima"),
+            score=100,
+        )
+        self.factory = django_test.RequestFactory()
+
+    def _Get(self, **headers):
+        request = self.factory.get(
+            f"/replays/{game_ids.GameIDs.TH05}/json", headers=headers
+        )
+        return async_to_sync(replay_list.game_scoreboard_json)(
+            request, game_ids.GameIDs.TH05
+        )
+
+    def testServesGzippedSnapshot(self):
+        response = self._Get(accept_encoding="gzip")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        lines = gzip.decompress(response.content).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["Score"]["text"], "🥇100")
+
+    def testServesPlainSnapshot(self):
+        response = self._Get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(len(response.content.splitlines()), 1)
+
+    def testNotModified(self):
+        etag = self._Get()["ETag"]
+
+        response = self._Get(if_none_match=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def testFilteredPage(self):
+        test_replays.CreateReplayWithoutFile(
+            user=self.user,
+            difficulty=1,
+            shot=models.Shot.objects.get(
+                game_id=game_ids.GameIDs.TH05, shot_id="Yuuka"
+            ),
+            score=300,
+        )
+        test_replays.CreateReplayWithoutFile(
+            user=self.user,
+            difficulty=1,
+            shot=models.Shot.objects.get(
+                game_id=game_ids.GameIDs.TH05, shot_id="Yuuka"
+            ),
+            score=200,
+        )
+        request = self.factory.get(
+            f"/replays/{game_ids.GameIDs.TH05}/json",
+            {"shot": "Yuuka", "limit": "1"},
+        )
+
+        response = async_to_sync(replay_list.game_scoreboard_json)(
+            request, game_ids.GameIDs.TH05
+        )
+
+        self.assertEqual(response.status_code, 200)
+        lines = response.content.splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["Score"]["text"], "🥇300")
+        self.assertIn("cursor=300.", response["Link"])
+        self.assertIn("shot=Yuuka", response["Link"])
+
+    def testInvalidFilter(self):
+        request = self.factory.get(
+            f"/replays/{game_ids.GameIDs.TH05}/json", {"difficulty": "x"}
+        )
+
+        response = async_to_sync(replay_list.game_scoreboard_json)(
+            request, game_ids.GameIDs.TH05
+        )
+
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django import test as django_test
+
+from replays import constant_helpers
+from replays import game_ids
+from replays import models
+from replays import replay_feeds
+from replays.testing import test_case
+from replays.testing import test_replays
+from replays.views import index
+from replays.views import replay_table_helpers
+
+
+class EncodeFeedTestCase(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        user = self.createUser("somebody")
+        for i in range(3):
+            test_replays.CreateReplayWithoutFile(
+                user=user,
+                shot=models.Shot.objects.get(
+                    game_id=game_ids.GameIDs.TH05, shot_id="Mima"
+                ),
+                difficulty=i,
+                score=1000 * i,
+            )
+
+    def testSynchronousUnderWsgi(self):
+        request = django_test.RequestFactory().get("/replays/index/json")
+
+        chunks = replay_table_helpers.encode_feed(
+            request, replay_feeds.GetRecentReplays()
+        )
+
+        self.assertFalse(hasattr(chunks, "__aiter__"))
+        self.assertEqual(len(b"".join(chunks).splitlines()), 3)
+
+    def testSynchronousFeedIsNotLoadedUpFront(self):
+        request = django_test.RequestFactory().get("/replays/index/json")
+        rows = replay_feeds.GetRecentReplays()
+        constant_helpers.GetConstantModelIndex()
+
+        chunks = iter(replay_table_helpers.encode_feed(request, rows))
+        with self.assertNumQueries(1):
+            next(chunks)
+        self.assertEqual(len(list(chunks)), 2)
+
+        # The rows were streamed from a cursor, not cached on the queryset.
+        self.assertIsNone(rows._result_cache)
+
+    async def testAsynchronousUnderAsgi(self):
+        request = django_test.AsyncRequestFactory().get("/replays/index/json")
+        expected = [
+            line
+            async for line in replay_table_helpers.encode_feed(
+                request, replay_feeds.GetRecentReplays()
+            )
+        ]
+
+        with mock.patch.object(replay_table_helpers, "_ASYNC_CHUNK_SIZE", 1):
+            chunks = [
+                chunk
+                async for chunk in replay_table_helpers.encode_feed(
+                    request, replay_feeds.GetRecentReplays()
+                )
+            ]
+
+        self.assertEqual(len(expected), 1)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(b"".join(chunks), expected[0])
+
+    async def testStreamsIndexAsynchronously(self):
+        request = django_test.AsyncRequestFactory().get("/replays/index/json")
+
+        response = await index.index_json(request)
+
+        self.assertTrue(response.is_async)
+        content = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(content.splitlines()), 3)
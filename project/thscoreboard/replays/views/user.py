@@ -1,24 +1,22 @@
 """The public page for a user's information."""
 
 from django.contrib import auth
-from django.shortcuts import get_object_or_404, render
+from django.shortcuts import aget_object_or_404, get_object_or_404, render
 from django.views.decorators import http as http_decorators
 
-from replays import models
-from replays.replays_to_json import convert_replays_to_json_bytes
-from replays.views.replay_table_helpers import stream_json_bytes_to_http_reponse
+from replays import replay_feeds
+from replays.views import replay_table_helpers
 
 
 @http_decorators.require_safe
-def user_page_json(request, username: str):
-    user = get_object_or_404(auth.get_user_model(), username=username, is_active=True)
-    user_replays = (
-        models.Replay.objects.select_related("rank_view")
-        .filter(user=user)
-        .order_by("shot__game_id", "shot_id", "created")
+async def user_page_json(request, username: str):
+    user = await aget_object_or_404(
+        auth.get_user_model(), username=username, is_active=True
+    )
+    replay_jsons = replay_table_helpers.encode_feed(
+        request, replay_feeds.GetUserReplays(user)
     )
-    replay_jsons = convert_replays_to_json_bytes(user_replays)
-    return stream_json_bytes_to_http_reponse(replay_jsons)
+    return replay_table_helpers.stream_json_bytes_to_http_reponse(replay_jsons)
 
 
 @http_decorators.require_safe
@@ -6,22 +6,22 @@ from django.http import (
     HttpResponseBadRequest,
     HttpResponseForbidden,
     Http404,
+    StreamingHttpResponse,
 )
 from django.contrib.auth import decorators as auth_decorators
 from django.views.decorators import http as http_decorators
 from django.shortcuts import redirect, render
 from django.db import transaction
+from django.utils import cache as cache_utils
 
 from replays import models
 from replays.lib import http_util
-from replays.lib.video_embed import get_video_embed_link
 from replays import forms
-from replays import game_fields
 from replays import reanalyze_replay
-from replays import spell_names
+from replays import replay_downloads
+from replays import replay_pages
 
 from thscoreboard import settings
-from replays import game_ids
 
 
 @http_decorators.require_POST
@@ -38,68 +38,29 @@ def edit_comment(request, game_id: str, replay_id: int):
 
 @http_decorators.require_safe
 def replay_details(request, game_id: str, replay_id: int):
-    replay_instance, replay_stages = GetReplayWithStagesOr404(request.user, replay_id)
+    try:
+        page = replay_pages.GetPage(replay_id)
+    except models.Replay.DoesNotExist:
+        raise Http404()
 
-    if replay_instance.shot.game.game_id != game_id:
+    if page.game_id != game_id:
         # Wrong game, but IDs are unique anyway so we know the right game. Send the user there.
         return redirect(
             replay_details,
-            game_id=replay_instance.shot.game.game_id,
+            game_id=page.game_id,
             replay_id=replay_id,
         )
 
-    formatStages = game_fields.FormatStages(
-        game_id, replay_stages, replay_instance.shot.shot_id
-    )
-
-    edit_form = forms.EditReplayForm(initial={"comment": replay_instance.comment})
-
-    can_remove_claim = _is_replay_claimed(replay_instance) and (
-        request.user == replay_instance.user or request.user.is_staff
-    )
-
+    is_owner = request.user.is_authenticated and request.user.id == page.owner_id
     context = {
-        "game_name": replay_instance.shot.game.GetName(),
-        "shot_name": replay_instance.shot.GetName(),
-        "difficulty_name": replay_instance.GetDifficultyDisplayName(),
-        "category": replay_instance.get_category_display(),
-        "game_id": game_id,
-        "spell_name": spell_names.get(
-            game_id,
-            replay_instance.spell_card_id,
-            replay_instance.scene_game_level,
-            replay_instance.scene_game_scene,
-        ),
-        "replay": replay_instance,
-        "can_edit": request.user == replay_instance.user,
-        "can_delete": request.user == replay_instance.user or request.user.is_staff,
-        "is_listed": replay_instance.is_listed,
-        "replay_file_is_good": replay_instance.is_good,
-        "has_stages": len(replay_stages) != 0,
-        "replay_stages": formatStages,
-        "table_fields": game_fields.GetGameField(game_id, replay_instance.replay_type),
-        "edit_form": edit_form,
-        "replay_type": game_ids.GetReplayType(replay_instance.replay_type),
+        "page": page,
+        "can_edit": is_owner,
+        "can_delete": is_owner or request.user.is_staff,
+        "can_remove_claim": page.is_claimed and (is_owner or request.user.is_staff),
         "site_base": settings.SITE_BASE,
-        "can_remove_claim": can_remove_claim,
     }
-
-    if hasattr(replay_instance, "replayfile"):
-        context["has_replay_file"] = True
-    else:
-        context["has_replay_file"] = False
-    if replay_instance.user:
-        context["player_name"] = replay_instance.user.username
-        context["owned"] = True
-    else:
-        context["player_name"] = replay_instance.imported_username
-        context["owned"] = False
-
-    if replay_instance.route:
-        context["route_name"] = replay_instance.route.GetName()
-
-    if replay_instance.video_link:
-        context["video_embed"] = get_video_embed_link(replay_instance.video_link)
+    if is_owner:
+        context["edit_form"] = forms.EditReplayForm(initial={"comment": page.comment})
 
     return render(request, "replays/replay_details.html", context)
 
@@ -140,18 +101,49 @@ def download_replay(request, game_id: str, replay_id: int):
     if not replay_instance.shot.game.has_replays:
         return HttpResponseBadRequest()
 
-    try:
-        replay_file_instance = models.ReplayFile.objects.get(replay=replay_instance)
-    except models.ReplayFile.DoesNotExist:
+    file_info = replay_downloads.GetReplayFileInfo(replay_instance.id)
+    if file_info is None:
         raise ValueError(
             "No replay file for this submission. This should not be possible"
         )
 
-    download_headers = http_util.GetDownloadFileHeaders(
-        replay_instance.GetNiceFilename(replay_file_instance.id)
+    not_modified = cache_utils.get_conditional_response(request, etag=file_info.etag)
+    if not_modified is not None:
+        not_modified["ETag"] = file_info.etag
+        return not_modified
+
+    byte_range = None
+    range_header = request.headers.get("Range")
+    # If-Range asks for the whole file if it has changed since the client
+    # downloaded the first part.
+    if range_header and request.headers.get("If-Range", file_info.etag) == (
+        file_info.etag
+    ):
+        try:
+            byte_range = http_util.ParseRangeHeader(range_header, file_info.size)
+        except http_util.RangeNotSatisfiableError:
+            return HttpResponse(
+                status=416, headers={"Content-Range": f"bytes */{file_info.size}"}
+            )
+    start, end = byte_range or (0, file_info.size)
+
+    if request.method == "HEAD":
+        content = []
+    else:
+        content = replay_downloads.IterChunks(file_info, start, end)
+    response = StreamingHttpResponse(
+        content,
+        status=206 if byte_range else 200,
+        headers=http_util.GetDownloadFileHeaders(
+            replay_instance.GetNiceFilename(file_info.id)
+        ),
     )
-
-    return HttpResponse(replay_file_instance.replay_file, headers=download_headers)
+    response["Content-Length"] = str(end - start)
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = file_info.etag
+    if byte_range:
+        response["Content-Range"] = f"bytes {start}-{end - 1}/{file_info.size}"
+    return response
 
 
 @http_decorators.require_http_methods(["GET", "HEAD", "POST"])
@@ -0,0 +1,19 @@
+"""Middleware that compresses responses, except for byte-range downloads."""
+
+from django.http import request as request_lib
+from django.middleware import gzip
+
+
+class GZipMiddleware(gzip.GZipMiddleware):
+    """Like Django's GZipMiddleware, but leaves ranged responses alone.
+
+    A response that advertises byte ranges (with "Accept-Ranges: bytes") is
+    a file that clients may fetch piece by piece, and the ranges refer to the
+    file's bytes as they are, not to a gzipped copy. Compressing it would also
+    throw away its Content-Length.
+    """
+
+    def process_response(self, request: request_lib.HttpRequest, response):
+        if response.get("Accept-Ranges") == "bytes":
+            return response
+        return super().process_response(request, response)
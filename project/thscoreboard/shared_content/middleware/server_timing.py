@@ -0,0 +1,79 @@
+"""Middleware that reports where each request spent its time."""
+
+import time
+
+from django import db
+from django.http import request as request_lib
+
+from shared_content import request_timing
+
+
+_UNRESOLVED_VIEW = "(unresolved)"
+
+_DESCRIPTIONS = {
+    request_timing.DATABASE: "Database",
+    request_timing.TEMPLATE: "Templates",
+    request_timing.JSON: "JSON",
+    request_timing.PARSE: "Replay parsing",
+}
+
+
+class ServerTimingMiddleware:
+    """Times each request, and reports it in a Server-Timing header.
+
+    The header lists the total time and the time spent in each phase measured
+    by request_timing, such as SQL queries and template rendering. The timings
+    are also recorded in request_timing.STATS, by view.
+
+    For a streaming response, only the work done before the response starts
+    is counted.
+    """
+
+    def __init__(self, get_response) -> None:
+        self._get_response = get_response
+
+    def __call__(self, request: request_lib.HttpRequest):
+        timer = request_timing.RequestTimer()
+        with request_timing.Timing(timer), db.connection.execute_wrapper(
+            _QueryTimer(timer)
+        ):
+            response = self._get_response(request)
+        total = timer.Elapsed()
+
+        response["Server-Timing"] = _FormatServerTiming(timer, total)
+        request_timing.STATS.Record(_GetViewName(request), timer, total)
+        return response
+
+
+class _QueryTimer:
+    def __init__(self, timer: request_timing.RequestTimer) -> None:
+        self._timer = timer
+
+    def __call__(self, execute, sql, params, many, context):
+        self._timer.query_count += 1
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self._timer.seconds[request_timing.DATABASE] += time.perf_counter() - start
+
+
+def _GetViewName(request: request_lib.HttpRequest) -> str:
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return _UNRESOLVED_VIEW
+    return match.view_name or match._func_path
+
+
+def _FormatServerTiming(timer: request_timing.RequestTimer, total: float) -> str:
+    metrics = []
+    for phase in request_timing.PHASES:
+        seconds = timer.seconds.get(phase)
+        if seconds is None:
+            continue
+        description = _DESCRIPTIONS[phase]
+        if phase == request_timing.DATABASE:
+            description = f"{description} ({timer.query_count} queries)"
+        metrics.append(f'{phase};dur={seconds * 1000:.1f};desc="{description}"')
+    metrics.append(f"{request_timing.TOTAL};dur={total * 1000:.1f}")
+    return ", ".join(metrics)
@@ -0,0 +1,179 @@
+"""Measures where each request spends its time.
+
+ServerTimingMiddleware starts a RequestTimer for every request. Code that does
+something expensive wraps it in Measure(), which adds the time taken to the
+current request's timer, if there is one; outside of a request, Measure does
+nothing. Code that is too hot for a context manager per call, like encoding a
+row of JSON, can time itself and call Add() instead. The middleware then reports the totals in a Server-Timing header and
+adds them to STATS, which keeps the most recent requests for each view so that
+staff can see which views are slowest.
+
+This module doesn't depend on Django, so that pure-Python code like the replay
+parsers can use Measure.
+"""
+
+import collections
+import contextlib
+import contextvars
+import dataclasses
+import math
+import threading
+import time
+from typing import Iterator, Optional
+
+
+DATABASE = "db"
+TEMPLATE = "template"
+JSON = "json"
+PARSE = "parse"
+TOTAL = "total"
+
+PHASES = (DATABASE, TEMPLATE, JSON, PARSE)
+"""The phases measured within a request, other than TOTAL."""
+
+PERCENTILES = (50, 90, 99)
+
+_REQUESTS_PER_VIEW = 1000
+
+
+class RequestTimer:
+    """Adds up how long a single request spends in each phase."""
+
+    def __init__(self) -> None:
+        self.seconds = collections.Counter()
+        self.query_count = 0
+        self._start = time.perf_counter()
+        # Phases currently being measured, so that nested measurements of the
+        # same phase (like a template rendering another template) aren't
+        # counted twice.
+        self._active: set[str] = set()
+
+    def Elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    @contextlib.contextmanager
+    def Measure(self, phase: str) -> Iterator[None]:
+        if phase in self._active:
+            yield
+            return
+        self._active.add(phase)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[phase] += time.perf_counter() - start
+            self._active.discard(phase)
+
+    def Add(self, phase: str, seconds: float) -> None:
+        if phase not in self._active:
+            self.seconds[phase] += seconds
+
+
+_current_timer: contextvars.ContextVar[Optional[RequestTimer]] = contextvars.ContextVar(
+    "request_timer", default=None
+)
+
+
+@contextlib.contextmanager
+def Timing(timer: RequestTimer) -> Iterator[RequestTimer]:
+    """Make timer the current request's timer until the block exits."""
+    token = _current_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _current_timer.reset(token)
+
+
+@contextlib.contextmanager
+def Measure(phase: str) -> Iterator[None]:
+    """Add the time taken by the block to the current request's timer."""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.Measure(phase):
+        yield
+
+
+def Add(phase: str, seconds: float) -> None:
+    """Add time measured by the caller to the current request's timer."""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.Add(phase, seconds)
+
+
+@dataclasses.dataclass(frozen=True)
+class ViewStats:
+    """Percentiles of recent requests to a single view."""
+
+    view: str
+    request_count: int
+
+    milliseconds: dict[str, dict[int, float]]
+    """For TOTAL and each phase, percentiles of the time taken."""
+
+    query_counts: dict[int, float]
+    """Percentiles of the number of SQL queries made."""
+
+
+class TimingStats:
+    """Remembers the timings of the most recent requests to each view.
+
+    Args:
+        requests_per_view: The number of requests remembered for each view.
+    """
+
+    def __init__(self, requests_per_view: int = _REQUESTS_PER_VIEW) -> None:
+        self._requests_per_view = requests_per_view
+        self._lock = threading.Lock()
+        self._requests: dict[str, collections.deque] = {}
+
+    def Record(self, view: str, timer: RequestTimer, total_seconds: float) -> None:
+        sample = dict(timer.seconds)
+        sample[TOTAL] = total_seconds
+        with self._lock:
+            requests = self._requests.get(view)
+            if requests is None:
+                requests = collections.deque(maxlen=self._requests_per_view)
+                self._requests[view] = requests
+            requests.append((sample, timer.query_count))
+
+    def GetStats(self) -> list[ViewStats]:
+        """Get each view's stats, slowest (by median total time) first."""
+        with self._lock:
+            snapshot = {view: list(r) for view, r in self._requests.items()}
+
+        stats = []
+        for view, requests in snapshot.items():
+            milliseconds = {
+                phase: _Percentiles(
+                    [sample.get(phase, 0.0) * 1000 for sample, _ in requests]
+                )
+                for phase in (TOTAL,) + PHASES
+            }
+            stats.append(
+                ViewStats(
+                    view=view,
+                    request_count=len(requests),
+                    milliseconds=milliseconds,
+                    query_counts=_Percentiles([count for _, count in requests]),
+                )
+            )
+        stats.sort(key=lambda s: s.milliseconds[TOTAL][50], reverse=True)
+        return stats
+
+    def Clear(self) -> None:
+        with self._lock:
+            self._requests.clear()
+
+
+def _Percentiles(values: list[float]) -> dict[int, float]:
+    # Nearest-rank percentiles.
+    values = sorted(values)
+    return {
+        p: values[max(0, math.ceil(p / 100 * len(values)) - 1)] for p in PERCENTILES
+    }
+
+
+STATS = TimingStats()
+"""The timings of recent requests handled by this process."""
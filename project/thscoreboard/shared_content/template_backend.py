@@ -0,0 +1,21 @@
+"""A Django template backend that measures how long templates take to render."""
+
+from django.template.backends import django as django_backend
+
+from shared_content import request_timing
+
+
+class _TimedTemplate(django_backend.Template):
+    def render(self, context=None, request=None):
+        with request_timing.Measure(request_timing.TEMPLATE):
+            return super().render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Django's own template backend, reporting to request_timing."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name).template, self)
@@ -0,0 +1,31 @@
+from django import http
+from django import test as django_test
+
+from shared_content.middleware import gzip
+
+
+class GZipMiddlewareTest(django_test.SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.request = django_test.RequestFactory().get(
+            "/", headers={"Accept-Encoding": "gzip"}
+        )
+
+    def _Process(self, response):
+        return gzip.GZipMiddleware(lambda request: response)(self.request)
+
+    def testCompressesResponses(self):
+        response = self._Process(http.HttpResponse(b"a" * 1000))
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def testLeavesRangedResponsesAlone(self):
+        response = http.StreamingHttpResponse([b"a" * 1000])
+        response["Content-Length"] = "1000"
+        response["Accept-Ranges"] = "bytes"
+
+        response = self._Process(response)
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["Content-Length"], "1000")
+        self.assertEqual(b"".join(response.streaming_content), b"a" * 1000)
@@ -0,0 +1,98 @@
+from unittest import mock
+
+from django import test as django_test
+
+from shared_content import request_timing
+
+
+class MeasureTest(django_test.SimpleTestCase):
+    def testDoesNothingOutsideRequests(self):
+        with request_timing.Measure(request_timing.JSON):
+            pass
+
+    def testAddsUpTime(self):
+        timer = request_timing.RequestTimer()
+        with mock.patch.object(
+            request_timing.time, "perf_counter", side_effect=[1.0, 1.5, 2.0, 2.25]
+        ), request_timing.Timing(timer):
+            with request_timing.Measure(request_timing.JSON):
+                pass
+            with request_timing.Measure(request_timing.JSON):
+                pass
+
+        self.assertEqual(timer.seconds[request_timing.JSON], 0.75)
+
+    def testNestedMeasurementsCountOnce(self):
+        timer = request_timing.RequestTimer()
+        with mock.patch.object(
+            request_timing.time, "perf_counter", side_effect=[1.0, 3.0]
+        ), request_timing.Timing(timer):
+            with request_timing.Measure(request_timing.TEMPLATE):
+                with request_timing.Measure(request_timing.TEMPLATE):
+                    pass
+
+        self.assertEqual(timer.seconds[request_timing.TEMPLATE], 2.0)
+
+    def testAddsTimeMeasuredByCaller(self):
+        timer = request_timing.RequestTimer()
+        with request_timing.Timing(timer):
+            request_timing.Add(request_timing.JSON, 0.5)
+            request_timing.Add(request_timing.JSON, 0.25)
+
+        self.assertEqual(timer.seconds[request_timing.JSON], 0.75)
+
+    def testAddDoesNothingOutsideRequests(self):
+        request_timing.Add(request_timing.JSON, 0.5)
+
+    def testAddWithinMeasurementOfSamePhaseCountsOnce(self):
+        timer = request_timing.RequestTimer()
+        with mock.patch.object(
+            request_timing.time, "perf_counter", side_effect=[1.0, 3.0]
+        ), request_timing.Timing(timer):
+            with request_timing.Measure(request_timing.JSON):
+                request_timing.Add(request_timing.JSON, 0.5)
+
+        self.assertEqual(timer.seconds[request_timing.JSON], 2.0)
+
+
+class TimingStatsTest(django_test.SimpleTestCase):
+    def _Timer(self, db_seconds, query_count):
+        timer = request_timing.RequestTimer()
+        timer.seconds[request_timing.DATABASE] = db_seconds
+        timer.query_count = query_count
+        return timer
+
+    def testPercentiles(self):
+        stats = request_timing.TimingStats()
+        for i in range(1, 101):
+            stats.Record("view", self._Timer(i / 1000, i), i / 100)
+
+        [view_stats] = stats.GetStats()
+
+        self.assertEqual(view_stats.view, "view")
+        self.assertEqual(view_stats.request_count, 100)
+        self.assertEqual(
+            view_stats.milliseconds[request_timing.TOTAL], {50: 500, 90: 900, 99: 990}
+        )
+        self.assertEqual(
+            view_stats.milliseconds[request_timing.DATABASE], {50: 50, 90: 90, 99: 99}
+        )
+        self.assertEqual(view_stats.milliseconds[request_timing.PARSE][50], 0)
+        self.assertEqual(view_stats.query_counts, {50: 50, 90: 90, 99: 99})
+
+    def testKeepsRecentRequests(self):
+        stats = request_timing.TimingStats(requests_per_view=2)
+        for total in [10, 1, 2]:
+            stats.Record("view", self._Timer(0, 0), total)
+
+        [view_stats] = stats.GetStats()
+
+        self.assertEqual(view_stats.request_count, 2)
+        self.assertEqual(view_stats.milliseconds[request_timing.TOTAL][99], 2000)
+
+    def testSlowestFirst(self):
+        stats = request_timing.TimingStats()
+        stats.Record("fast", self._Timer(0, 0), 0.1)
+        stats.Record("slow", self._Timer(0, 0), 1)
+
+        self.assertEqual([s.view for s in stats.GetStats()], ["slow", "fast"])
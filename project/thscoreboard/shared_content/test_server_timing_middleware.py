@@ -0,0 +1,76 @@
+from django import http
+from django.core import exceptions
+from django import test as django_test
+from django import urls
+from django.db import connection
+
+from shared_content import request_timing
+from shared_content import views
+from shared_content.middleware import server_timing
+from replays.testing import test_case
+
+
+class ServerTimingMiddlewareTest(django_test.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.request = django_test.RequestFactory().get("/")
+        self.request.resolver_match = urls.ResolverMatch(
+            lambda request: None, (), {}, url_name="some_view"
+        )
+        request_timing.STATS.Clear()
+
+    def _View(self, request):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+            cursor.execute("SELECT 2")
+        with request_timing.Measure(request_timing.JSON):
+            pass
+        return http.HttpResponse(b"ok")
+
+    def testAddsServerTimingHeader(self):
+        response = server_timing.ServerTimingMiddleware(self._View)(self.request)
+
+        metrics = [m.strip() for m in response["Server-Timing"].split(",")]
+        self.assertRegex(metrics[0], r'^db;dur=[\d.]+;desc="Database \(2 queries\)"$')
+        self.assertRegex(metrics[1], r'^json;dur=[\d.]+;desc="JSON"$')
+        self.assertRegex(metrics[2], r"^total;dur=[\d.]+$")
+
+    def testRecordsStatsByView(self):
+        server_timing.ServerTimingMiddleware(self._View)(self.request)
+
+        [stats] = request_timing.STATS.GetStats()
+        self.assertEqual(stats.view, "some_view")
+        self.assertEqual(stats.query_counts[50], 2)
+
+    def testUnresolvedView(self):
+        request = django_test.RequestFactory().get("/")
+        server_timing.ServerTimingMiddleware(lambda r: http.HttpResponse())(request)
+
+        [stats] = request_timing.STATS.GetStats()
+        self.assertEqual(stats.view, "(unresolved)")
+
+
+class PerformanceViewTest(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        request_timing.STATS.Clear()
+        request_timing.STATS.Record("some_view", request_timing.RequestTimer(), 0.25)
+        self.factory = django_test.RequestFactory()
+
+    def testRequiresStaff(self):
+        request = self.factory.get("/staff/performance")
+        request.user = self.createUser("somebody")
+
+        with self.assertRaises(exceptions.PermissionDenied):
+            views.performance(request)
+
+    def testShowsStats(self):
+        request = self.factory.get("/staff/performance")
+        request.user = self.createUser("somebody")
+        request.user.is_superuser = True
+
+        response = views.performance(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "some_view")
+        self.assertContains(response, "250.0")
@@ -0,0 +1,34 @@
+"""Views shared by the whole site."""
+
+from django.contrib.auth import decorators as auth_decorators
+from django.shortcuts import render
+from django.views.decorators import http as http_decorators
+
+from shared_content import request_timing
+
+
+@auth_decorators.login_required
+@auth_decorators.permission_required("staff", raise_exception=True)
+@http_decorators.require_safe
+def performance(request):
+    """Show how long recent requests to each view took."""
+    columns = [(request_timing.TOTAL, p) for p in request_timing.PERCENTILES] + [
+        (phase, 50) for phase in request_timing.PHASES
+    ]
+    rows = [
+        {
+            "view": s.view,
+            "request_count": s.request_count,
+            "milliseconds": [s.milliseconds[phase][p] for phase, p in columns],
+            "median_queries": s.query_counts[50],
+        }
+        for s in request_timing.STATS.GetStats()
+    ]
+    return render(
+        request,
+        "shared_content/performance.html",
+        {
+            "columns": [f"{phase} p{p}" for phase, p in columns],
+            "rows": rows,
+        },
+    )
@@ -96,7 +96,8 @@ INSTALLED_APPS = [
 ] + (DEV_ONLY_APPS if DEBUG else [])
 
 MIDDLEWARE = [
-    "django.middleware.gzip.GZipMiddleware",
+    "shared_content.middleware.server_timing.ServerTimingMiddleware",
+    "shared_content.middleware.gzip.GZipMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -114,7 +115,8 @@ ROOT_URLCONF = "thscoreboard.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # Django's own backend, but reporting render times to request_timing.
+        "BACKEND": "shared_content.template_backend.DjangoTemplates",
         "DIRS": ["thscoreboard/templates/"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -181,6 +183,64 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# Precomputed pages like the game scoreboards live in the cache, and are thrown
+# away when the underlying data changes. If more than one server process is
+# running, they need to share a cache so that they all see those invalidations,
+# so set REDIS_URL (and install the redis package) in that case.
+#
+# Rendered replay pages are kept apart, in the "replay_pages" cache, since
+# there are many more of them than anything else. Without Redis, it is a
+# separate in-memory cache with its own size limit, so pages can't push the
+# scoreboards and their invalidations out of the default cache. With Redis,
+# eviction under maxmemory applies to the whole Redis instance, so the pages
+# only get the same protection if REPLAY_PAGES_REDIS_URL points them at a
+# separate instance; otherwise they share REDIS_URL, under their own prefix.
+
+if "REDIS_URL" in os.environ:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        },
+        "replay_pages": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ.get(
+                "REPLAY_PAGES_REDIS_URL", os.environ["REDIS_URL"]
+            ),
+            "KEY_PREFIX": "replay_pages",
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+        "replay_pages": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "replay_pages",
+            "OPTIONS": {"MAX_ENTRIES": 5000},
+        },
+    }
+
+# Parsed replay files are kept in a small per-process cache, since the upload
+# flow parses the same file several times. If REPLAY_PARSE_SHARED_CACHE names
+# one of the CACHES above, parse results are shared between processes too.
+REPLAY_PARSE_CACHE_SIZE = 128
+REPLAY_PARSE_SHARED_CACHE = os.environ.get("REPLAY_PARSE_SHARED_CACHE", None)
+
+# Where replay files are kept. If unset, they are kept in the database.
+# Otherwise, this is either file:///some/directory or s3://bucket/prefix; for
+# S3-compatible services other than AWS, also set the endpoint URL. See
+# replays/replay_storage.py.
+REPLAY_BLOB_STORE = os.environ.get("REPLAY_BLOB_STORE", None)
+REPLAY_BLOB_STORE_S3_ENDPOINT_URL = os.environ.get(
+    "REPLAY_BLOB_STORE_S3_ENDPOINT_URL", None
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
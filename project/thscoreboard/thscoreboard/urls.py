@@ -21,6 +21,7 @@ from django.urls import include, re_path, path
 from django.views.generic import base as base_views
 from django.shortcuts import render
 from replays.views import index
+from shared_content import views as shared_views
 from thscoreboard import settings
 from thscoreboard.deploy import views as deploy_views
 
@@ -33,6 +34,7 @@ urlpatterns = [
     path("deploy", deploy_views.deploy),
     path("sysadmin/reload", deploy_views.reload),
     path("staff", lambda req: render(req, "staff.html")),
+    path("staff/performance", shared_views.performance),
     # When fetching non-HTML pages, the browser looks at /favicon.ico
     # to find an icon.
     path(
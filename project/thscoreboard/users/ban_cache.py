@@ -0,0 +1,98 @@
+"""Caches whether each user is banned.
+
+CheckBanMiddleware asks whether the user is banned on every request, so
+rather than asking the database each time, we remember the answer in the
+cache, along with when it stops being true: a banned user's answer expires
+when their last ban does. Answers are also thrown away whenever one of the
+user's bans changes.
+
+Answers are kept for at most _MAX_CACHE_TIME, so that a change which somehow
+skips the signals (for example, an UPDATE run by hand) is noticed eventually.
+"""
+
+import dataclasses
+import datetime
+from typing import Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, signals
+from django.utils import timezone
+
+
+_MAX_CACHE_TIME = datetime.timedelta(hours=1)
+
+
+@dataclasses.dataclass(frozen=True)
+class _BanState:
+    banned: bool
+    valid_until: datetime.datetime
+    """When this answer may stop being true."""
+
+
+def IsBanned(user_id: int, now: Optional[datetime.datetime] = None) -> bool:
+    """Check whether a user is banned, asking the database only if necessary."""
+    if now is None:
+        now = timezone.now()
+
+    key = _Key(user_id)
+    state = cache.get(key)
+    if state is None or state.valid_until <= now:
+        state = _LoadBanState(user_id, now)
+        timeout = (state.valid_until - now).total_seconds()
+        cache.set(key, state, timeout=max(1, int(timeout)))
+    return state.banned
+
+
+def Invalidate(user_id: Optional[int]) -> None:
+    """Forget whether a user is banned.
+
+    The answer is thrown away both immediately and once the transaction
+    commits, so that a request can't cache an answer from data that is about
+    to change.
+    """
+    if user_id is None:
+        return
+    key = _Key(user_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def _LoadBanState(user_id: int, now: datetime.datetime) -> _BanState:
+    from users import models
+
+    last_expiration = models.Ban.objects.filter(
+        target_id=user_id, expiration__gt=now
+    ).aggregate(last_expiration=Max("expiration"))["last_expiration"]
+
+    valid_until = now + _MAX_CACHE_TIME
+    if last_expiration is None:
+        return _BanState(banned=False, valid_until=valid_until)
+    return _BanState(banned=True, valid_until=min(valid_until, last_expiration))
+
+
+def _Key(user_id: int) -> str:
+    return f"ban_state:{user_id}"
+
+
+def _InvalidateBanTarget(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    Invalidate(instance.target_id)
+
+
+def ConnectSignals(ban_model) -> None:
+    """Forget cached answers when ban_model rows change.
+
+    Called once, when the users app is ready.
+    """
+    signals.post_save.connect(
+        _InvalidateBanTarget,
+        sender=ban_model,
+        dispatch_uid="ban_cache.post",
+    )
+    signals.post_delete.connect(
+        _InvalidateBanTarget,
+        sender=ban_model,
+        dispatch_uid="ban_cache.delete",
+    )
@@ -1,47 +1,189 @@
 """Middleware that records the IP addresses of users in the database."""
 
-from concurrent import futures
+import atexit
+import collections
+import datetime
 import logging
-from typing import Optional
+import queue
+import threading
+import time
+from typing import Callable, Optional
 
+from django import db
 from django.http import request as request_lib
+from django.utils import timezone
 
 from users import models
 
 
-_MAX_WORKERS = 100
+# A user and IP address; the user is None if no one was logged in.
+_VisitKey = tuple[Optional[int], str]
+
+_DEDUPE_WINDOW = datetime.timedelta(hours=1)
+_FLUSH_INTERVAL_SECONDS = 5
+_FLUSH_BATCH_SIZE = 500
+_MAX_QUEUED_VISITS = 10000
+_MAX_RECENT_VISITS = 100000
 
 
 def _get_ip(request: request_lib.HttpRequest) -> Optional[str]:
     return request.META.get("REMOTE_ADDR")
 
 
+class VisitRecorder:
+    """Records visits in the background, without making requests wait.
+
+    Visits.RecordVisit only records a visit by the same user and IP once an
+    hour. To avoid asking the database about every request, this remembers
+    which visits it recorded in the last hour and drops repeats itself. New
+    visits are queued, and a single background thread writes them in batches.
+
+    If the queue is full, visits are dropped rather than making requests wait.
+    Since this only remembers its own visits, Visits.RecordVisits still checks
+    for recent visits recorded by other processes.
+
+    Args:
+        flush_interval: How long, in seconds, the background thread waits for
+            more visits before writing a batch.
+        batch_size: The most visits written at once.
+        max_queued: The most visits waiting to be written.
+        max_recent: The most recent visits remembered.
+        now: Returns the current time.
+        background: Whether to start the background thread. If false, visits
+            are only written by Flush.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = _FLUSH_INTERVAL_SECONDS,
+        batch_size: int = _FLUSH_BATCH_SIZE,
+        max_queued: int = _MAX_QUEUED_VISITS,
+        max_recent: int = _MAX_RECENT_VISITS,
+        now: Callable[[], datetime.datetime] = timezone.now,
+        background: bool = True,
+    ) -> None:
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        self._max_recent = max_recent
+        self._now = now
+        self._background = background
+
+        self._lock = threading.Lock()
+        # When each recent visit was recorded, oldest first.
+        self._recent: collections.OrderedDict[
+            _VisitKey, datetime.datetime
+        ] = collections.OrderedDict()
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread: Optional[threading.Thread] = None
+
+    def Record(self, user_id: Optional[int], ip: str) -> bool:
+        """Record a visit, unless the same user and IP visited recently.
+
+        Returns:
+            Whether the visit was queued to be written.
+        """
+        now = self._now()
+        key = (user_id, ip)
+        with self._lock:
+            self._ForgetVisitsBefore(now - _DEDUPE_WINDOW)
+            if key in self._recent:
+                return False
+            self._recent[key] = now
+            if len(self._recent) > self._max_recent:
+                self._recent.popitem(last=False)
+
+        try:
+            self._queue.put_nowait((user_id, ip, now))
+        except queue.Full:
+            with self._lock:
+                self._recent.pop(key, None)
+            logging.warning("Dropping a visit, since too many are waiting")
+            return False
+
+        self._StartFlusher()
+        return True
+
+    def Flush(self) -> int:
+        """Write every queued visit now, in this thread.
+
+        Returns:
+            The number of visits recorded.
+        """
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            return 0
+        return models.Visits.RecordVisits(batch)
+
+    def _ForgetVisitsBefore(self, threshold: datetime.datetime) -> None:
+        while self._recent:
+            key, recorded = next(iter(self._recent.items()))
+            if recorded > threshold:
+                return
+            del self._recent[key]
+
+    def _StartFlusher(self) -> None:
+        if not self._background:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._RunFlusher, name="VisitRecorder", daemon=True
+            )
+            self._thread.start()
+        atexit.register(self._FlushAtExit)
+
+    def _RunFlusher(self) -> None:
+        while True:
+            batch = self._NextBatch()
+            try:
+                # This thread lives forever, so it must look after its own
+                # database connection, just as a request would.
+                db.close_old_connections()
+                models.Visits.RecordVisits(batch)
+            except Exception:
+                logging.exception("Failed to record %d visits", len(batch))
+
+    def _NextBatch(self) -> list[tuple[Optional[int], str, datetime.datetime]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self._flush_interval
+        while len(batch) < self._batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _FlushAtExit(self) -> None:
+        try:
+            self.Flush()
+        except Exception:
+            logging.exception("Failed to record visits at exit")
+
+
+_recorder = VisitRecorder()
+
+
 class RecordIPMiddleware:
     """Middleware that records the IP addresses of incoming requests."""
 
     def __init__(self, get_response) -> None:
         self._get_response = get_response
 
-        self._executor = futures.ThreadPoolExecutor(
-            max_workers=_MAX_WORKERS, thread_name_prefix="RecordIPMiddleware"
-        )
-
     def __call__(self, request: request_lib.HttpRequest):
         ip = _get_ip(request)
-
-        # To save time and lower the chances of delaying a response, we save the
-        # IP address in parallel with returning a response.
-        save_ip_future = self._executor.submit(self._SaveIP, ip, request.user)
-        response = self._get_response(request)
-        save_ip_future.result(timeout=60)
-        return response
-
-    def _SaveIP(self, ip: str, user: models.User):
         if not ip:
             logging.warning("No IP detected for this request; this should not happen")
-            return
-
-        if user.is_anonymous:
-            models.Visits.RecordVisit(None, ip)
         else:
-            models.Visits.RecordVisit(user, ip)
+            user_id = None if request.user.is_anonymous else request.user.id
+            _recorder.Record(user_id, ip)
+
+        return self._get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.14 on 2026-10-18 12:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0015_forbiddenemaildomain"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="visits",
+            index=models.Index(
+                fields=["user", "ip", "created"], name="visits_user_ip_created"
+            ),
+        ),
+    ]
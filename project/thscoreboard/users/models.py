@@ -2,7 +2,7 @@
 
 import datetime
 import logging
-from typing import Optional
+from typing import Iterable, Optional
 import secrets
 
 from django.apps import apps
@@ -18,6 +18,10 @@ from ipaddress import ip_network
 from shared_content import model_ttl
 from thscoreboard import settings
 from replays.models import Replay
+from replays import replay_pages
+from replays import replay_ranks
+from replays import scoreboard_snapshots
+from users import ban_cache
 
 
 class BannedError(Exception):
@@ -86,8 +90,11 @@ class User(auth_models.AbstractUser):
     def CheckIfBanned(self) -> bool:
         """Check whether this user is banned or not.
 
-        This method will not conduct a database call in most cases, but in
-        some cases it will. Sometimes, it will even write to the database.
+        This method will not conduct a database call in most cases: users who
+        have never been banned are known not to be, and the answer for other
+        users is cached until one of their bans expires or changes. It never
+        writes to the database; stale might_be_banned flags are cleared by
+        ClearStaleBanFlags instead.
         """
 
         if not self.is_authenticated:
@@ -96,15 +103,28 @@ class User(auth_models.AbstractUser):
         if not self.might_be_banned:
             return False
 
-        now = datetime.datetime.now(datetime.timezone.utc)
-        if Ban.objects.filter(target=self, expiration__gt=now).exists():
-            return True
+        return ban_cache.IsBanned(self.id)
 
-        # The user is not really banned, but might_be_banned is true!
-        # Better fix that.
-        self.might_be_banned = False
-        self.save()
-        return False
+    @classmethod
+    def ClearStaleBanFlags(cls, now: datetime.datetime) -> int:
+        """Clear might_be_banned for users whose bans have all expired.
+
+        Args:
+            now: The current time.
+
+        Returns:
+            The number of users updated.
+        """
+        active_bans = Ban.objects.filter(
+            target=models.OuterRef("pk"), expiration__gt=now
+        )
+        count = (
+            cls.objects.filter(might_be_banned=True)
+            .exclude(models.Exists(active_bans))
+            .update(might_be_banned=False)
+        )
+        logging.info("Cleared %d stale ban flags.", count)
+        return count
 
     def BanUser(
         self,
@@ -149,14 +169,18 @@ class User(auth_models.AbstractUser):
         self.is_active = False
         self.deleted_on = datetime.datetime.now(datetime.timezone.utc)
         self.save()
+        # The user's replays are no longer visible.
+        scoreboard_snapshots.InvalidateGamesForUser(self)
+        replay_pages.InvalidateReplaysForUser(self)
 
     def DeleteAllReplays(self):
         """Delete all replays by this user."""
         replays_model = apps.get_model("replays", "Replay")
         to_delete = list(replays_model.objects.filter(user=self))
         logging.info("Deleting %d replays by %s...", len(to_delete), self.username)
-        for r in to_delete:
-            r.delete()
+        with transaction.atomic(), replay_ranks.BatchRefresh():
+            for r in to_delete:
+                r.delete()
         logging.info("Done deleting replays by %s", self.username)
 
 
@@ -380,6 +404,14 @@ class Visits(models.Model):
     This table exists to help identify users by IP if necessary.
     """
 
+    class Meta:
+        indexes = [
+            # Supports checking for recent visits by the same user and IP.
+            models.Index(
+                name="visits_user_ip_created", fields=["user", "ip", "created"]
+            ),
+        ]
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, null=True, on_delete=models.CASCADE
     )
@@ -423,6 +455,49 @@ class Visits(models.Model):
             new_visit.save()
             return new_visit
 
+    @classmethod
+    def RecordVisits(
+        cls, visits: Iterable[tuple[Optional[int], str, datetime.datetime]]
+    ) -> int:
+        """Record many visits at once.
+
+        Like RecordVisit, this skips visits by a user and IP that already
+        visited within the hour before.
+
+        Args:
+            visits: The ID of the user (or None), IP address and time of each
+                visit.
+
+        Returns:
+            The number of visits recorded.
+        """
+        visits = sorted(visits, key=lambda v: v[2])
+        if not visits:
+            return 0
+
+        user_ids = {user_id for user_id, _, _ in visits if user_id is not None}
+        last_visits = {
+            (user_id, ip): created
+            for user_id, ip, created in cls.objects.filter(
+                models.Q(user_id__in=user_ids) | models.Q(user__isnull=True),
+                ip__in={ip for _, ip, _ in visits},
+                created__gt=visits[0][2] - datetime.timedelta(hours=1),
+            )
+            .order_by("created")
+            .values_list("user_id", "ip", "created")
+        }
+        new_visits = []
+        for user_id, ip, created in visits:
+            last_visit = last_visits.get((user_id, ip))
+            if last_visit is not None and last_visit > created - datetime.timedelta(
+                hours=1
+            ):
+                continue
+            last_visits[(user_id, ip)] = created
+            new_visits.append(cls(user_id=user_id, ip=ip, created=created))
+        cls.objects.bulk_create(new_visits)
+        return len(new_visits)
+
     @classmethod
     def CleanUp(cls, now: datetime.datetime) -> None:
         """Delete old visits.
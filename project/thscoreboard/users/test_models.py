@@ -5,6 +5,7 @@ from django.forms import ValidationError
 from freezegun import freeze_time
 
 from django import test
+from django.core.cache import cache
 from django.db import utils
 from django.db.models import deletion
 from django.utils import timezone
@@ -13,6 +14,7 @@ from replays import game_ids
 from replays import models as replay_models
 from replays.testing import test_case
 from replays.testing import test_replays
+from users import ban_cache
 from users import models
 
 
@@ -171,6 +173,32 @@ class VisitsTestCase(test_case.UserTestCase):
         visit_count = models.Visits.objects.filter(user=u, ip="1.2.3.4").count()
         self.assertEqual(visit_count, 1)
 
+    def testRecordVisits(self):
+        u = self.createUser("somebody")
+        now = timezone.now()
+
+        recorded = models.Visits.RecordVisits(
+            [
+                (u.id, "1.2.3.4", now),
+                (u.id, "1.2.3.4", now + datetime.timedelta(minutes=30)),
+                (u.id, "1.2.3.4", now + datetime.timedelta(minutes=90)),
+                (None, "1.2.3.4", now),
+            ]
+        )
+
+        self.assertEqual(recorded, 3)
+        self.assertEqual(models.Visits.objects.filter(user=u).count(), 2)
+
+    def testRecordVisits_SkipsRecentVisits(self):
+        u = self.createUser("somebody")
+        models.Visits.RecordVisit(u, "1.2.3.4")
+
+        recorded = models.Visits.RecordVisits(
+            [(u.id, "1.2.3.4", timezone.now()), (u.id, "5.6.7.8", timezone.now())]
+        )
+
+        self.assertEqual(recorded, 1)
+
 
 class BanTestCase(test_case.UserTestCase):
     def setUp(self):
@@ -180,6 +208,7 @@ class BanTestCase(test_case.UserTestCase):
         self.target = self.createUser("target")
 
         self.now = datetime.datetime.now(datetime.timezone.utc)
+        cache.clear()
 
     def testNotBanned(self):
         self.assertFalse(self.target.CheckIfBanned())
@@ -226,8 +255,75 @@ class BanTestCase(test_case.UserTestCase):
         )
         self.assertFalse(self.target.CheckIfBanned())
 
+    def testCheckIfBanned_DoesNotWrite(self):
+        self.target.BanUser(
+            self.banner,
+            "test",
+            datetime.timedelta(hours=6),
+            expiration=self.now - datetime.timedelta(hours=3),
+        )
+        self.assertFalse(self.target.CheckIfBanned())
+
         updated_target = models.User.objects.get(id=self.target.id)
-        self.assertFalse(updated_target.might_be_banned)
+        self.assertTrue(updated_target.might_be_banned)
+
+    def testCheckIfBanned_IsCached(self):
+        self.target.BanUser(
+            self.banner,
+            "test",
+            datetime.timedelta(hours=6),
+            expiration=self.now + datetime.timedelta(hours=3),
+        )
+        self.assertTrue(self.target.CheckIfBanned())
+        with self.assertNumQueries(0):
+            self.assertTrue(self.target.CheckIfBanned())
+
+    def testCheckIfBanned_CacheExpiresWithBan(self):
+        expiration = self.now + datetime.timedelta(hours=3)
+        self.target.BanUser(
+            self.banner, "test", datetime.timedelta(hours=6), expiration=expiration
+        )
+        self.assertTrue(ban_cache.IsBanned(self.target.id, now=self.now))
+        self.assertFalse(
+            ban_cache.IsBanned(
+                self.target.id, now=expiration + datetime.timedelta(seconds=1)
+            )
+        )
+
+    def testCheckIfBanned_NewBanInvalidatesCache(self):
+        self.target.might_be_banned = True
+        self.target.save()
+        self.assertFalse(self.target.CheckIfBanned())
+
+        self.target.BanUser(self.banner, "test", datetime.timedelta(hours=6))
+        self.assertTrue(self.target.CheckIfBanned())
+
+    def testCheckIfBanned_DeletedBanInvalidatesCache(self):
+        b = self.target.BanUser(self.banner, "test", datetime.timedelta(hours=6))
+        self.assertTrue(self.target.CheckIfBanned())
+
+        b.delete()
+        self.assertFalse(self.target.CheckIfBanned())
+
+    def testClearStaleBanFlags(self):
+        self.target.BanUser(
+            self.banner,
+            "test",
+            datetime.timedelta(hours=6),
+            expiration=self.now - datetime.timedelta(hours=3),
+        )
+        still_banned = self.createUser("still-banned")
+        still_banned.BanUser(
+            self.banner,
+            "test",
+            datetime.timedelta(hours=6),
+            expiration=self.now + datetime.timedelta(hours=3),
+        )
+
+        self.assertEqual(models.User.ClearStaleBanFlags(self.now), 1)
+
+        self.assertFalse(models.User.objects.get(id=self.target.id).might_be_banned)
+        self.assertTrue(models.User.objects.get(id=still_banned.id).might_be_banned)
 
     def testCannotDirectlyDeleteBannedUser(self):
         self.target.BanUser(
@@ -0,0 +1,89 @@
+from unittest import mock
+
+from django import test as django_test
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from replays import constant_helpers
+from replays import game_ids
+from replays import models as replay_models
+from replays.testing import test_case
+from replays.testing import test_replays
+from users.views import rankings
+
+
+class RankingsTest(test_case.ReplayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = django_test.RequestFactory()
+        self.viewer = self.createUser("viewer")
+        self.th05_mima = replay_models.Shot.objects.get(
+            game_id=game_ids.GameIDs.TH05, shot_id="Mima"
+        )
+        self.th06_reimua = replay_models.Shot.objects.get(
+            game_id=game_ids.GameIDs.TH06, shot_id="ReimuA"
+        )
+
+    def _Create(self, user, shot, score, difficulty=1):
+        return test_replays.CreateReplayWithoutFile(
+            user=user, difficulty=difficulty, shot=shot, score=score
+        )
+
+    def _Rankings(self, **params):
+        request = self.factory.get("/users/rankings", params)
+        request.user = self.viewer
+        response = rankings.rankings(request)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def _Players(self, selection):
+        players = rankings._get_player_rankings(
+            rankings._get_game_filter_from_selection(selection)
+        )
+        return [
+            (p["user__username"] or p["imported_username"], p["first_places"])
+            for p in players
+        ]
+
+    def testRanksPlayersByMedals(self):
+        alice = self.createUser("alice")
+        bob = self.createUser("bob")
+        self._Create(alice, self.th05_mima, 100, difficulty=1)
+        self._Create(bob, self.th05_mima, 200, difficulty=1)
+        self._Create(bob, self.th06_reimua, 200, difficulty=1)
+        self._Create(alice, self.th06_reimua, 300, difficulty=2)
+        self._Create(alice, self.th06_reimua, 300, difficulty=3)
+
+        self.assertEqual(self._Players("All games"), [("alice", 2), ("bob", 2)])
+        self.assertEqual(self._Players("PC-98"), [("bob", 1), ("alice", 0)])
+        self.assertEqual(self._Players("Windows"), [("alice", 2), ("bob", 1)])
+        self.assertEqual(self._Players("th06"), [("alice", 2), ("bob", 1)])
+
+    def testQueriesDoNotDependOnPlayerCount(self):
+        self._Create(self.createUser("player0"), self.th05_mima, 100)
+        # The constant tables are loaded once and kept; load them before
+        # counting queries.
+        constant_helpers.GetConstantModelIndex()
+        with CaptureQueriesContext(connection) as one_player:
+            self._Rankings(grouped_game_selection="All games")
+
+        for i in range(1, 5):
+            self._Create(self.createUser(f"player{i}"), self.th05_mima, 100 + i)
+        with CaptureQueriesContext(connection) as five_players:
+            response = self._Rankings(grouped_game_selection="All games")
+
+        self.assertEqual(len(one_player), len(five_players))
+        self.assertContains(response, "player4")
+
+    @mock.patch.object(rankings, "_PAGE_SIZE", 2)
+    def testPagination(self):
+        for i in range(3):
+            self._Create(self.createUser(f"player{i}"), self.th05_mima, 100 + i)
+
+        first = self._Rankings(grouped_game_selection="All games")
+        second = self._Rankings(grouped_game_selection="All games", page="2")
+
+        self.assertContains(first, "player2")
+        self.assertNotContains(first, "player0")
+        self.assertContains(first, "grouped_game_selection=All+games&page=2")
+        self.assertContains(second, "player0")
@@ -0,0 +1,99 @@
+import datetime
+
+from django import test as django_test
+from django.contrib.auth import models as auth_models
+from unittest import mock
+
+from replays.testing import test_case
+from users import models
+from users.middleware import record_ip
+
+
+class VisitRecorderTestCase(test_case.UserTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        self.recorder = self._CreateRecorder()
+        self.user = self.createUser("somebody")
+
+    def _CreateRecorder(self, **kwargs):
+        return record_ip.VisitRecorder(now=lambda: self.now, background=False, **kwargs)
+
+    def _Visits(self):
+        return list(
+            models.Visits.objects.order_by("created").values_list(
+                "user_id", "ip", "created"
+            )
+        )
+
+    def testRecordsVisits(self):
+        self.assertTrue(self.recorder.Record(self.user.id, "1.2.3.4"))
+        self.assertTrue(self.recorder.Record(None, "1.2.3.4"))
+
+        self.assertEqual(self._Visits(), [])
+        self.assertEqual(self.recorder.Flush(), 2)
+        self.assertCountEqual(
+            self._Visits(),
+            [(self.user.id, "1.2.3.4", self.now), (None, "1.2.3.4", self.now)],
+        )
+
+    def testDropsRepeatVisitsWithoutTheDatabase(self):
+        self.recorder.Record(self.user.id, "1.2.3.4")
+
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                self.assertFalse(self.recorder.Record(self.user.id, "1.2.3.4"))
+
+        self.assertEqual(self.recorder.Flush(), 1)
+
+    def testRecordsVisitsAgainAfterAnHour(self):
+        self.recorder.Record(self.user.id, "1.2.3.4")
+        self.now += datetime.timedelta(minutes=59)
+        self.assertFalse(self.recorder.Record(self.user.id, "1.2.3.4"))
+
+        self.now += datetime.timedelta(minutes=2)
+        self.assertTrue(self.recorder.Record(self.user.id, "1.2.3.4"))
+
+        self.assertEqual(self.recorder.Flush(), 2)
+
+    def testSkipsVisitsRecordedByOtherProcesses(self):
+        models.Visits.RecordVisit(self.user, "1.2.3.4")
+        self.now = models.Visits.objects.get().created + datetime.timedelta(minutes=5)
+
+        self.recorder.Record(self.user.id, "1.2.3.4")
+
+        self.assertEqual(self.recorder.Flush(), 0)
+        self.assertEqual(models.Visits.objects.count(), 1)
+
+    def testDropsVisitsWhenTheQueueIsFull(self):
+        recorder = self._CreateRecorder(max_queued=1)
+        recorder.Record(self.user.id, "1.2.3.4")
+
+        with self.assertLogs(level="WARNING"):
+            self.assertFalse(recorder.Record(self.user.id, "5.6.7.8"))
+
+        self.assertEqual(recorder.Flush(), 1)
+        # The dropped visit wasn't remembered, so it can be recorded later.
+        self.assertTrue(recorder.Record(self.user.id, "5.6.7.8"))
+
+    def testRemembersALimitedNumberOfVisits(self):
+        recorder = self._CreateRecorder(max_recent=1)
+        recorder.Record(self.user.id, "1.2.3.4")
+        recorder.Record(self.user.id, "5.6.7.8")
+
+        self.assertTrue(recorder.Record(self.user.id, "1.2.3.4"))
+
+
+class RecordIPMiddlewareTestCase(test_case.UserTestCase):
+    def testDoesNotWriteDuringTheRequest(self):
+        recorder = record_ip.VisitRecorder(background=False)
+        middleware = record_ip.RecordIPMiddleware(lambda request: "response")
+        request = django_test.RequestFactory().get("/")
+        request.user = auth_models.AnonymousUser()
+
+        with mock.patch.object(record_ip, "_recorder", recorder):
+            with self.assertNumQueries(0):
+                self.assertEqual(middleware(request), "response")
+
+        self.assertEqual(recorder.Flush(), 1)
+        models.Visits.objects.get(user=None, ip="127.0.0.1")
@@ -1,28 +1,15 @@
-from collections import defaultdict
-from dataclasses import dataclass
-from typing import Iterable, Union
-from django.shortcuts import render
+from django.core import paginator
 from django.core.handlers.wsgi import WSGIRequest
+from django.db.models import Q, QuerySet, Sum
 from django.http import HttpResponse
+from django.shortcuts import render
 
 from replays import forms
-from replays.get_all_games import get_pc98_games, get_windows_games
-import users.models as user_models
+from replays.get_all_games import PC98_GAME_IDS
 import replays.models as replay_models
 
 
-@dataclass
-class RankCount:
-    first_place_count: int
-    second_place_count: int
-    third_place_count: int
-
-    def __lt__(self, other):
-        return (
-            self.first_place_count,
-            self.second_place_count,
-            self.third_place_count,
-        ) < (other.first_place_count, other.second_place_count, other.third_place_count)
+_PAGE_SIZE = 100
 
 
 def rankings(request: WSGIRequest) -> HttpResponse:
@@ -30,83 +17,73 @@ def rankings(request: WSGIRequest) -> HttpResponse:
     form = forms.RankingGameSelectionForm(request.GET)
     if form.is_valid():
         selection = form.get_selection()
-    games = _get_all_games_from_selection(selection)
 
-    rankings = _get_all_player_rankings_for_games(games)
-    rankings_dicts = _rankings_to_dicts(rankings)
+    page = paginator.Paginator(
+        _get_player_rankings(_get_game_filter_from_selection(selection)),
+        _PAGE_SIZE,
+    ).get_page(request.GET.get("page"))
+    rankings_dicts = _rankings_to_dicts(page)
+
+    # Page links keep the current selection.
+    page_query = request.GET.copy()
+    page_query.pop("page", None)
+
     game_selection_form = forms.RankingGameSelectionForm()
     return render(
         request,
         "users/rankings.html",
         {
             "rankings": rankings_dicts,
+            "page": page,
+            "page_query": page_query.urlencode(),
             "form": game_selection_form,
             "selection": selection,
         },
     )
 
 
-def _get_all_player_rankings_for_games(
-    games: Iterable[replay_models.Game],
-) -> dict[Union[str, user_models.User], RankCount]:
-    rankings = defaultdict(lambda: RankCount(0, 0, 0))
-    game_ids = [game.game_id for game in games]
-    top_3_replays = (
-        replay_models.Replay.objects.select_related("rank_view")
-        .filter(category=replay_models.Category.STANDARD)
-        .filter(shot__game__in=game_ids)
-        .filter(
-            replay_type__in=(
-                replay_models.ReplayType.FULL_GAME,
-                replay_models.ReplayType.SCENE_GAME,
-            )
+def _get_player_rankings(game_filter: Q) -> QuerySet:
+    """Total each player's medals over some games, best players first."""
+    return (
+        replay_models.PlayerMedalCount.objects.filter(game_filter)
+        .values("user_id", "user__username", "imported_username")
+        .annotate(
+            first_places=Sum("first_place_count"),
+            second_places=Sum("second_place_count"),
+            third_places=Sum("third_place_count"),
+        )
+        .order_by(
+            "-first_places",
+            "-second_places",
+            "-third_places",
+            "user__username",
+            "imported_username",
         )
-        .filter(is_listed=True)
-        .filter(rank_view__place__lte=3)
     )
 
-    for replay in top_3_replays:
-        player = replay.user if replay.user is not None else replay.imported_username
-        rank = replay.GetRank()
-        if rank == 1:
-            rankings[player].first_place_count += 1
-        elif rank == 2:
-            rankings[player].second_place_count += 1
-        else:
-            rankings[player].third_place_count += 1
-    return rankings
-
 
-def _rankings_to_dicts(
-    rankings: list[tuple[Union[str, user_models.User], RankCount]]
-) -> list[dict]:
+def _rankings_to_dicts(page: paginator.Page) -> list[dict]:
     rows = []
-    sorted_ranking_items = sorted(
-        rankings.items(), key=lambda item: item[1], reverse=True
-    )
-    for i, (user, rank_count) in enumerate(sorted_ranking_items):
+    for i, player in enumerate(page, start=page.start_index()):
         row = {
-            "player_rank": i + 1,  # Make displayed numbers be 1-indexed
-            "first_place_count": rank_count.first_place_count,
-            "second_place_count": rank_count.second_place_count,
-            "third_place_count": rank_count.third_place_count,
+            "player_rank": i,
+            "first_place_count": player["first_places"],
+            "second_place_count": player["second_places"],
+            "third_place_count": player["third_places"],
         }
-        if isinstance(user, str):
-            row["username"] = user
+        if player["user_id"] is None:
+            row["username"] = player["imported_username"]
         else:
-            row["user"] = user
+            row["user"] = player["user__username"]
         rows.append(row)
     return rows
 
 
-def _get_all_games_from_selection(selection: str) -> Iterable[replay_models.Game]:
-    games = replay_models.Game.objects.filter(game_id=selection)
-    if len(games) == 1:
-        return games
-
+def _get_game_filter_from_selection(selection: str) -> Q:
     if selection == forms.RankingGameSelectionForm.SELECT_ALL:
-        return replay_models.Game.objects.all()
+        return Q()
     if selection == forms.RankingGameSelectionForm.SELECT_PC98:
-        return get_pc98_games()
+        return Q(game_id__in=PC98_GAME_IDS)
     if selection == forms.RankingGameSelectionForm.SELECT_WINDOWS:
-        return get_windows_games()
+        return ~Q(game_id__in=PC98_GAME_IDS)
+    return Q(game_id=selection)